@@ -1,9 +1,15 @@
-from flask import Flask, request, jsonify, render_template, send_file  # type: ignore
+if __name__ == '__main__':
+    # Run as a script: serve from start_server instead, so process pool workers
+    # (which re-import the main script) don't start a second copy of this app
+    import runpy
+    runpy.run_module('start_server', run_name='__main__', alter_sys=True)
+    raise SystemExit
+
+from flask import Flask, request, jsonify, render_template, send_file, Response, stream_with_context, g  # type: ignore
 from flask_cors import CORS  # type: ignore
 import json
-import qrcode  # type: ignore
-import io
-import base64
+import hashlib
+import time
 from pathlib import Path
 import os
 from datetime import datetime
@@ -13,18 +19,262 @@ import uuid
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'scripts'))
-from medicine_manager import MedicineManager  # type: ignore
+from medicine_manager import MedicineManager, DEFAULT_MEDICINE_FIELDS  # type: ignore
+from qr_codes import QRCache, CONTENT_TYPES, qr_etag  # type: ignore
+from qr_labels import export_labels  # type: ignore
+from balances import BalanceService  # type: ignore
+from chain_verify import indexer_holder, make_verifier  # type: ignore
+from chain_sync import ChainSync  # type: ignore
+from common import ALGOD, CONF, INDEXER, PARAMS, SUBMITTER, TRACKER, configured_accounts  # type: ignore
+from jobs import JobQueue, JobStore, QueueFull, DEFAULT_JOBS_DB  # type: ignore
+from storage import SQLiteStore  # type: ignore
+from shipments import parse_items, ship  # type: ignore
+from minters import FUNDING, MINTERS  # type: ignore
+from signer import SIGNER  # type: ignore
+from custody import CustodyFollower, describe  # type: ignore
+from evidence import evidence_hash, make_anchor, normalize_hash, verify_proof  # type: ignore
+from metrics import REGISTRY, HTTP_EXCEPTIONS, HTTP_LATENCY, HTTP_REQUESTS  # type: ignore
+from tracing import PROFILER, SLOW_TRACES, end_trace, start_trace  # type: ignore
 
 app = Flask(__name__)
 CORS(app)
 
-# Initialize medicine manager
+# Initialize medicine manager; other workers' writes reach us through the store's change log
 medicine_manager = MedicineManager()
+medicine_manager.start_change_listener()
+
+# Pick up assets minted by other tools (or a lost local store) from the indexer
+if INDEXER is not None and CONF['network'].get('sync_interval', 10.0):
+    chain_sync = ChainSync(medicine_manager.store, on_change=medicine_manager.reload_medicines,
+                           custody=medicine_manager.custody)
+    chain_sync.start(CONF['network'].get('sync_interval', 10.0))
+
+# Balances are refreshed in the background once per round
+balance_service = BalanceService()
+BALANCE_WAIT_SECONDS = 10     # cold-start wait for the first snapshot before answering 503
+
+# On-chain checks for verification, cached and invalidated from the block stream
+def unit_holder(asset_id):
+    """Current holder of a unit: the custody log's last receiver, else the indexer"""
+    holder = medicine_manager.custody.holder(asset_id)
+    if holder is None and INDEXER is not None:
+        holder = indexer_holder(INDEXER)(asset_id)
+    return holder
+
+chain_verifier = make_verifier(holder=unit_holder)
+
+# Transfers made outside this server (pharmacy to patient, other tools) come from the block stream
+custody_follower = CustodyFollower(medicine_manager.custody)
+custody_follower.start()
+
+# Keep the minter accounts funded from the treasury while large mints run
+if FUNDING is not None:
+    FUNDING.leases = medicine_manager.store    # top-ups are shared by all workers
+    FUNDING.start(CONF['minters'].get('check_interval', 60.0))
+
+def run_add_medicine(params, progress):
+    """Job handler: create a medicine (re-runs return the existing record)"""
+    medicine_id = medicine_manager.find_batch(params['medicine_name'], params['batch_no'])
+    if medicine_id is None:
+        # The ID picked at submit time, so a re-run on a later day creates the same record
+        medicine_id, batch_asa_id = medicine_manager.add_medicine(
+            medicine_name=params['medicine_name'],
+            batch_no=params['batch_no'],
+            total_units=params['total_units'],
+            expiry_date=params['expiry_date'],
+            medicine_id=params['medicine_id']
+        )
+    else:
+        batch_asa_id = medicine_manager.artifacts['medicines'][medicine_id]['batch_asa_id']
+    progress(1, 1)
+    return {'medicine_id': medicine_id, 'batch_asa_id': batch_asa_id}
+
+def run_create_unit(params, progress):
+    """Job handler: mint one unit NFT (re-runs return the existing unit)"""
+    medicine_id, unit_serial = params['medicine_id'], params['unit_serial']
+    medicine = medicine_manager.store.load_medicine(medicine_id) or {}
+    unit_nft_id = medicine.get('unit_nfts', {}).get(unit_serial)
+    if unit_nft_id is None:
+        unit_nft_id = medicine_manager.create_unit_nft_for_medicine(medicine_id, unit_serial)
+    progress(1, 1)
+    return {'medicine_id': medicine_id, 'unit_nft_id': unit_nft_id, 'unit_serial': unit_serial}
+
+def run_create_units_bulk(params, progress):
+    """Job handler: bulk mint unit NFTs (re-runs skip serials already minted)"""
+    medicine_id = params['medicine_id']
+    medicine = medicine_manager.store.load_medicine(medicine_id) or {}
+    already = medicine.get('unit_nfts', {})
+    serials = [serial for serial in params['serials'] if serial not in already]
+    minted, failed = medicine_manager.create_unit_nfts(medicine_id, serials, progress)
+    if failed and not minted:
+        raise ValueError(f"All {len(failed)} unit NFTs failed to mint: {next(iter(failed.values()))}")
+    minted.update({serial: already[serial] for serial in params['serials'] if serial in already})
+    return {'medicine_id': medicine_id, 'unit_nfts': minted, 'failed': failed}
+
+def run_shipment(params, progress):
+    """Job handler: ship assets to a configured account (re-runs skip what was already sent)"""
+    items = [tuple(item) for item in params['items']]
+    shipped, failed = ship(params['receiver'], items, progress, custody=medicine_manager.custody,
+                           journal=medicine_manager.store, shipment_id=params.get('shipment_id'))
+    return {'receiver': params['receiver'], 'shipped': {str(k): v for k, v in shipped.items()},
+            'failed': {str(k): v for k, v in failed.items()}}
+
+# Mints run on a bounded worker pool; jobs are persisted next to the artifacts
+job_db = medicine_manager.store.path if isinstance(medicine_manager.store, SQLiteStore) else DEFAULT_JOBS_DB
+job_queue = JobQueue({
+    'add_medicine': run_add_medicine,
+    'create_unit': run_create_unit,
+    'create_units_bulk': run_create_units_bulk,
+    'shipment': run_shipment,
+}, store=JobStore(job_db), workers=4, leases=medicine_manager.store)
+job_queue.start()
+
+# AI evidence hashes are anchored on-chain as one Merkle root per batch
+evidence_anchor = make_anchor(job_db)
+evidence_anchor.start()
+
+def job_accepted(job):
+    """202 response for a queued job"""
+    response = jsonify({
+        'success': True,
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'status_url': f"/api/jobs/{job['job_id']}"
+    })
+    response.status_code = 202
+    response.headers['Location'] = f"/api/jobs/{job['job_id']}"
+    return response
 
 # Configuration
 ROOT = Path(__file__).resolve().parent
-UPLOAD_FOLDER = ROOT / 'static' / 'qr_codes'
+# PHARMTRUST_UPLOAD_FOLDER moves the QR cache, e.g. to a temp dir for benchmarks
+UPLOAD_FOLDER = Path(os.environ.get('PHARMTRUST_UPLOAD_FOLDER') or ROOT / 'static' / 'qr_codes')
 UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
+qr_cache = QRCache(UPLOAD_FOLDER)
+
+def route_label():
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+# Slowest-trace capture and /debug/* are opt-in (network.debug or PHARMTRUST_DEBUG=1)
+DEBUG_ENABLED = os.environ.get('PHARMTRUST_DEBUG', '') == '1' or bool(CONF['network'].get('debug', False))
+SLOW_TRACES.size = CONF['network'].get('debug_slow_traces', 50)
+SLOW_TRACES.enabled = DEBUG_ENABLED
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+    g.trace, g.trace_token = start_trace(f"{request.method} {route_label()}", path=request.path)
+    g.profile = PROFILER.maybe_start() if DEBUG_ENABLED and not request.path.startswith('/debug/') else None
+
+@app.after_request
+def record_request(response):
+    route = route_label()
+    HTTP_LATENCY.observe(time.perf_counter() - g.request_start, route, request.method)
+    HTTP_REQUESTS.inc(1, route, request.method, response.status_code)
+    if g.get('trace_token') is not None:
+        g.trace.attrs['status'] = response.status_code
+        end_trace(g.trace, g.trace_token)
+        g.trace_token = None
+        response.headers['Server-Timing'] = g.trace.server_timing()
+        response.headers['X-Trace-Id'] = g.trace.trace_id
+    return response
+
+@app.teardown_request
+def record_exception(exc):
+    if exc is not None:
+        HTTP_EXCEPTIONS.inc(1, route_label(), type(exc).__name__)
+    if g.get('trace_token') is not None:
+        g.trace.attrs['error'] = type(exc).__name__ if exc is not None else None
+        end_trace(g.trace, g.trace_token)
+        g.trace_token = None
+    if g.get('profile') is not None:
+        PROFILER.stop(g.profile)
+        g.profile = None
+
+def collect_runtime_metrics():
+    """Scrape-time values from the caches, queues and algod endpoints"""
+    families = []
+    for cache, stats in (('qr', qr_cache.stats()), ('params', PARAMS.stats()), ('verify', chain_verifier.stats())):
+        families.append(('pharmtrust_cache_hits_total', 'counter', 'Cache hits', [({'cache': cache}, stats['hits'] + stats.get('disk_hits', 0))]))
+        families.append(('pharmtrust_cache_misses_total', 'counter', 'Cache misses', [({'cache': cache}, stats['misses'])]))
+        families.append(('pharmtrust_cache_hit_ratio', 'gauge', 'Cache hit ratio since start', [({'cache': cache}, stats['hit_rate'])]))
+    submissions = SUBMITTER.stats()
+    families.append(('pharmtrust_queue_depth', 'gauge', 'Work waiting in background queues', [
+        ({'queue': 'jobs'}, job_queue.depth()),
+        ({'queue': 'submissions'}, sum(submissions['queued'].values()) + submissions['retrying']),
+        ({'queue': 'confirmations'}, TRACKER.pending_count()),
+        ({'queue': 'verify_invalidation'}, chain_verifier.blocks.qsize()),
+        ({'queue': 'evidence'}, evidence_anchor.store.pending()[0]),
+        ({'queue': 'custody_blocks'}, custody_follower.blocks.qsize()),
+    ]))
+    if TRACKER.last_round is not None:
+        families.append(('pharmtrust_last_round', 'gauge', 'Latest round seen by the confirmation tracker',
+                         [({}, TRACKER.last_round)]))
+    signing = SIGNER.stats()
+    if signing['txns_per_second'] is not None:
+        families.append(('pharmtrust_signing_txns_per_second', 'gauge', 'Signing throughput since start',
+                         [({'window': 'total'}, signing['txns_per_second']),
+                          ({'window': 'last_batch'}, signing['last_txns_per_second'] or 0)]))
+    families.append(('pharmtrust_submit_concurrency_limit', 'gauge', 'Adaptive limit on submissions in flight',
+                     [({}, submissions['concurrency_limit'])]))
+    families.append(('pharmtrust_submit_rate', 'gauge', 'Current submission rate limit per second',
+                     [({}, submissions['rate'])]))
+    families.append(('pharmtrust_submit_in_flight', 'gauge', 'Submissions waiting on algod',
+                     [({}, submissions['in_flight'])]))
+    minters = MINTERS.stats()
+    families.append(('pharmtrust_minter_spendable_microalgos', 'gauge', 'Balance above min-balance per minter account',
+                     [({'minter': m['key']}, m['spendable']) for m in minters if m['spendable'] is not None]))
+    families.append(('pharmtrust_minter_in_flight', 'gauge', 'Asset creations in flight per minter account',
+                     [({'minter': m['key']}, m['in_flight']) for m in minters]))
+    if hasattr(ALGOD, 'stats'):
+        endpoints = ALGOD.stats()
+        families.append(('pharmtrust_algod_endpoint_up', 'gauge', 'Whether the endpoint is out of cooldown',
+                         [({'endpoint': e['address']}, int(e['available'])) for e in endpoints]))
+        families.append(('pharmtrust_algod_endpoint_in_flight', 'gauge', 'Requests in flight per endpoint',
+                         [({'endpoint': e['address']}, e['in_flight']) for e in endpoints]))
+        families.append(('pharmtrust_algod_endpoint_errors_total', 'counter', 'Failed requests per endpoint',
+                         [({'endpoint': e['address']}, e['errors']) for e in endpoints]))
+    return families
+
+REGISTRY.register_collector(collect_runtime_metrics)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of request, algod, confirmation, mint, cache and queue metrics"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug/traces')
+def debug_traces():
+    """Slowest recent request and job traces with their spans (opt-in)"""
+    if not DEBUG_ENABLED:
+        return jsonify({'success': False, 'error': 'Not found'}), 404
+    traces = SLOW_TRACES.slowest()
+    trace_id = request.args.get('trace_id')
+    if trace_id:
+        # A request trace and the job traces it started
+        traces = [t for t in traces if trace_id in (t['trace_id'], t['parent'])]
+    if request.args.get('clear') == '1':
+        SLOW_TRACES.clear()
+    return jsonify({'success': True, 'traces': traces, 'count': len(traces)})
+
+@app.route('/debug/profile')
+def debug_profile():
+    """Profile a sample of live requests for ?seconds= and return the pstats report (opt-in)"""
+    if not DEBUG_ENABLED:
+        return jsonify({'success': False, 'error': 'Not found'}), 404
+    try:
+        seconds = min(max(float(request.args.get('seconds', 10)), 1), 120)
+        rate = min(max(float(request.args.get('rate', 0.1)), 0), 1)
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in ('cumulative', 'tottime', 'calls'):
+            raise ValueError(f"Unknown sort: {sort}")
+        PROFILER.begin(seconds, rate)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    time.sleep(seconds)
+    report, sampled = PROFILER.end(sort)
+    return Response(f"# {sampled} requests sampled over {seconds:g}s at rate {rate:g}\n{report}",
+                    mimetype='text/plain')
 
 @app.route('/')
 def index():
@@ -38,13 +288,42 @@ def static_files(filename):
 
 @app.route('/api/medicines', methods=['GET'])
 def get_medicines():
-    """Get all medicines"""
+    """List medicines with cursor pagination, filters and field projection"""
     try:
-        medicines = medicine_manager.artifacts.get('medicines', {})
-        return jsonify({
+        # The view only changes when the manager's version does
+        etag = hashlib.sha1(
+            f'{medicine_manager.instance_id}:{medicine_manager.version}:{request.query_string.decode()}'.encode()
+        ).hexdigest()
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers={'ETag': f'"{etag}"'})
+        
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        fields = request.args.get('fields')
+        fields = tuple(f for f in fields.split(',') if f) if fields else DEFAULT_MEDICINE_FIELDS
+        
+        medicines, next_cursor = medicine_manager.query_medicines(
+            cursor=request.args.get('cursor'),
+            limit=limit,
+            name=request.args.get('name'),
+            batch_no=request.args.get('batch'),
+            expiry_from=request.args.get('expiry_from'),
+            expiry_to=request.args.get('expiry_to'),
+            fields=fields
+        )
+        
+        response = jsonify({
             'success': True,
-            'medicines': medicines
+            'medicines': medicines,
+            'count': len(medicines),
+            'next_cursor': next_cursor
         })
+        response.headers['ETag'] = f'"{etag}"'
+        return response
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid query: {e}'
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -71,29 +350,34 @@ def create_medicine():
         total_units = data.get('total_units', 1000)
         expiry_date = data.get('expiry_date', '2027-08')
         
-        # Check if medicine already exists
+        # Check if medicine already exists, under this or an earlier day's ID
         medicine_id = medicine_manager.generate_medicine_id(medicine_name, batch_no)
-        if medicine_id in medicine_manager.artifacts.get('medicines', {}):
+        if medicine_manager.find_batch(medicine_name, batch_no) is not None:
             return jsonify({
                 'success': False,
                 'error': f'Medicine with batch {batch_no} already exists'
             }), 400
         
-        # Create the medicine
-        medicine_id, batch_asa_id = medicine_manager.add_medicine(
-            medicine_name=medicine_name,
-            batch_no=batch_no,
-            total_units=total_units,
-            expiry_date=expiry_date
-        )
-        
-        return jsonify({
-            'success': True,
+        # Create the medicine in the background
+        job = job_queue.submit('add_medicine', {
             'medicine_id': medicine_id,
-            'batch_asa_id': batch_asa_id,
-            'message': f'Medicine {medicine_name} created successfully'
+            'medicine_name': medicine_name,
+            'batch_no': batch_no,
+            'total_units': total_units,
+            'expiry_date': expiry_date
         })
+        return job_accepted(job)
         
+    except QueueFull as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 503
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -107,49 +391,190 @@ def create_unit_nft(medicine_id):
         data = request.get_json()
         unit_serial = data.get('unit_serial', f'U{str(uuid.uuid4())[:8]}')
         
-        # Create unit NFT
-        unit_nft_id = medicine_manager.create_unit_nft_for_medicine(medicine_id, unit_serial)
+        if medicine_id not in medicine_manager.artifacts.get('medicines', {}):
+            return jsonify({
+                'success': False,
+                'error': 'Medicine not found'
+            }), 404
+        medicine_manager.check_unit_serials(medicine_id, [unit_serial])
         
-        # Generate QR code
-        qr_data = {
+        # Create unit NFT in the background; the QR code is at /api/qr/<unit_nft_id>
+        job = job_queue.submit('create_unit', {
             'medicine_id': medicine_id,
-            'unit_nft_id': unit_nft_id,
-            'unit_serial': unit_serial,
-            'timestamp': datetime.now().isoformat()
-        }
+            'unit_serial': unit_serial
+        })
+        return job_accepted(job)
+        
+    except QueueFull as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 503
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+MAX_BULK_UNITS = CONF['network'].get('max_bulk_units', 10000)    # per bulk mint request
+
+@app.route('/api/medicines/<medicine_id>/units/bulk', methods=['POST'])
+def create_unit_nfts_bulk(medicine_id):
+    """Create many unit NFTs for an existing medicine using grouped transactions"""
+    try:
+        data = request.get_json() or {}
+        serials = data.get('serials')
+        if serials is None:
+            count = int(data.get('count', 0))
+            if count > MAX_BULK_UNITS:
+                raise ValueError(f'At most {MAX_BULK_UNITS} units per request')
+            prefix = data.get('prefix', 'U')
+            start = int(data.get('start', 1))
+            serials = [f'{prefix}{n:04d}' for n in range(start, start + count)]
+        elif not isinstance(serials, list) or not all(isinstance(s, str) and s for s in serials):
+            raise ValueError('serials must be a list of non-empty strings')
+        
+        if not serials:
+            return jsonify({
+                'success': False,
+                'error': 'Provide either serials or count'
+            }), 400
+        if len(serials) > MAX_BULK_UNITS:
+            raise ValueError(f'At most {MAX_BULK_UNITS} units per request')
+        
+        if medicine_id not in medicine_manager.artifacts.get('medicines', {}):
+            return jsonify({
+                'success': False,
+                'error': 'Medicine not found'
+            }), 404
+        # Asset name, unit name and URL all embed the serial; reject what the chain would
+        medicine_manager.check_unit_serials(medicine_id, serials)
+        
+        job = job_queue.submit('create_units_bulk', {
+            'medicine_id': medicine_id,
+            'serials': list(serials)
+        })
+        return job_accepted(job)
+        
+    except QueueFull as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 503
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/shipments', methods=['POST'])
+def create_shipment():
+    """Ship unit NFTs and/or batch ASA amounts to a configured account (runs as a job)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        receiver = data.get('receiver')
+        if receiver not in configured_accounts() or receiver in {m.key for m in MINTERS.minters}:
+            return jsonify({
+                'success': False,
+                'error': 'receiver must be a configured account other than the minter accounts'
+            }), 400
+        
+        try:
+            items = parse_items(data.get('unit_nft_ids', []), data.get('batches', []))
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid shipment: {e}'
+            }), 400
         
-        qr_code_data = json.dumps(qr_data)
-        qr_image = generate_qr_code(qr_code_data)
+        # The ID keys the shipment's txid journal, so a re-run doesn't send confirmed items twice
+        job = job_queue.submit('shipment', {'receiver': receiver, 'items': items,
+                                            'shipment_id': uuid.uuid4().hex})
+        return job_accepted(job)
         
+    except QueueFull as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 503
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """List recent jobs, optionally filtered by ?status="""
+    try:
+        status = request.args.get('status')
+        limit = min(int(request.args.get('limit', 50)), 500)
         return jsonify({
             'success': True,
-            'unit_nft_id': unit_nft_id,
-            'unit_serial': unit_serial,
-            'qr_code': qr_image,
-            'message': f'Unit NFT created successfully'
+            'jobs': job_queue.list(status, limit),
+            'queue_depth': job_queue.depth()
         })
-        
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
-@app.route('/api/medicines/<medicine_id>', methods=['GET'])
-def get_medicine_details(medicine_id):
-    """Get detailed information about a specific medicine"""
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get status, progress and result of a job"""
     try:
-        medicine = medicine_manager.get_medicine_info(medicine_id)
-        if not medicine:
+        job = job_queue.get(job_id)
+        if not job:
             return jsonify({
                 'success': False,
-                'error': 'Medicine not found'
+                'error': 'Job not found'
             }), 404
         
         return jsonify({
             'success': True,
-            'medicine': medicine_manager.artifacts['medicines'][medicine_id]
+            'job': job
         })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/medicines/<medicine_id>/labels', methods=['GET'])
+def get_medicine_labels(medicine_id):
+    """Stream QR labels for every unit of a medicine as ZIP or PDF (?format=pdf)"""
+    try:
+        fmt = request.args.get('format', 'zip').lower()
+        if fmt not in ('zip', 'pdf'):
+            return jsonify({
+                'success': False,
+                'error': f'Unsupported format: {fmt}'
+            }), 400
+        
+        medicine = medicine_manager.artifacts.get('medicines', {}).get(medicine_id)
+        if not medicine:
+            return jsonify({
+                'success': False,
+                'error': 'Medicine not found'
+            }), 404
+        
+        mimetype = 'application/zip' if fmt == 'zip' else 'application/pdf'
+        return Response(
+            stream_with_context(export_labels(medicine, fmt)),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="labels_{medicine_id}.{fmt}"'}
+        )
         
     except Exception as e:
         return jsonify({
@@ -161,25 +586,27 @@ def get_medicine_details(medicine_id):
 def verify_product(unit_nft_id):
     """Verify a product using its Unit NFT ID"""
     try:
-        # Find the medicine that contains this unit NFT
-        medicines = medicine_manager.artifacts.get('medicines', {})
-        found_medicine = None
-        found_unit_serial = None
-        
-        for medicine_id, medicine in medicines.items():
-            if 'unit_nfts' in medicine:
-                for serial, nft_id in medicine['unit_nfts'].items():
-                    if str(nft_id) == str(unit_nft_id):
-                        found_medicine = medicine
-                        found_unit_serial = serial
-                        break
-        
-        if not found_medicine:
+        # Single lookup in the manager's reverse index
+        found = medicine_manager.find_unit(unit_nft_id)
+        
+        if not found:
             return jsonify({
                 'success': False,
                 'error': 'Product not found'
             }), 404
         
+        _, found_medicine, found_unit_serial = found
+        
+        # The local record must still match the chain: exists, ours, not frozen
+        chain_verifier.start()
+        onchain = chain_verifier.check(unit_nft_id)
+        if onchain['status'] == 'failed':
+            return jsonify({
+                'success': False,
+                'error': f"On-chain check failed: {onchain['reason']}",
+                'onchain': onchain
+            }), 409
+        
         return jsonify({
             'success': True,
             'verification': {
@@ -189,7 +616,8 @@ def verify_product(unit_nft_id):
                 'unit_nft_id': unit_nft_id,
                 'expiry_date': found_medicine['expiry_date'],
                 'created_date': found_medicine['created_date'],
-                'authentic': True
+                'authentic': onchain['status'] == 'verified',
+                'onchain': onchain
             }
         })
         
@@ -199,6 +627,149 @@ def verify_product(unit_nft_id):
             'error': str(e)
         }), 500
 
+@app.route('/api/units/<unit_nft_id>/timeline', methods=['GET'])
+def unit_timeline(unit_nft_id):
+    """Custody history of a unit NFT from the custody log, oldest event first"""
+    try:
+        if not unit_nft_id.isdigit():
+            return jsonify({'success': False, 'error': 'Unit NFT ID must be a number'}), 400
+        
+        # One range scan on the per-asset index; no transaction history is read
+        events = medicine_manager.custody.timeline(unit_nft_id)
+        found = medicine_manager.find_unit(unit_nft_id)
+        if not found and not events:
+            return jsonify({
+                'success': False,
+                'error': 'Product not found'
+            }), 404
+        
+        events = describe(events)
+        unit = {'unit_nft_id': unit_nft_id}
+        if found:
+            medicine_id, medicine, unit_serial = found
+            unit.update({
+                'medicine_id': medicine_id,
+                'medicine_name': medicine['medicine_name'],
+                'batch_no': medicine['batch_no'],
+                'batch_asa_id': medicine['batch_asa_id'],
+                'unit_serial': unit_serial,
+                'expiry_date': medicine['expiry_date']
+            })
+        return jsonify({
+            'success': True,
+            'unit': unit,
+            'holder': {'address': events[-1]['receiver'], **(events[-1]['to'] or {})} if events else None,
+            'events': events
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/medicines/<medicine_id>/timeline', methods=['GET'])
+def medicine_timeline(medicine_id):
+    """Custody events for a batch ASA and all of its units, paged by event_id"""
+    try:
+        medicine = medicine_manager.artifacts['medicines'].get(medicine_id)
+        if medicine is None:
+            return jsonify({'success': False, 'error': 'Medicine not found'}), 404
+        try:
+            after = int(request.args.get('after', 0))
+            limit = max(1, min(int(request.args.get('limit', 500)), 5000))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'after and limit must be integers'}), 400
+        
+        events = describe(medicine_manager.custody.batch_timeline(medicine['batch_asa_id'], after, limit))
+        return jsonify({
+            'success': True,
+            'medicine_id': medicine_id,
+            'batch_asa_id': medicine['batch_asa_id'],
+            'events': events,
+            'next_after': events[-1]['event_id'] if len(events) == limit else None
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+MAX_VERIFY_BATCH = 5000          # per JSON response; NDJSON streams larger lists
+MAX_VERIFY_STREAM = 200000
+VERIFY_CHUNK = 1000
+
+def verification_groups(unit_nft_ids):
+    """Verify a list of unit NFT IDs, returns (groups, not_found) for the batch responses"""
+    groups, missing = medicine_manager.find_units(unit_nft_ids)
+    chain_verifier.start()
+    onchain = chain_verifier.check_many(unit_nft_id for _, units in groups.values() for unit_nft_id, _ in units)
+    results = []
+    for medicine_id, (medicine, units) in groups.items():
+        results.append({
+            'medicine_id': medicine_id,
+            'medicine_name': medicine['medicine_name'],
+            'batch_no': medicine['batch_no'],
+            'expiry_date': medicine['expiry_date'],
+            'created_date': medicine['created_date'],
+            'units': [{'unit_nft_id': str(unit_nft_id), 'unit_serial': unit_serial,
+                       'authentic': onchain[int(unit_nft_id)]['status'] == 'verified',
+                       'onchain': onchain[int(unit_nft_id)]}
+                      for unit_nft_id, unit_serial in units]
+        })
+    return results, [str(unit_nft_id) for unit_nft_id in missing]
+
+@app.route('/api/verify/batch', methods=['POST'])
+def verify_batch():
+    """Verify many unit NFTs in one request, grouped by medicine (NDJSON with ?stream=1)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        unit_nft_ids = data.get('unit_nft_ids')
+        if not isinstance(unit_nft_ids, list) or not unit_nft_ids:
+            return jsonify({
+                'success': False,
+                'error': 'unit_nft_ids must be a non-empty list'
+            }), 400
+        
+        stream = request.args.get('stream') == '1' or 'application/x-ndjson' in request.headers.get('Accept', '')
+        limit = MAX_VERIFY_STREAM if stream else MAX_VERIFY_BATCH
+        if len(unit_nft_ids) > limit:
+            return jsonify({
+                'success': False,
+                'error': f'At most {limit} IDs per request' + ('' if stream else ', use ?stream=1 for more')
+            }), 413
+        
+        if stream:
+            def generate():
+                # One line per medicine group, then the IDs not found, chunk by chunk
+                authentic = 0
+                not_found = 0
+                for start in range(0, len(unit_nft_ids), VERIFY_CHUNK):
+                    results, missing = verification_groups(unit_nft_ids[start:start + VERIFY_CHUNK])
+                    for result in results:
+                        authentic += sum(unit['authentic'] for unit in result['units'])
+                        yield json.dumps(result) + '\n'
+                    if missing:
+                        not_found += len(missing)
+                        yield json.dumps({'not_found': missing}) + '\n'
+                yield json.dumps({'summary': {'total': len(unit_nft_ids), 'authentic': authentic,
+                                              'not_found': not_found}}) + '\n'
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+        results, missing = verification_groups(unit_nft_ids)
+        return jsonify({
+            'success': True,
+            'total': len(unit_nft_ids),
+            'authentic': sum(unit['authentic'] for result in results for unit in result['units']),
+            'medicines': results,
+            'not_found': missing
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/verify/<unit_nft_id>')
 def verify_page(unit_nft_id):
     """Product verification page"""
@@ -209,21 +780,110 @@ def verify_page_no_id():
     """Product verification page without ID"""
     return render_template('verify.html', unit_nft_id='')
 
+@app.route('/api/evidence', methods=['POST'])
+def add_evidence():
+    """Record an AI inspection result (or its SHA-256) for the next anchoring batch"""
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            if data.get('ai_result') is not None:
+                hash_hex = evidence_hash(data['ai_result'])
+            else:
+                hash_hex = normalize_hash(data.get('hash', ''))
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                'success': False,
+                'error': f'Provide ai_result or a SHA-256 hash: {e}'
+            }), 400
+        
+        metadata = {key: data[key] for key in ('unit_nft_id', 'package') if data.get(key) is not None}
+        added = evidence_anchor.add(hash_hex, metadata)
+        record = evidence_anchor.store.get(hash_hex)
+        response = jsonify({
+            'success': True,
+            'hash': hash_hex,
+            'status': record['status'] or 'pending',
+            'proof_url': f'/api/evidence/{hash_hex}/proof'
+        })
+        response.status_code = 202 if added else 200
+        return response
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/evidence/<evidence_hash_hex>/proof', methods=['GET'])
+def get_evidence_proof(evidence_hash_hex):
+    """Merkle inclusion proof for an evidence hash, checked locally without an algod call"""
+    try:
+        try:
+            hash_hex = normalize_hash(evidence_hash_hex)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        record = evidence_anchor.store.get(hash_hex)
+        if record is None:
+            return jsonify({'success': False, 'error': 'Unknown evidence hash'}), 404
+        if record['status'] != 'anchored':
+            return jsonify({
+                'success': True,
+                'hash': hash_hex,
+                'status': 'pending',
+                'queued_at': record['created_at']
+            }), 202
+        
+        response = jsonify({
+            'success': True,
+            'hash': hash_hex,
+            'status': 'anchored',
+            'verified': verify_proof(hash_hex, record['proof'], record['root']),
+            'root': record['root'],
+            'leaf_index': record['leaf_index'],
+            'leaf_count': record['leaf_count'],
+            'proof': record['proof'],
+            'txid': record['txid'],
+            'round': record['round'],
+            'anchored_at': record['anchored_at'],
+            'metadata': record['metadata']
+        })
+        # An anchored proof never changes
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/qr/<unit_nft_id>')
 def get_qr_code(unit_nft_id):
-    """Generate QR code for a specific Unit NFT ID"""
+    """Serve the QR code for a specific Unit NFT ID as PNG (or SVG with ?format=svg)"""
     try:
-        # Create QR code data
-        qr_data = {
-            'unit_nft_id': unit_nft_id,
-            'verification_url': f'/verify/{unit_nft_id}',
-            'timestamp': datetime.now().isoformat()
+        fmt = request.args.get('format', 'png').lower()
+        if fmt not in CONTENT_TYPES:
+            return jsonify({
+                'success': False,
+                'error': f'Unsupported format: {fmt}'
+            }), 400
+
+        # Only our own units get a QR code, so arbitrary IDs can't fill the cache and disk
+        if not unit_nft_id.isdigit() or not medicine_manager.find_unit(unit_nft_id):
+            return jsonify({
+                'success': False,
+                'error': 'Product not found'
+            }), 404
+
+        etag = qr_etag(unit_nft_id, fmt)
+        headers = {
+            'ETag': f'"{etag}"',
+            'Cache-Control': 'public, max-age=31536000, immutable',
         }
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
         
-        qr_code_data = json.dumps(qr_data)
-        qr_image = generate_qr_code(qr_code_data)
-        
-        return qr_image, 200, {'Content-Type': 'image/png'}
+        image, _ = qr_cache.get(unit_nft_id, fmt)
+        return Response(image, mimetype=CONTENT_TYPES[fmt], headers=headers)
         
     except Exception as e:
         return jsonify({
@@ -231,43 +891,31 @@ def get_qr_code(unit_nft_id):
             'error': str(e)
         }), 500
 
-def generate_qr_code(data):
-    """Generate QR code and return as base64 encoded image"""
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convert to base64
-    img_buffer = io.BytesIO()
-    img.save(img_buffer, format='PNG')
-    img_buffer.seek(0)
-    
-    return base64.b64encode(img_buffer.getvalue()).decode()
-
 @app.route('/api/balance')
 def get_balance():
-    """Get account balance"""
+    """Get the latest balance snapshot for all configured accounts"""
     try:
-        from check_balance import ALGOD, acct  # type: ignore
-        addr, _ = acct("creator")
-        balance = ALGOD.account_info(addr)["amount"] / 1e6
+        balance_service.start()
+        # Cold start: wait for the refresh thread's first snapshot
+        balance_service.wait(timeout=BALANCE_WAIT_SECONDS)
+        accounts, snapshot_round, age = balance_service.get()
+        if 'creator' not in accounts:
+            return jsonify({
+                'success': False,
+                'error': 'Balance snapshot not ready yet'
+            }), 503
+
+        creator = accounts.get('creator', {})
         return jsonify({
-            'success': True,
-            'balance': balance,
-            'address': addr
+            'success': 'error' not in creator,
+            'balance': creator.get('balance'),
+            'address': creator.get('address'),
+            'accounts': accounts,
+            'round': snapshot_round,
+            'age_seconds': age
         })
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
-
-if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
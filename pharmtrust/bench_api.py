@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Concurrent benchmark and load test for the PharmaTrust API
+
+By default the app is started in-process against the fake ledger with a
+fresh database seeded with the requested catalog size. Use --url to drive an
+already running server instead.
+
+Usage:
+    python bench_api.py --units 1000,100000 --concurrency 16 --duration 10
+    python bench_api.py --units 10000 --output results.json --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+import requests
+
+ROOT = Path(__file__).resolve().parent
+SCENARIOS = ("medicines", "verify", "verify_batch", "qr", "mint", "bulk_mint")
+UNITS_PER_MEDICINE = 1000
+FIRST_SEEDED_NFT_ID = 10_000_000   # far from the fake ledger's own asset IDs
+MAX_QUEUED_JOBS = 1000             # the app's job queue cap; a client never has more than one job open
+JOB_TIMEOUT = 120                  # seconds a mint job may take before it counts as an error
+
+def seed_catalog(db_path, units):
+    """Fill a fresh store with medicines and unit NFTs (local records only)"""
+    sys.path.append(str(ROOT / "scripts"))
+    from storage import SQLiteStore  # type: ignore
+
+    store = SQLiteStore(db_path)
+    medicine_ids = []
+    nft_id = FIRST_SEEDED_NFT_ID
+    for m in range(max(1, -(-units // UNITS_PER_MEDICINE))):
+        medicine_id = f"Bench {m}_B{m:06d}_20250101"
+        store.put_medicine(medicine_id, {
+            "medicine_name": f"Bench {m}",
+            "batch_no": f"B{m:06d}",
+            "batch_asa_id": 1,
+            "total_units": UNITS_PER_MEDICINE,
+            "expiry_date": "2027-08",
+            "created_date": "2025-01-01T00:00:00",
+        })
+        count = min(UNITS_PER_MEDICINE, units - m * UNITS_PER_MEDICINE)
+        store.put_units(medicine_id, {f"U{i:06d}": nft_id + i for i in range(count)})
+        nft_id += count
+        medicine_ids.append(medicine_id)
+    store.close()
+    return medicine_ids, list(range(FIRST_SEEDED_NFT_ID, nft_id))
+
+def start_local_server(db_path, nft_ids):
+    """Import the app against the fake ledger and serve it on a free port"""
+    os.environ["PHARMTRUST_STORAGE_PATH"] = str(db_path)
+    os.environ["PHARMTRUST_UPLOAD_FOLDER"] = str(db_path.parent / "qr_codes")
+    sys.path.insert(0, str(ROOT))
+    from werkzeug.serving import make_server  # type: ignore
+    from app import app  # type: ignore
+    from common import ALGOD  # type: ignore
+    from minters import MINTERS  # type: ignore
+
+    # Put the seeded units on the fake ledger so verification finds them on-chain; the
+    # records have no minter field, so they belong to the creator account
+    ALGOD.register_assets(MINTERS.get().address, nft_ids)
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.port}"
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run_scenario(name, make_request, concurrency, duration):
+    """Call make_request(session) from `concurrency` threads for `duration` seconds"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        nonlocal errors
+        session = requests.Session()
+        local, local_errors = [], 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                ok = make_request(session)
+            except requests.RequestException:
+                ok = False
+            local.append(time.perf_counter() - start)
+            local_errors += 0 if ok else 1
+        with lock:
+            latencies.extend(local)
+            errors += local_errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    result = {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000 if latencies else None,
+        "p95_ms": percentile(latencies, 95) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 99) * 1000 if latencies else None,
+    }
+    print(f"  {name:<10} {result['requests']:>7} req  {result['rps']:>9.1f} req/s  "
+          f"p50 {result['p50_ms'] or 0:>7.2f} ms  p95 {result['p95_ms'] or 0:>7.2f} ms  "
+          f"p99 {result['p99_ms'] or 0:>7.2f} ms  errors {errors}")
+    return result
+
+def finish_job(session, base_url, response):
+    """Poll a 202 response's job until it finishes, True if it succeeded"""
+    if response.status_code != 202:
+        return False
+    url = f"{base_url}{response.json()['status_url']}"
+    deadline = time.perf_counter() + JOB_TIMEOUT
+    while time.perf_counter() < deadline:
+        status = session.get(url).json()["job"]["status"]
+        if status in ("succeeded", "failed"):
+            return status == "succeeded"
+        time.sleep(0.02)
+    return False
+
+def build_requests(base_url, medicine_ids, nft_ids):
+    """Return {scenario: make_request(session) -> bool}"""
+    counter = iter(range(10 ** 12))
+
+    def medicines(session):
+        return session.get(f"{base_url}/api/medicines").status_code == 200
+
+    def verify(session):
+        return session.get(f"{base_url}/api/verify/{random.choice(nft_ids)}").status_code == 200
+
+    def verify_batch(session):
+        # One carton's worth of scans
+        response = session.post(f"{base_url}/api/verify/batch",
+                                json={"unit_nft_ids": random.sample(nft_ids, min(100, len(nft_ids)))})
+        return response.status_code == 200
+
+    def qr(session):
+        return session.get(f"{base_url}/api/qr/{random.choice(nft_ids)}").status_code == 200
+
+    # Mints are timed from submit until the job finished, not just the 202
+    def mint(session):
+        response = session.post(f"{base_url}/api/medicines/{random.choice(medicine_ids)}/units",
+                                json={"unit_serial": f"BENCH{next(counter)}"})
+        return finish_job(session, base_url, response)
+
+    def bulk_mint(session):
+        n = next(counter)
+        response = session.post(f"{base_url}/api/medicines/{random.choice(medicine_ids)}/units/bulk",
+                                json={"count": 64, "prefix": f"BULK{n}-"})
+        return finish_job(session, base_url, response)
+
+    return {"medicines": medicines, "verify": verify, "verify_batch": verify_batch, "qr": qr,
+            "mint": mint, "bulk_mint": bulk_mint}
+
+def run_size(args, units):
+    """Benchmark one catalog size, returns the result record"""
+    if args.url:
+        # Use whatever catalog the running server has
+        base_url = args.url
+        medicines, cursor = {}, None
+        while True:
+            page = requests.get(f"{base_url}/api/medicines",
+                                params={"fields": "unit_nfts", "limit": 500, "cursor": cursor}).json()
+            medicines.update(page["medicines"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        medicine_ids = list(medicines)
+        nft_ids = [nft_id for medicine in medicines.values() for nft_id in medicine.get("unit_nfts", {}).values()]
+        units = len(nft_ids)
+    else:
+        # Before seeding: importing the storage module already builds the algod client
+        os.environ["PHARMTRUST_ALGOD_BACKEND"] = "fake"
+        db_path = Path(tempfile.mkdtemp(prefix="pharmtrust-bench-")) / "bench.db"
+        print(f"\nSeeding {units} units...")
+        medicine_ids, nft_ids = seed_catalog(db_path, units)
+        base_url = start_local_server(db_path, nft_ids)
+
+    print(f"Benchmarking {base_url} with {units} units, concurrency {args.concurrency}")
+    make = build_requests(base_url, medicine_ids, nft_ids)
+    results = {}
+    for name in args.scenarios:
+        results[name] = run_scenario(name, make[name], args.concurrency, args.duration)
+    return {"units": units, "scenarios": results}
+
+def compare(current, baseline, threshold):
+    """Print per-scenario deltas against a baseline, returns True if anything regressed"""
+    regressed = False
+    base_runs = {run["units"]: run for run in baseline.get("runs", [])}
+    print("\nComparison with baseline:")
+    for run in current["runs"]:
+        base = base_runs.get(run["units"])
+        if not base:
+            continue
+        for name, result in run["scenarios"].items():
+            old = base["scenarios"].get(name)
+            if not old or not old.get("rps") or not old.get("p95_ms") or not result.get("p95_ms"):
+                continue
+            rps_delta = (result["rps"] - old["rps"]) / old["rps"]
+            p95_delta = (result["p95_ms"] - old["p95_ms"]) / old["p95_ms"]
+            flag = ""
+            if rps_delta < -threshold or p95_delta > threshold:
+                flag = "  <-- REGRESSION"
+                regressed = True
+            print(f"  {run['units']:>8} {name:<10} rps {rps_delta:+7.1%}  p95 {p95_delta:+7.1%}{flag}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="PharmaTrust API benchmark")
+    parser.add_argument("--url", help="benchmark a running server instead of a local one")
+    parser.add_argument("--units", default="1000", help="comma separated catalog sizes, e.g. 1000,1000000")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed regression ratio")
+    args = parser.parse_args()
+    args.scenarios = [name for name in args.scenarios.split(",") if name]
+    sizes = [int(size) for size in args.units.split(",")]
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    if args.concurrency > MAX_QUEUED_JOBS and {"mint", "bulk_mint"} & set(args.scenarios):
+        parser.error(f"mint scenarios need --concurrency <= {MAX_QUEUED_JOBS}, the job queue cap")
+
+    if len(sizes) > 1 and not args.url:
+        # The app loads its catalog at import, so each size gets its own process
+        runs = []
+        for size in sizes:
+            out = Path(tempfile.mkdtemp()) / "run.json"
+            cmd = [sys.executable, __file__, "--units", str(size), "--concurrency", str(args.concurrency),
+                   "--duration", str(args.duration), "--scenarios", ",".join(args.scenarios),
+                   "--output", str(out)]
+            subprocess.run(cmd, check=True)
+            runs += json.loads(out.read_text())["runs"]
+    else:
+        runs = [run_size(args, size) for size in sizes]
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "commit": commit,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "target": args.url or "local-fake-ledger",
+        "runs": runs,
+    }
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -5,18 +5,18 @@
 # 1️⃣ Install SDK if not already installed
 # pip install py-algorand-sdk
 
-from algosdk.v2client import algod
 from algosdk import account, mnemonic
 from algosdk.transaction import AssetConfigTxn, PaymentTxn
+import os
+import sys
 import time
 
 # ------------------------
-# 2️⃣ Connect to AlgoNode TestNet
+# 2️⃣ Connect to TestNet (endpoints from config/accounts.json)
 # ------------------------
-ALGOD_ADDRESS = "https://testnet-api.algonode.cloud"
-ALGOD_TOKEN = ""  # Public endpoint, no key needed
+sys.path.append(os.path.join(os.path.dirname(__file__), 'scripts'))
+from common import ALGOD as algod_client  # type: ignore
 
-algod_client = algod.AlgodClient(ALGOD_TOKEN, ALGOD_ADDRESS)
 print("Connected to TestNet ✅")
 print("Node Status:", algod_client.status())
 
@@ -70,7 +70,7 @@ def main():
         print(f"\n✅ SUCCESS!")
         print(f"Medicine ID: {medicine_id}")
         print(f"Batch ASA ID: {batch_asa_id}")
-        print(f"Check artifacts.json for updated records")
+        print(f"Run list_medicines.py to see updated records")
         
         # Example transaction data to send to Llama 4
         transaction_data = {
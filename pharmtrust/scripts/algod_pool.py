@@ -0,0 +1,179 @@
+import base64
+import io
+import json
+import random
+import threading
+import time
+from urllib import parse
+import msgpack  # type: ignore
+import requests  # type: ignore
+from requests.adapters import HTTPAdapter  # type: ignore
+from algosdk import constants, encoding, error  # type: ignore
+from algosdk.v2client import algod  # type: ignore
+
+LONG_POLL_PATH = "/status/wait-for-block-after/"
+LONG_POLL_TIMEOUT = 70       # algod holds wait-for-block requests for up to a minute
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+class Endpoint:
+    """One algod node and its observed health"""
+
+    def __init__(self, address, token=""):
+        self.address = address.rstrip("/")
+        self.token = token
+        self.latency = 0.1           # EWMA of successful call latency, seconds
+        self.in_flight = 0
+        self.failures = 0            # consecutive failures
+        self.down_until = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def available(self, now):
+        return self.down_until <= now
+
+    def score(self):
+        return self.latency * (self.in_flight + 1)
+
+class PooledAlgodClient(algod.AlgodClient):
+    """AlgodClient over pooled keep-alive connections to one or more nodes.
+
+    Every call goes to the healthiest available endpoint (lowest latency
+    times load). Connection errors, timeouts, 429 and 5xx answers are retried
+    with jittered exponential backoff, preferring another endpoint, and put
+    the failing endpoint in an exponentially growing cooldown.
+    """
+
+    def __init__(self, endpoints, timeout=10.0, retries=3, backoff=0.2, max_backoff=5.0,
+                 pool_size=32, max_cooldown=60.0, headers=None):
+        self.endpoints = [Endpoint(e["address"], e.get("token", "")) for e in endpoints]
+        if not self.endpoints:
+            raise ValueError("At least one algod endpoint is required")
+        super().__init__(self.endpoints[0].token, self.endpoints[0].address, headers)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_cooldown = max_cooldown
+        self.lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.endpoints), pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def algod_request(self, method, requrl, params=None, data=None, headers=None,
+                      response_format="json", timeout=None):
+        header = {"User-Agent": "py-algorand-sdk"}
+        if self.headers:
+            header.update(self.headers)
+        if headers:
+            header.update(headers)
+        path = requrl if requrl in constants.unversioned_paths else algod.api_version_path_prefix + requrl
+        if params:
+            path += "?" + parse.urlencode(params)
+        if timeout is None:
+            timeout = LONG_POLL_TIMEOUT if requrl.startswith(LONG_POLL_PATH) else self.timeout
+
+        tried = set()
+        for attempt in range(self.retries + 1):
+            endpoint = self._pick(tried)
+            tried.add(endpoint)
+            request_header = dict(header)
+            if requrl not in constants.no_auth:
+                request_header[constants.algod_auth_header] = endpoint.token
+            try:
+                resp = self._send(endpoint, method, path, request_header, data, timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._failed(endpoint)
+                last = error.AlgodRequestError(f"{endpoint.address}: {e}")
+            else:
+                if resp.status_code < 400:
+                    return self._decode(resp, response_format)
+                last = self._http_error(resp)
+                if resp.status_code not in RETRY_STATUS:
+                    if attempt and method == "POST" and "already in ledger" in str(last):
+                        # An earlier attempt got through before the connection dropped
+                        return {"txId": self._first_txid(data)}
+                    raise last
+                self._failed(endpoint)
+            if attempt < self.retries:
+                time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+        raise last
+
+    def _pick(self, tried):
+        """Healthiest available endpoint, preferring ones not tried for this call"""
+        now = time.monotonic()
+        with self.lock:
+            candidates = [e for e in self.endpoints if e.available(now) and e not in tried] \
+                or [e for e in self.endpoints if e.available(now)]
+            if not candidates:
+                # Everything is cooling down, go with the one that recovers first
+                return min(self.endpoints, key=lambda e: e.down_until)
+            return min(candidates, key=Endpoint.score)
+
+    def _send(self, endpoint, method, path, header, data, timeout):
+        with self.lock:
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+        start = time.monotonic()
+        try:
+            resp = self.session.request(method, endpoint.address + path, headers=header,
+                                        data=data, timeout=timeout)
+        finally:
+            with self.lock:
+                endpoint.in_flight -= 1
+        if resp.status_code < 500 and resp.status_code != 429:
+            elapsed = time.monotonic() - start
+            with self.lock:
+                if not path.startswith(algod.api_version_path_prefix + LONG_POLL_PATH):
+                    endpoint.latency = 0.8 * endpoint.latency + 0.2 * elapsed
+                endpoint.failures = 0
+        return resp
+
+    def _failed(self, endpoint):
+        with self.lock:
+            endpoint.errors += 1
+            endpoint.failures += 1
+            cooldown = min(self.max_cooldown, 2 ** (endpoint.failures - 1))
+            endpoint.down_until = time.monotonic() + cooldown
+
+    def _decode(self, resp, response_format):
+        if response_format != "json":
+            return resp.content
+        if not resp.content:
+            return {}
+        try:
+            return resp.json()
+        except ValueError as e:
+            raise error.AlgodResponseError("Failed to parse JSON response from algod") from e
+
+    def _http_error(self, resp):
+        message, data = resp.text, None
+        try:
+            body = json.loads(resp.text)
+            message, data = body["message"], body.get("data")
+        except Exception:
+            pass
+        return error.AlgodHTTPError(message, resp.status_code, data)
+
+    def _first_txid(self, data):
+        item = next(msgpack.Unpacker(io.BytesIO(data), raw=False, strict_map_key=False))
+        return encoding.msgpack_decode(base64.b64encode(msgpack.packb(item)).decode()).get_txid()
+
+    def stats(self):
+        """Per-endpoint health for monitoring"""
+        now = time.monotonic()
+        with self.lock:
+            return [{
+                "address": e.address,
+                "available": e.available(now),
+                "latency_ms": round(e.latency * 1000, 1),
+                "in_flight": e.in_flight,
+                "requests": e.requests,
+                "errors": e.errors,
+            } for e in self.endpoints]
+
+def endpoints_from_config(network):
+    """network.algod_endpoints, or the single algod_address/algod_token pair"""
+    if network.get("algod_endpoints"):
+        return network["algod_endpoints"]
+    return [{"address": network["algod_address"], "token": network.get("algod_token", "")}]
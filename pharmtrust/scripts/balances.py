@@ -0,0 +1,81 @@
+import threading
+import time
+from common import ALGOD, TRACKER, configured_accounts
+
+class BalanceService:
+    """Keeps a snapshot of the balances of all configured accounts.
+
+    One refresh thread follows the confirmation tracker's block stream;
+    rounds that close while it is busy collapse into a single refresh of
+    the latest one, so requests never call algod themselves and algod sees
+    at most one account_info per account in flight. Holdings are left out
+    (exclude=all), only their count is kept.
+    """
+
+    def __init__(self, client=ALGOD, tracker=TRACKER, accounts=None):
+        self.client = client
+        self.tracker = tracker
+        self.accounts = accounts if accounts is not None else configured_accounts()
+        self.lock = threading.Lock()
+        self.snapshot = {}
+        self.snapshot_round = None
+        self.updated_at = None
+        self.wanted_round = None          # latest round seen by the block listener
+        self.wake = threading.Event()
+        self.ready = threading.Event()    # set once the first snapshot is in
+        self.started = False
+
+    def start(self):
+        """Take a first snapshot and refresh it on every new round"""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        threading.Thread(target=self._run, name="balance-refresh", daemon=True).start()
+        self.tracker.add_block_listener(self._on_block)
+
+    def _on_block(self, rnd, txids):
+        # Runs on the tracker thread: only note the round, latest wins
+        with self.lock:
+            self.wanted_round = rnd
+        self.wake.set()
+
+    def _run(self):
+        self.refresh()
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            with self.lock:
+                rnd = self.wanted_round
+            self.refresh(rnd)
+
+    def refresh(self, rnd=None):
+        """Fetch account_info for every account and swap in a new snapshot"""
+        snapshot = {}
+        for key, addr in self.accounts.items():
+            try:
+                info = self.client.account_info(addr, exclude="all")
+                snapshot[key] = {
+                    "address": addr,
+                    "balance": info["amount"] / 1e6,
+                    "min_balance": info.get("min-balance", 0) / 1e6,
+                    "assets_opted_in": info.get("total-assets-opted-in", 0),
+                    "round": info.get("round", rnd),
+                }
+            except Exception as e:
+                snapshot[key] = {"address": addr, "error": str(e)}
+        with self.lock:
+            self.snapshot = snapshot
+            self.snapshot_round = rnd
+            self.updated_at = time.time()
+        self.ready.set()
+
+    def wait(self, timeout=None):
+        """Block until the first snapshot exists, returns False on timeout"""
+        return self.ready.wait(timeout)
+
+    def get(self):
+        """Return (snapshot, round, age_seconds); age is None before the first refresh"""
+        with self.lock:
+            age = time.time() - self.updated_at if self.updated_at else None
+            return self.snapshot, self.snapshot_round, age
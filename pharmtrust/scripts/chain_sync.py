@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Rebuild and keep the local store in sync with assets created on-chain
+Usage: python chain_sync.py [once|follow|reset]
+"""
+
+import base64
+import json
+import re
+import sys
+import threading
+from datetime import datetime
+from common import CONF, INDEXER
+from custody import open_custody_log
+from minters import MINTERS
+from storage import open_store
+
+CHECKPOINT_KEY = "sync_round"
+ORPHANS_KEY = "sync_orphans"
+WINDOW_ROUNDS = 100000       # rounds read and sorted together
+SYNC_LEASE = "chain-sync"
+
+# Metadata URLs written by MedicineManager
+BATCH_URL = re.compile(r"/batch_(?P<medicine_id>.+)\.json$")
+UNIT_URL = re.compile(r"/unit_(?P<medicine_id>.+)\.json#arc3$")
+
+def split_medicine_id(medicine_id, asset_name):
+    """Split "{name}_{batch}_{YYYYMMDD}" into (name, batch_no) using the batch asset name"""
+    prefix = medicine_id.rsplit("_", 1)[0]
+    for i, ch in enumerate(prefix):
+        if ch == "_" and asset_name == f"{prefix[:i]}Batch-{prefix[i + 1:]}":
+            return prefix[:i], prefix[i + 1:]
+    name, _, batch_no = prefix.partition("_")
+    return name, batch_no
+
+class ChainSync:
+    """Backfills and follows asset creations by the minter accounts through an indexer.
+
+    Every acfg transaction sent by a minter since its checkpoint round is
+    read in windows of rounds, each sorted oldest first whatever order the
+    indexer pages in; batch ASAs become medicine records and unit NFTs are
+    added to their medicine. Units whose batch isn't known yet are kept in
+    the meta table and retried. Records that already exist locally are kept
+    as they are. The checkpoints are stored in the store's meta table after
+    each window, so an interrupted backfill resumes where it stopped.
+    """
+
+    def __init__(self, store, indexer=INDEXER, creators=None, page_size=1000, on_change=None, custody=None,
+                 window_rounds=WINDOW_ROUNDS):
+        self.store = store
+        self.indexer = indexer
+        self.creators = creators or MINTERS.addresses()
+        self.page_size = page_size
+        self.window_rounds = window_rounds
+        self.on_change = on_change      # called with the medicine IDs each page changed
+        self.custody = custody          # CustodyLog that gets a mint event per synced asset
+        self.thread = None
+
+    def checkpoint_key(self, creator):
+        # The first account keeps the original key so existing checkpoints stay valid
+        return CHECKPOINT_KEY if creator == self.creators[0] else f"{CHECKPOINT_KEY}:{creator}"
+
+    def checkpoint(self, creator=None):
+        """Last fully synced round for one minter, or the oldest across all of them"""
+        if creator is not None:
+            return self.store.get_meta(self.checkpoint_key(creator), 0)
+        return min(self.checkpoint(creator) for creator in self.creators)
+
+    def reset(self):
+        for creator in self.creators:
+            self.store.set_meta(self.checkpoint_key(creator), 0)
+            self.store.set_meta(f"{ORPHANS_KEY}:{creator}", [])
+
+    def sync_once(self):
+        """Process everything after the checkpoints, returns (medicines, units) added"""
+        added_medicines = added_units = 0
+        for creator in self.creators:
+            medicines, units = self.sync_creator(creator)
+            added_medicines += medicines
+            added_units += units
+        return added_medicines, added_units
+
+    def sync_creator(self, creator):
+        """Process one minter's asset creations after its checkpoint, oldest round first"""
+        key = self.checkpoint_key(creator)
+        orphan_key = f"{ORPHANS_KEY}:{creator}"
+        start = self.checkpoint(creator)
+        orphans = self.store.get_meta(orphan_key, [])
+        target = None
+        catalog = None
+        added_medicines = added_units = 0
+        lo = start + 1
+        while True:
+            # A real indexer returns address searches newest first, so a window
+            # is read completely and sorted before anything in it is applied
+            hi = lo + self.window_rounds - 1 if target is None else min(lo + self.window_rounds - 1, target)
+            transactions, current = self.fetch_window(creator, lo, hi)
+            if target is None:
+                target = current
+                hi = min(hi, target)
+            transactions.sort(key=lambda t: (t["confirmed-round"], t.get("intra-round-offset", 0)))
+
+            if (transactions or orphans) and catalog is None:
+                # Only rounds with new assets need the local catalog
+                artifacts = self.store.load()["medicines"]
+                catalog = (artifacts, {(m["medicine_name"], m["batch_no"]): medicine_id
+                                       for medicine_id, m in artifacts.items()})
+            if transactions or orphans:
+                medicines, units, orphans = self.apply(orphans + transactions, *catalog)
+                added_medicines += medicines
+                added_units += units
+                self.store.set_meta(orphan_key, orphans)
+
+            # Everything up to hi is applied or parked with the orphans
+            self.store.set_meta(key, max(start, hi))
+            if hi >= target:
+                break
+            lo = hi + 1
+        if orphans:
+            print(f"Chain sync: {len(orphans)} unit NFTs from {creator} wait for their batch ASA")
+        return added_medicines, added_units
+
+    def fetch_window(self, creator, lo, hi):
+        """Every acfg sent by creator in rounds lo..hi, in whatever order the indexer pages them"""
+        transactions, next_page, current = [], None, None
+        while True:
+            page = self.indexer.search_transactions(
+                address=creator, address_role="sender", txn_type="acfg",
+                min_round=lo, max_round=hi, limit=self.page_size, next_page=next_page)
+            if current is None:
+                current = page.get("current-round", hi)
+            transactions.extend(page.get("transactions", []))
+            next_page = page.get("next-token")
+            if not page.get("transactions") or not next_page:
+                return transactions, current
+
+    def apply(self, transactions, artifacts, by_batch):
+        """Store the medicines and units in round-ordered transactions.
+
+        Returns (medicines added, units added, unit transactions whose batch
+        is not known yet); those are retried on the next window or sync.
+        """
+        medicines, units, mints, orphans = {}, {}, [], []
+        for txn in transactions:
+            parsed = self.parse(txn, artifacts, by_batch)
+            if parsed is None:
+                continue
+            kind, medicine_id, record = parsed
+            if kind == "orphan":
+                orphans.append(txn)
+                continue
+            # Known medicines and units still get their mint event, so a reset backfills the custody log
+            if kind == "medicine":
+                if medicine_id not in artifacts:
+                    medicines[medicine_id] = record
+                    artifacts[medicine_id] = dict(record, unit_nfts={})
+                    by_batch[(record["medicine_name"], record["batch_no"])] = medicine_id
+                asset_id, amount = record["batch_asa_id"], record["total_units"]
+                batch_asa_id = asset_id
+            else:
+                if self.store.find_unit(record[1]) is None:
+                    units.setdefault(medicine_id, {})[record[0]] = record[1]
+                asset_id, amount = record[1], 1
+                batch_asa_id = artifacts[medicine_id]["batch_asa_id"]
+            mints.append({"asset_id": asset_id, "batch_asa_id": batch_asa_id,
+                          "kind": "mint", "receiver": txn["sender"], "amount": amount,
+                          "round": txn.get("confirmed-round"), "txid": txn["id"]})
+
+        for medicine_id, medicine in medicines.items():
+            self.store.put_medicine(medicine_id, medicine)
+        for medicine_id, medicine_units in units.items():
+            self.store.put_units(medicine_id, medicine_units)
+        if self.custody is not None and mints:
+            self.custody.record(mints, source="chain")
+        if self.on_change and (medicines or units):
+            self.on_change(set(medicines) | set(units))
+        return len(medicines), sum(len(u) for u in units.values()), orphans
+
+    def parse(self, txn, artifacts, by_batch):
+        """Turn an indexer acfg transaction into ("medicine", id, record), ("unit", id, (serial, asset_id))
+        or ("orphan", None, None) for a unit whose batch is unknown"""
+        asset_id = txn.get("created-asset-index")
+        params = txn.get("asset-config-transaction", {}).get("params", {})
+        if not asset_id or not params:
+            return None  # reconfiguration or destroy, not a creation
+        url = params.get("url", "")
+        name = params.get("name", "")
+
+        match = BATCH_URL.search(url)
+        if match:
+            medicine_id = match.group("medicine_id")
+            medicine_name, batch_no = split_medicine_id(medicine_id, name)
+            return "medicine", medicine_id, {
+                "medicine_name": medicine_name,
+                "batch_no": batch_no,
+                "batch_asa_id": asset_id,
+                "total_units": params.get("total", 0),
+                "expiry_date": self.note_expiry(txn.get("note")),
+                "created_date": datetime.fromtimestamp(txn.get("round-time", 0)).isoformat(),
+                "minter": txn.get("sender"),
+            }
+
+        match = UNIT_URL.search(url)
+        if match and " Unit #" in name:
+            medicine_name, unit_serial = name.rsplit(" Unit #", 1)
+            url_id = match.group("medicine_id")
+            if not url_id.endswith(f"_{unit_serial}"):
+                return None
+            medicine_id = url_id[:-len(unit_serial) - 1]
+            if medicine_id not in artifacts:
+                # Units minted on a later day than their batch carry that day's date in the URL
+                prefix = medicine_id.rsplit("_", 1)[0]
+                batch_no = prefix[len(medicine_name) + 1:] if prefix.startswith(f"{medicine_name}_") else None
+                medicine_id = by_batch.get((medicine_name, batch_no))
+                if medicine_id is None:
+                    return "orphan", None, None  # batch not synced yet
+            return "unit", medicine_id, (unit_serial, asset_id)
+        return None
+
+    def note_expiry(self, note):
+        """Expiry from the batch ASA's ARC-69 note, if it has one"""
+        try:
+            return json.loads(base64.b64decode(note))["properties"]["expiry"]
+        except Exception:
+            return ""
+
+    def start(self, interval=10.0):
+        """Follow new rounds in a background thread; one worker at a time holds the sync lease"""
+        if self.thread is not None:
+            return self.thread
+
+        def run():
+            while True:
+                try:
+                    self.store.reserve([SYNC_LEASE], ttl=max(60, interval * 5))
+                except ValueError:
+                    pass  # another worker is syncing
+                else:
+                    try:
+                        self.sync_once()
+                    except Exception as e:
+                        print(f"Chain sync error: {e}")
+                    finally:
+                        self.store.release([SYNC_LEASE])
+                threading.Event().wait(interval)
+
+        self.thread = threading.Thread(target=run, name="chain-sync", daemon=True)
+        self.thread.start()
+        return self.thread
+
+def main():
+    action = sys.argv[1] if len(sys.argv) > 1 else "once"
+    if action not in ("once", "follow", "reset"):
+        print("Usage: python chain_sync.py [once|follow|reset]")
+        return
+    if INDEXER is None:
+        print("❌ ERROR: No indexer configured, set network.indexer_address in config/accounts.json")
+        return
+
+    store = open_store()
+    sync = ChainSync(store, custody=open_custody_log(store))
+    if action == "reset":
+        sync.reset()
+        print("Checkpoint reset, the next sync rescans from the first round")
+        return
+
+    print(f"Syncing assets created by {len(sync.creators)} minter accounts after round {sync.checkpoint()}")
+    try:
+        while True:
+            medicines, units = sync.sync_once()
+            print(f"✅ Added {medicines} medicines and {units} unit NFTs, now at round {sync.checkpoint()}")
+            if action != "follow":
+                break
+            threading.Event().wait(CONF["network"].get("sync_interval", 10.0))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from algosdk.error import AlgodHTTPError  # type: ignore
+from common import ALGOD, CONF, TRACKER
+from minters import MINTERS
+
+# Transaction types whose asset ID (block field) can change a verification result
+ASSET_TXN_FIELDS = {"acfg": "caid", "afrz": "faid", "axfer": "xaid"}
+
+class ChainVerifier:
+    """Checks unit NFTs against the chain, behind an LRU cache with a TTL.
+
+    A unit passes when the asset exists, was created by one of the minter
+    accounts and the holder's copy is not frozen. Unknown IDs are cached for a shorter
+    negative_ttl. Cached entries are dropped as soon as an asset config,
+    freeze or transfer for that asset shows up in a new block.
+    """
+
+    def __init__(self, client=ALGOD, tracker=TRACKER, creators=None, ttl=300.0,
+                 negative_ttl=30.0, max_entries=100000, holder=None, workers=8):
+        self.client = client
+        self.tracker = tracker
+        self.creators = set(creators or MINTERS.addresses())
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.holder = holder              # asset_id -> current holder address, or None for the creator
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="verify")
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()     # asset_id -> (result, fetched_at, round)
+        self.blocks = queue.Queue()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.inflight = {}               # asset_id -> [changed, new_assets] seen during a fetch
+        self.started = False
+
+    def start(self):
+        """Follow new blocks and invalidate entries touched by them"""
+        if self.started:
+            return
+        self.started = True
+        threading.Thread(target=self._invalidate_blocks, name="verify-invalidation", daemon=True).start()
+        self.tracker.add_block_listener(self._on_block)
+
+    def _on_block(self, rnd, txids):
+        # Empty blocks can't touch any asset; fetching happens off the tracker thread
+        if txids is None or txids:
+            self.blocks.put(rnd)
+
+    def _invalidate_blocks(self):
+        while True:
+            rnd = self.blocks.get()
+            try:
+                block = self.tracker.block(rnd).get("block", {})
+            except Exception as e:
+                # Can't tell what changed, so trust nothing cached before this block
+                print(f"Verification cache: block {rnd} unavailable ({e}), clearing cache")
+                self.clear()
+                continue
+            touched = set()
+            created = False
+            for stxn in block.get("txns", []):
+                txn = stxn.get("txn", {})
+                field = ASSET_TXN_FIELDS.get(txn.get("type"))
+                if field and txn.get(field):
+                    touched.add(int(txn[field]))
+                elif txn.get("type") == "acfg":
+                    created = True
+            self.invalidate(touched, negatives=created)
+
+    def invalidate(self, asset_ids, negatives=False):
+        """Drop cached entries for asset_ids, and every negative entry if negatives is set"""
+        with self.lock:
+            for asset_id in asset_ids:
+                if self.entries.pop(asset_id, None) is not None:
+                    self.invalidations += 1
+                if asset_id in self.inflight:
+                    self.inflight[asset_id][0] = True
+            if negatives:
+                for asset_id in [a for a, (result, _, _) in self.entries.items() if not result["exists"]]:
+                    del self.entries[asset_id]
+                    self.invalidations += 1
+                for flags in self.inflight.values():
+                    flags[1] = True
+
+    def clear(self):
+        with self.lock:
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+            for flags in self.inflight.values():
+                flags[0] = True
+
+    def check(self, asset_id):
+        """Return the on-chain status of a unit NFT.
+
+        The dict has status ("verified", "failed" or "unavailable"), reason,
+        checked_round, age_seconds and cached.
+        """
+        asset_id = int(asset_id)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(asset_id)
+            if entry is not None:
+                result, fetched_at, rnd = entry
+                ttl = self.ttl if result["exists"] else self.negative_ttl
+                if now - fetched_at < ttl:
+                    self.entries.move_to_end(asset_id)
+                    self.hits += 1
+                    return self._describe(result, fetched_at, rnd, cached=True)
+                del self.entries[asset_id]
+            self.misses += 1
+            flags = self.inflight.setdefault(asset_id, [False, False])
+
+        try:
+            rnd = self.tracker.last_round
+            result = self._fetch(asset_id)
+        except Exception as e:
+            # Node trouble is not cached, the next scan tries again
+            with self.lock:
+                self.inflight.pop(asset_id, None)
+            return {"status": "unavailable", "reason": str(e), "checked_round": None,
+                    "age_seconds": None, "cached": False}
+
+        fetched_at = time.monotonic()
+        with self.lock:
+            self.inflight.pop(asset_id, None)
+            # A block seen mid-fetch may have changed the asset, so don't cache the answer
+            changed, new_assets = flags
+            if changed or (new_assets and not result["exists"]) or not result.get("settled", True):
+                return self._describe(result, fetched_at, rnd, cached=False)
+            self.entries[asset_id] = (result, fetched_at, rnd)
+            self.entries.move_to_end(asset_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return self._describe(result, fetched_at, rnd, cached=False)
+
+    def check_many(self, asset_ids):
+        """check() for many IDs, fetching cache misses in parallel; returns {asset_id: status}"""
+        asset_ids = list(dict.fromkeys(int(asset_id) for asset_id in asset_ids))
+        return dict(zip(asset_ids, self.pool.map(self.check, asset_ids)))
+
+    def _fetch(self, asset_id):
+        try:
+            params = self.client.asset_info(asset_id)["params"]
+        except AlgodHTTPError as e:
+            if e.code == 404:
+                return {"exists": False, "reason": "Asset does not exist or was destroyed"}
+            raise
+        if params.get("creator") not in self.creators:
+            return {"exists": True, "reason": "Asset was not created by the manufacturer"}
+
+        holder = (self.holder(asset_id) if self.holder else None) or params["creator"]
+        try:
+            holding = self.client.account_asset_info(holder, asset_id)
+            holding = holding.get("asset-holding", holding)
+        except AlgodHTTPError as e:
+            if e.code != 404:
+                raise
+            holding = None
+        # A holder that no longer has the unit means a transfer the lookup hasn't
+        # caught up with yet; answer from what we saw but don't cache it
+        settled = bool(holding and holding.get("amount"))
+        if holding and holding.get("is-frozen", False):
+            return {"exists": True, "reason": "Asset is frozen", "settled": settled}
+        return {"exists": True, "reason": None, "settled": settled}
+
+    def _describe(self, result, fetched_at, rnd, cached):
+        return {
+            "status": "failed" if result["reason"] else "verified",
+            "reason": result["reason"],
+            "checked_round": rnd,
+            "age_seconds": round(time.monotonic() - fetched_at, 3),
+            "cached": cached,
+        }
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+def indexer_holder(indexer):
+    """holder callable asking an indexer which account has a unit NFT now"""
+    def holder(asset_id):
+        balances = indexer.asset_balances(asset_id, min_balance=0, limit=1).get("balances", [])
+        return balances[0]["address"] if balances else None
+    return holder
+
+def make_verifier(holder=None):
+    """ChainVerifier configured from network.verify_ttl / verify_negative_ttl / verify_cache_size"""
+    network = CONF["network"]
+    return ChainVerifier(ttl=network.get("verify_ttl", 300.0),
+                         negative_ttl=network.get("verify_negative_ttl", 30.0),
+                         max_entries=network.get("verify_cache_size", 100000),
+                         holder=holder)
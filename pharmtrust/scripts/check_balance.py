@@ -1,4 +1,9 @@
 from common import ALGOD, acct
-addr, _ = acct("creator")
-bal = ALGOD.account_info(addr)["amount"] / 1e6
-print(addr, f"{bal} ALGO")
+
+def main():
+    addr, _ = acct("creator")
+    bal = ALGOD.account_info(addr)["amount"] / 1e6
+    print(addr, f"{bal} ALGO")
+
+if __name__ == "__main__":
+    main()
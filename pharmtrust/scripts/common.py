@@ -1,14 +1,73 @@
+import copy
+import functools
 import json
+import os
+import threading
+import time
 from pathlib import Path
 from algosdk import account, mnemonic  # type: ignore
-from algosdk.v2client import algod  # type: ignore
+from algosdk.v2client import indexer  # type: ignore
+from algod_pool import PooledAlgodClient, endpoints_from_config
+from confirmations import ConfirmationTracker
+from metrics import InstrumentedClient
+from submitter import PRIORITY_NORMAL, Submitter
+from tracing import span
 
 ROOT = Path(__file__).resolve().parents[2]  # Go up to the root directory
 CONF = json.loads((ROOT / "config" / "accounts.json").read_text())
 
-ALGOD = algod.AlgodClient(CONF["network"]["algod_token"], CONF["network"]["algod_address"])
+# Top-level config sections that hold settings rather than accounts
+SETTINGS_SECTIONS = ("network", "storage", "minters", "evidence")
 
+def configured_accounts(conf=CONF):
+    """Return {key: address} for every account in config/accounts.json"""
+    accounts = {}
+    for key, entry in conf.items():
+        if not isinstance(entry, dict) or key in SETTINGS_SECTIONS:
+            continue
+        addr = entry.get("address")
+        if not addr and entry.get("mnemonic"):
+            addr = account.address_from_private_key(mnemonic.to_private_key(entry["mnemonic"]))
+        if addr:
+            accounts[key] = addr
+    return accounts
+
+def make_algod(network):
+    """Build the algod client selected by network.backend ("algod" or "fake").
+    
+    The real client pools connections across network.algod_endpoints (or the
+    single algod_address) with retries and failover; every script shares it.
+    
+    PHARMTRUST_ALGOD_BACKEND overrides the config, e.g. for benchmarks.
+    """
+    backend = os.environ.get("PHARMTRUST_ALGOD_BACKEND", network.get("backend", "algod"))
+    if backend == "fake":
+        from fake_algod import FakeAlgod
+        return FakeAlgod(funded=configured_accounts().values(), **network.get("fake", {}))
+    return PooledAlgodClient(endpoints_from_config(network),
+                             timeout=network.get("timeout", 10.0),
+                             retries=network.get("retries", 3))
+
+def make_indexer(network):
+    """Build the indexer client for the selected backend, or None if none is configured"""
+    backend = os.environ.get("PHARMTRUST_ALGOD_BACKEND", network.get("backend", "algod"))
+    if backend == "fake":
+        from fake_algod import FakeIndexer
+        return FakeIndexer(ALGOD, newest_first=network.get("fake", {}).get("indexer_newest_first", False))
+    if not network.get("indexer_address"):
+        return None
+    return indexer.IndexerClient(network.get("indexer_token", ""), network["indexer_address"])
+
+# Every call is timed for /metrics; the wrapper is transparent otherwise
+ALGOD = InstrumentedClient(make_algod(CONF["network"]))
+INDEXER = make_indexer(CONF["network"])
+
+# One block-following thread per process resolves every outstanding confirmation
+TRACKER = ConfirmationTracker(ALGOD)
+
+@functools.lru_cache(maxsize=None)
 def acct(key: str):
+    """(address, private key) for a configured account, decoded once per process"""
     m = CONF[key]["mnemonic"]
     a = CONF[key]["address"]
     sk = mnemonic.to_private_key(m)
@@ -16,19 +75,128 @@ def acct(key: str):
     assert addr == a, f"Address mismatch for {key}: config {a} vs derived {addr}"
     return addr, sk
 
+class ParamsCache:
+    """Shares one suggested_params() result until a new round is seen or the TTL expires.
+    
+    Handed-out params get first-valid moved up to the latest known round and
+    last-valid set to first-valid + validity, so transactions built from a
+    cached entry stay valid for the full window.
+    """
+    
+    def __init__(self, client, tracker, ttl=5.0, validity=1000):
+        self.client = client
+        self.tracker = tracker
+        self.ttl = ttl
+        self.validity = validity
+        self.lock = threading.Lock()
+        self.params = None
+        self.fetched_at = 0.0
+        self.hits = 0
+        self.misses = 0
+    
+    def current_round(self):
+        """Latest round known without an extra algod call"""
+        tracked = self.tracker.last_round if self.tracker.thread is not None else None
+        return max(tracked or 0, self.params.first if self.params else 0)
+    
+    def get(self):
+        with self.lock:
+            fresh = (self.params is not None
+                     and time.monotonic() - self.fetched_at < self.ttl
+                     and self.current_round() <= self.params.first)
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self.params = self.client.suggested_params()
+                self.fetched_at = time.monotonic()
+            
+            params = copy.copy(self.params)
+            params.first = self.current_round()
+            params.last = params.first + self.validity
+            return params
+    
+    def invalidate(self):
+        with self.lock:
+            self.params = None
+    
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+PARAMS = ParamsCache(ALGOD, TRACKER,
+                     ttl=CONF["network"].get("params_ttl", 5.0),
+                     validity=CONF["network"].get("params_validity", 1000))
+
 def sp():
-    return ALGOD.suggested_params()
+    """Suggested params from the shared cache"""
+    return PARAMS.get()
 
 def wait(txid: str, timeout=10):
-    last = ALGOD.status().get("last-round")
-    start = last
-    while last < start + timeout:
-        res = ALGOD.pending_transaction_info(txid)
-        if res.get("confirmed-round", 0) > 0:
-            return res
-        last += 1
-        ALGOD.status_after_block(last)
-    raise TimeoutError(f"Tx {txid} not confirmed in {timeout} rounds")
+    """Block until txid is confirmed, via the shared confirmation tracker"""
+    return TRACKER.register(txid, timeout).result()
+
+def wait_async(txid: str, timeout=10):
+    """Awaitable version of wait()"""
+    return TRACKER.register_async(txid, timeout)
+
+# All signed groups go out through one rate-limited, prioritised queue per process
+SUBMITTER = Submitter(ALGOD, PARAMS.current_round,
+                      rate=CONF["network"].get("submit_rate", 40.0),
+                      burst=CONF["network"].get("submit_burst", 20),
+                      max_concurrency=CONF["network"].get("submit_concurrency", 16),
+                      target_latency=CONF["network"].get("submit_target_latency", 0.5))
+
+ASSET_MIN_BALANCE = 100000   # microAlgos an account must keep per asset it creates or holds
+MAX_GROUP_SIZE = 16          # Algorand atomic group limit
+MAX_GROUPS_IN_FLIGHT = 32    # Groups submitted before waiting on confirmations
+
+def send_groups(groups, progress=None, label="transactions", priority=PRIORITY_NORMAL, last_valid=None):
+    """Submit signed atomic groups in windows, keeping several in flight.
+    
+    groups is a list of (keys, (blob, txids)) as returned by
+    Signer.sign_groups, with one key per transaction; transactions keyed None
+    are not reported. Groups go through SUBMITTER at the given priority and
+    are retried until last_valid. progress(done, total) is called after each
+    window. Returns ({key: confirmed txn info plus its txid}, {key: error}).
+    """
+    total = sum(1 for keys, _ in groups for key in keys if key is not None)
+    confirmed, failed = {}, {}
+    for w in range(0, len(groups), MAX_GROUPS_IN_FLIGHT):
+        window = groups[w:w + MAX_GROUPS_IN_FLIGHT]
+        
+        # Submit the whole window before waiting on any of it
+        in_flight = []
+        with span("submit", groups=len(window)):
+            submitted = [(keys, txids, SUBMITTER.submit(blob, txids[0], last_valid, priority))
+                         for keys, (blob, txids) in window]
+            for keys, txids, submission in submitted:
+                try:
+                    submission.result()
+                    in_flight.append((keys, txids, [TRACKER.register(txid) for txid in txids]))
+                except Exception as e:
+                    failed.update({key: str(e) for key in keys if key is not None})
+        
+        with span("confirm", groups=len(in_flight)):
+            for keys, txids, futures in in_flight:
+                for key, txid, future in zip(keys, txids, futures):
+                    try:
+                        info = future.result()
+                        if key is not None:
+                            confirmed[key] = dict(info, txid=txid)
+                    except Exception as e:
+                        if key is not None:
+                            failed[key] = str(e)
+        print(f"Confirmed {len(confirmed)}/{total} {label}")
+        if progress:
+            progress(len(confirmed) + len(failed), total)
+    
+    return confirmed, failed
 
 # common.py
 import json
@@ -0,0 +1,160 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from metrics import CONFIRMATION_ROUNDS, CONFIRMATION_SECONDS
+
+SHARED_ROUNDS = 16    # recent blocks kept for listeners that read the same round
+
+class ConfirmationTracker:
+    """Follows blocks in one background thread and resolves registered txids.
+
+    Each registered transaction gets a concurrent.futures.Future (or an
+    asyncio awaitable via register_async) that resolves with the pending
+    transaction info once confirmed, or fails with TimeoutError once the
+    timeout in rounds has passed.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.lock = threading.Lock()
+        self.pending = {}      # txid -> [future, expire_round, checked, registered_at, registered_round]
+        self.listeners = []    # callables(round, txids) run for every new block
+        self.shared = OrderedDict()  # (kind, round) -> Future, one fetch shared by all readers
+        self.last_round = None
+        self.thread = None
+
+    def start(self):
+        """Start following blocks (idempotent)"""
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.last_round = self.client.status().get("last-round")
+            self.thread = threading.Thread(target=self._run, name="confirmation-tracker", daemon=True)
+            self.thread.start()
+
+    def register(self, txid, timeout=10):
+        """Track a txid, returns a Future resolving to its pending transaction info"""
+        self.start()
+        with self.lock:
+            entry = self.pending.get(txid)
+            if entry is not None:
+                return entry[0]
+            future = Future()
+            self.pending[txid] = [future, self.last_round + timeout, False, time.monotonic(), self.last_round]
+        return future
+
+    def register_async(self, txid, timeout=10):
+        """Same as register, but returns an asyncio awaitable"""
+        return asyncio.wrap_future(self.register(txid, timeout))
+
+    def pending_count(self):
+        """Number of transactions still waiting for confirmation"""
+        with self.lock:
+            return len(self.pending)
+
+    def add_block_listener(self, listener):
+        """Call listener(round, txids) for every new block; txids may be None"""
+        self.start()
+        with self.lock:
+            self.listeners.append(listener)
+
+    def block(self, rnd):
+        """block_info for a round, fetched once however many listeners read it"""
+        return self._shared("block", rnd, lambda: self.client.block_info(round_num=rnd))
+
+    def block_txids(self, rnd):
+        """The round's txids in block order, fetched once and shared like block()"""
+        return self._shared("txids", rnd, lambda: self.client.get_block_txids(rnd).get("blockTxids") or [])
+
+    def _shared(self, kind, rnd, fetch):
+        key = (kind, rnd)
+        with self.lock:
+            future = self.shared.get(key)
+            owner = future is None
+            if owner:
+                future = self.shared[key] = Future()
+                while len(self.shared) > 2 * SHARED_ROUNDS:
+                    self.shared.popitem(last=False)
+        if owner:
+            try:
+                future.set_result(fetch())
+            except Exception as e:
+                # Failures aren't kept, the next reader fetches again
+                with self.lock:
+                    if self.shared.get(key) is future:
+                        del self.shared[key]
+                future.set_exception(e)
+        return future.result()
+
+    def _run(self):
+        while True:
+            try:
+                status = self.client.status_after_block(self.last_round)
+                latest = status.get("last-round", self.last_round)
+                if latest <= self.last_round:
+                    # Long poll returned without a new block, still look at new txids
+                    self._check_unchecked()
+                for rnd in range(self.last_round + 1, latest + 1):
+                    self._process_round(rnd)
+                    self.last_round = rnd
+            except Exception as e:
+                print(f"Confirmation tracker error: {e}")
+                time.sleep(1)
+
+    def _block_txids(self, rnd):
+        try:
+            return set(self.block_txids(rnd))
+        except Exception:
+            return None  # Older node: fall back to checking every pending txid
+
+    def _process_round(self, rnd):
+        txids = self._block_txids(rnd)
+
+        with self.lock:
+            candidates = [txid for txid, entry in self.pending.items()
+                          if txids is None or not entry[2] or txid in txids]
+        for txid in candidates:
+            self._check(txid)
+
+        with self.lock:
+            expired = [(txid, entry) for txid, entry in self.pending.items() if entry[1] <= rnd]
+            for txid, _ in expired:
+                del self.pending[txid]
+            listeners = list(self.listeners)
+        for txid, (future, expire_round, *_) in expired:
+            future.set_exception(TimeoutError(f"Tx {txid} not confirmed by round {expire_round}"))
+
+        for listener in listeners:
+            try:
+                listener(rnd, txids)
+            except Exception as e:
+                print(f"Block listener error: {e}")
+
+    def _check_unchecked(self):
+        with self.lock:
+            candidates = [txid for txid, entry in self.pending.items() if not entry[2]]
+        for txid in candidates:
+            self._check(txid)
+
+    def _check(self, txid):
+        """Look a txid up once and resolve its future if it is final"""
+        try:
+            res = self.client.pending_transaction_info(txid)
+        except Exception:
+            return  # Unknown to this node yet or transient error, retry next round
+
+        with self.lock:
+            entry = self.pending.get(txid)
+            if entry is None:
+                return
+            entry[2] = True
+            if res.get("confirmed-round", 0) > 0:
+                del self.pending[txid]
+                CONFIRMATION_SECONDS.observe(time.monotonic() - entry[3])
+                CONFIRMATION_ROUNDS.observe(max(0, res["confirmed-round"] - entry[4]))
+                entry[0].set_result(res)
+            elif res.get("pool-error"):
+                del self.pending[txid]
+                entry[0].set_exception(RuntimeError(f"Tx {txid} rejected: {res['pool-error']}"))
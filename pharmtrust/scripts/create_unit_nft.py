@@ -28,7 +28,7 @@ def main():
         
         print(f"\n✅ SUCCESS!")
         print(f"Unit NFT ID: {unit_nft_id}")
-        print(f"Check artifacts.json for updated records")
+        print(f"Run list_medicines.py to see updated records")
         
     except Exception as e:
         print(f"❌ ERROR: {e}")
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Append-only custody event log for unit NFTs and batch ASAs
+Usage: python custody.py unit <asset_id> | batch <batch_asa_id> [limit]
+"""
+
+import functools
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from common import TRACKER, configured_accounts
+from minters import MINTERS
+from storage import SQLiteStore, open_store
+
+ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_CUSTODY_DB = ROOT / "pharmtrust" / "artifacts.db"
+CHECKPOINT_KEY = "custody_round"
+MAX_CATCH_UP = 1000          # rounds replayed after a restart; non-archival nodes keep about this many
+
+class CustodyLog:
+    """Mints and transfers of our assets in SQLite, indexed per asset and per batch.
+
+    Events are only ever inserted. Each is keyed by (txid, asset_id), so the
+    same transfer recorded by the shipment that sent it and by the block
+    follower that saw it lands once. A unit's timeline is one range scan on
+    its asset index; batch_asa_id ties unit events to their batch.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS custody_events (
+            event_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+            asset_id     INTEGER NOT NULL,
+            batch_asa_id INTEGER,
+            kind         TEXT NOT NULL,
+            sender       TEXT,
+            receiver     TEXT NOT NULL,
+            amount       INTEGER NOT NULL,
+            round        INTEGER,
+            txid         TEXT NOT NULL,
+            source       TEXT NOT NULL,
+            recorded_at  REAL NOT NULL,
+            UNIQUE (txid, asset_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_custody_asset ON custody_events(asset_id, round, event_id);
+        CREATE INDEX IF NOT EXISTS idx_custody_batch ON custody_events(batch_asa_id, event_id);
+        CREATE TABLE IF NOT EXISTS custody_meta (
+            key   TEXT PRIMARY KEY,
+            value INTEGER
+        );
+    """
+
+    COLUMNS = ("event_id", "asset_id", "batch_asa_id", "kind", "sender", "receiver",
+               "amount", "round", "txid", "source", "recorded_at")
+
+    def __init__(self, path=DEFAULT_CUSTODY_DB, resolve=None):
+        self.lock = threading.Lock()
+        self.resolve = resolve          # asset_id -> batch_asa_id for assets without events yet
+        self.conn = sqlite3.connect(str(path), check_same_thread=False,
+                                    isolation_level=None, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def record(self, events, source="local"):
+        """Append event dicts (asset_id, kind, sender, receiver, amount, round, txid,
+        optional batch_asa_id), returns how many were new"""
+        rows = []
+        now = time.time()
+        for event in events:
+            batch_asa_id = event.get("batch_asa_id")
+            if batch_asa_id is None:
+                batch_asa_id = self.batch_of(event["asset_id"])
+            rows.append((event["asset_id"], batch_asa_id, event["kind"], event.get("sender"),
+                         event["receiver"], event["amount"], event.get("round"), event["txid"],
+                         source, now))
+        if not rows:
+            return 0
+        with self.lock:
+            before = self.conn.total_changes
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO custody_events (asset_id, batch_asa_id, kind, sender, receiver, "
+                    "amount, round, txid, source, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            return self.conn.total_changes - before
+
+    def batch_of(self, asset_id):
+        """Batch ASA an asset belongs to, or None if it isn't one of ours"""
+        asset_id = int(asset_id)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT batch_asa_id FROM custody_events WHERE asset_id = ? AND batch_asa_id IS NOT NULL LIMIT 1",
+                (asset_id,)).fetchone()
+        if row is not None:
+            return row["batch_asa_id"]
+        return self.resolve(asset_id) if self.resolve else None
+
+    def timeline(self, asset_id):
+        """Every event for one asset, oldest first"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM custody_events WHERE asset_id = ? ORDER BY round, event_id",
+                (int(asset_id),)).fetchall()
+        return [self._event(row) for row in rows]
+
+    def batch_timeline(self, batch_asa_id, after=0, limit=500):
+        """Events for a batch ASA and its units in the order they were recorded, after an event_id cursor"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM custody_events WHERE batch_asa_id = ? AND event_id > ? ORDER BY event_id LIMIT ?",
+                (int(batch_asa_id), int(after), int(limit))).fetchall()
+        return [self._event(row) for row in rows]
+
+    def by_txid(self, txid):
+        """Events recorded for one transaction"""
+        with self.lock:
+            rows = self.conn.execute("SELECT * FROM custody_events WHERE txid = ?", (txid,)).fetchall()
+        return [self._event(row) for row in rows]
+
+    def holder(self, asset_id):
+        """Receiver of the asset's latest recorded event, or None if none is recorded"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT receiver FROM custody_events WHERE asset_id = ? ORDER BY round DESC, event_id DESC LIMIT 1",
+                (int(asset_id),)).fetchone()
+        return row["receiver"] if row else None
+
+    def checkpoint(self):
+        """Last round the block follower finished, or None"""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM custody_meta WHERE key = ?", (CHECKPOINT_KEY,)).fetchone()
+        return row["value"] if row else None
+
+    def set_checkpoint(self, rnd):
+        # Several workers follow the same blocks; the checkpoint only moves forward
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO custody_meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)", (CHECKPOINT_KEY, rnd))
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM custody_events").fetchone()[0]
+
+    def _event(self, row):
+        return {column: row[column] for column in self.COLUMNS}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def open_custody_log(store, resolve=None):
+    """Custody log next to the artifact store's SQLite database (or the default one for JSON stores)"""
+    path = store.path if isinstance(store, SQLiteStore) else DEFAULT_CUSTODY_DB
+    return CustodyLog(path, resolve)
+
+class CustodyFollower:
+    """Records transfers of our assets seen in new blocks.
+
+    Transfers made by other tools, or by the receiving pharmacy to the
+    next holder, only show up on-chain. Each new block is read once, through
+    the tracker's fetch that the verifier shares; its axfer transactions are matched with the block's txid list, and those for
+    assets the log knows are appended. After a restart the rounds since the
+    checkpoint are replayed, up to MAX_CATCH_UP.
+    """
+
+    def __init__(self, log, tracker=TRACKER, max_catch_up=MAX_CATCH_UP):
+        self.log = log
+        self.tracker = tracker
+        self.max_catch_up = max_catch_up
+        self.blocks = queue.Queue()
+        self.started = False
+
+    def start(self):
+        if self.started:
+            return
+        self.started = True
+        threading.Thread(target=self._run, name="custody-follower", daemon=True).start()
+        self.tracker.add_block_listener(self._on_block)
+
+    def _on_block(self, rnd, txids):
+        # Empty blocks still move the checkpoint, without fetching them
+        self.blocks.put((rnd, txids is not None and not txids))
+
+    def _run(self):
+        while True:
+            rnd, empty = self.blocks.get()
+            checkpoint = self.log.checkpoint()
+            first = rnd if checkpoint is None else max(checkpoint + 1, rnd - self.max_catch_up)
+            for r in range(first, rnd + 1):
+                try:
+                    if not (r == rnd and empty):
+                        self.process_round(r)
+                except Exception as e:
+                    print(f"Custody follower: round {r}: {e}")
+                    break
+                self.log.set_checkpoint(r)
+
+    def process_round(self, rnd):
+        """Append the custody events in one block, returns how many were new"""
+        block = self.tracker.block(rnd).get("block", {})
+        stxns = block.get("txns", [])
+        if not stxns:
+            return 0
+        txids = self.tracker.block_txids(rnd)
+        if len(txids) != len(stxns):
+            raise ValueError(f"block has {len(stxns)} transactions but {len(txids)} txids")
+
+        events = []
+        for stxn, txid in zip(stxns, txids):
+            txn = stxn.get("txn", {})
+            if txn.get("type") != "axfer" or not txn.get("xaid") or not txn.get("aamt"):
+                continue  # opt-ins and close-outs move no custody we track
+            batch_asa_id = self.log.batch_of(txn["xaid"])
+            if batch_asa_id is None:
+                continue
+            events.append({
+                "asset_id": txn["xaid"],
+                "batch_asa_id": batch_asa_id,
+                "kind": "clawback" if txn.get("asnd") else "transfer",
+                "sender": txn.get("asnd") or txn.get("snd"),
+                "receiver": txn.get("arcv"),
+                "amount": txn["aamt"],
+                "round": rnd,
+                "txid": txid,
+            })
+        return self.log.record(events, source="chain")
+
+@functools.lru_cache(maxsize=1)
+def address_labels():
+    """{address: {"account", "role"}} for the minter pool and configured accounts"""
+    labels = {address: {"account": key, "role": key} for key, address in configured_accounts().items()}
+    for minter in MINTERS.minters:
+        labels[minter.address] = {"account": minter.key, "role": "manufacturer"}
+    return labels
+
+def describe(events, labels=None):
+    """Attach account/role names to event senders and receivers for display"""
+    labels = address_labels() if labels is None else labels
+    described = []
+    for event in events:
+        event = dict(event)
+        event["from"] = labels.get(event["sender"]) if event["sender"] else None
+        event["to"] = labels.get(event["receiver"])
+        described.append(event)
+    return described
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ("unit", "batch"):
+        print("Usage: python custody.py unit <asset_id> | batch <batch_asa_id> [limit]")
+        return
+    store = open_store()
+    log = open_custody_log(store)
+    if sys.argv[1] == "unit":
+        events = log.timeline(sys.argv[2])
+    else:
+        events = log.batch_timeline(sys.argv[2], limit=int(sys.argv[3]) if len(sys.argv) > 3 else 500)
+    if not events:
+        print("No custody events recorded")
+    labels = address_labels()
+    for event in events:
+        sender = labels.get(event["sender"], {}).get("account") or event["sender"] or "-"
+        receiver = labels.get(event["receiver"], {}).get("account") or event["receiver"]
+        print(f"round {event['round']:>10}  {event['kind']:<9} asset {event['asset_id']:<10} "
+              f"{sender} -> {receiver} x{event['amount']}  {event['txid']}")
+    log.close()
+    store.close()
+
+if __name__ == "__main__":
+    main()
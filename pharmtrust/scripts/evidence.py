@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Anchor AI inspection evidence hashes on-chain in Merkle-batched transactions
+Usage: python evidence.py add <file.json> | proof <hash> | flush
+"""
+
+import hashlib
+import json
+import sqlite3
+import sys
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from algosdk import transaction as tx  # type: ignore
+from common import CONF, SUBMITTER, sp, wait
+from metrics import EVIDENCE_ANCHORED
+from minters import MINTERS, Minter
+from signer import SIGNER
+from submitter import PRIORITY_NORMAL
+from tracing import end_trace, span, start_trace
+
+ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_EVIDENCE_DB = ROOT / "pharmtrust" / "artifacts.db"
+NOTE_STANDARD = "pharmtrust-evidence"
+HEARTBEAT_SECONDS = 10       # how often a worker marks the batches it is anchoring alive
+OWNER_EXPIRY = 60            # an anchoring batch whose heartbeat is older than this was abandoned
+
+# Domain-separated so a leaf can never be passed off as an inner node
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+def evidence_hash(ai_result):
+    """SHA-256 hex of the canonical JSON encoding of an AI result"""
+    canonical = json.dumps(ai_result, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(canonical).hexdigest()
+
+def normalize_hash(value):
+    """Lower-case 64-char hex or ValueError"""
+    value = str(value).strip().lower()
+    if len(value) != 64 or any(ch not in "0123456789abcdef" for ch in value):
+        raise ValueError("Evidence hash must be 64 hex characters (SHA-256)")
+    return value
+
+def leaf_node(hash_hex):
+    return hashlib.sha256(LEAF_PREFIX + bytes.fromhex(hash_hex)).digest()
+
+def inner_node(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+def merkle_tree(hashes):
+    """Build a tree over evidence hashes, returns (root hex, [proof per leaf]).
+
+    A proof is a list of {"side": "left"|"right", "hash": hex} siblings from
+    the leaf up. An odd node at the end of a level moves up unchanged.
+    """
+    level = [leaf_node(h) for h in hashes]
+    positions = list(range(len(hashes)))     # index of each leaf's ancestor in the current level
+    proofs = [[] for _ in hashes]
+    while len(level) > 1:
+        for leaf, pos in enumerate(positions):
+            sibling = pos ^ 1
+            if sibling < len(level):
+                proofs[leaf].append({"side": "left" if sibling < pos else "right",
+                                     "hash": level[sibling].hex()})
+        level = [inner_node(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+                 for i in range(0, len(level), 2)]
+        positions = [pos // 2 for pos in positions]
+    return level[0].hex(), proofs
+
+def verify_proof(hash_hex, proof, root_hex):
+    """Recompute the root from a leaf and its proof"""
+    node = leaf_node(hash_hex)
+    for step in proof:
+        sibling = bytes.fromhex(step["hash"])
+        node = inner_node(sibling, node) if step["side"] == "left" else inner_node(node, sibling)
+    return node.hex() == root_hex
+
+class EvidenceStore:
+    """Persists evidence leaves, their anchoring batches and inclusion proofs in SQLite.
+
+    Leaves start with batch_id NULL (pending); a flush claims them for a new
+    batch in one transaction, so several workers never anchor the same leaf.
+    The claiming worker sends heartbeats for its batch until it is anchored;
+    only batches whose owner stopped sending them are given back.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS evidence_batches (
+            batch_id    INTEGER PRIMARY KEY AUTOINCREMENT,
+            status      TEXT NOT NULL,
+            root        TEXT,
+            txid        TEXT,
+            round       INTEGER,
+            leaf_count  INTEGER NOT NULL DEFAULT 0,
+            created_at  REAL NOT NULL,
+            anchored_at REAL,
+            owner       TEXT,
+            heartbeat   REAL
+        );
+        CREATE TABLE IF NOT EXISTS evidence (
+            hash        TEXT PRIMARY KEY,
+            batch_id    INTEGER REFERENCES evidence_batches(batch_id),
+            leaf_index  INTEGER,
+            proof       TEXT,
+            metadata    TEXT,
+            created_at  REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_evidence_pending ON evidence(batch_id, created_at);
+    """
+
+    def __init__(self, path=DEFAULT_EVIDENCE_DB):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(path), check_same_thread=False,
+                                    isolation_level=None, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self.SCHEMA)
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(evidence_batches)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat", "REAL")):
+            if column not in columns:
+                # Databases from before batches were claimed by an owner
+                self.conn.execute(f"ALTER TABLE evidence_batches ADD COLUMN {column} {kind}")
+
+    def add(self, hash_hex, metadata=None):
+        """Queue a leaf, returns False if the hash was already recorded"""
+        with self.lock:
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO evidence (hash, metadata, created_at) VALUES (?, ?, ?)",
+                (hash_hex, json.dumps(metadata) if metadata else None, time.time()))
+        return cur.rowcount == 1
+
+    def pending(self):
+        """(number of pending leaves, created_at of the oldest)"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT COUNT(*) AS n, MIN(created_at) AS oldest FROM evidence WHERE batch_id IS NULL").fetchone()
+        return row["n"], row["oldest"]
+
+    def claim(self, limit, owner=None):
+        """Move up to limit pending leaves into a new batch for owner, returns (batch_id, [hash])"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                hashes = [row["hash"] for row in self.conn.execute(
+                    "SELECT hash FROM evidence WHERE batch_id IS NULL ORDER BY created_at, hash LIMIT ?",
+                    (limit,))]
+                batch_id = None
+                if hashes:
+                    now = time.time()
+                    batch_id = self.conn.execute(
+                        "INSERT INTO evidence_batches (status, leaf_count, created_at, owner, heartbeat) "
+                        "VALUES ('anchoring', ?, ?, ?, ?)", (len(hashes), now, owner, now)).lastrowid
+                    self.conn.executemany(
+                        "UPDATE evidence SET batch_id = ?, leaf_index = ? WHERE hash = ?",
+                        [(batch_id, i, h) for i, h in enumerate(hashes)])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return batch_id, hashes
+
+    def anchored(self, batch_id, root, txid, rnd, proofs):
+        """Record the anchoring transaction and each leaf's proof"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(
+                    "UPDATE evidence_batches SET status = 'anchored', root = ?, txid = ?, round = ?, "
+                    "anchored_at = ? WHERE batch_id = ?", (root, txid, rnd, time.time(), batch_id))
+                self.conn.executemany(
+                    "UPDATE evidence SET proof = ? WHERE batch_id = ? AND leaf_index = ?",
+                    [(json.dumps(proof), batch_id, i) for i, proof in enumerate(proofs)])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def heartbeat(self, owner):
+        """Mark every batch owner is anchoring as alive"""
+        with self.lock:
+            self.conn.execute("UPDATE evidence_batches SET heartbeat = ? WHERE owner = ? AND status = 'anchoring'",
+                              (time.time(), owner))
+
+    def release(self, batch_id=None, expiry=None):
+        """Return the leaves of one batch, or of batches with no heartbeat for expiry seconds, to the pool"""
+        with self.lock:
+            if batch_id is None:
+                # Batches from before heartbeats only have their creation time
+                ids = [row["batch_id"] for row in self.conn.execute(
+                    "SELECT batch_id FROM evidence_batches WHERE status = 'anchoring' "
+                    "AND COALESCE(heartbeat, created_at) < ?", (time.time() - expiry,))]
+            else:
+                ids = [batch_id]
+            for bid in ids:
+                self.conn.execute("UPDATE evidence SET batch_id = NULL, leaf_index = NULL WHERE batch_id = ?", (bid,))
+                self.conn.execute("UPDATE evidence_batches SET status = 'abandoned' WHERE batch_id = ?", (bid,))
+        return len(ids)
+
+    def get(self, hash_hex):
+        """Leaf record joined with its batch, or None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT e.hash, e.leaf_index, e.proof, e.metadata, e.created_at, b.batch_id, b.status, "
+                "b.root, b.txid, b.round, b.leaf_count, b.anchored_at FROM evidence e "
+                "LEFT JOIN evidence_batches b ON b.batch_id = e.batch_id WHERE e.hash = ?",
+                (hash_hex,)).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record["proof"] = json.loads(record["proof"]) if record["proof"] else None
+        record["metadata"] = json.loads(record["metadata"]) if record["metadata"] else None
+        return record
+
+class EvidenceAnchor:
+    """Collects evidence hashes and anchors a Merkle root per batch.
+
+    A batch is flushed once max_leaves hashes are pending or the oldest has
+    waited window seconds. The root goes into the note of one zero-amount
+    self-payment from the anchoring account, so a batch costs one fee and
+    one confirmation however many scans it covers.
+    """
+
+    def __init__(self, store, account=None, window=30.0, max_leaves=4096):
+        self.store = store
+        self.account = account or MINTERS.default
+        self.window = window
+        self.max_leaves = max_leaves
+        self.wake = threading.Event()
+        self.flushing = threading.Lock()
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.thread = None
+        self.heartbeat_thread = None
+
+    def add(self, hash_hex, metadata=None):
+        """Queue a hash for the next batch, returns False if it was already recorded"""
+        added = self.store.add(hash_hex, metadata)
+        if added and self.thread is not None and self.store.pending()[0] >= self.max_leaves:
+            self.wake.set()
+        return added
+
+    def flush(self):
+        """Anchor one batch of pending hashes now, returns the batch record or None"""
+        self._start_heartbeat()
+        with self.flushing:
+            batch_id, hashes = self.store.claim(self.max_leaves, self.owner)
+            if not hashes:
+                return None
+            trace, token = start_trace("evidence.anchor", leaves=len(hashes))
+            try:
+                with span("merkle", leaves=len(hashes)):
+                    root, proofs = merkle_tree(hashes)
+                note = json.dumps({"standard": NOTE_STANDARD, "v": 1, "root": root,
+                                   "leaves": len(hashes)}, separators=(",", ":")).encode()
+                with span("params"):
+                    params = sp()
+                txn = tx.PaymentTxn(self.account.address, params, self.account.address, 0, note=note)
+                blob, (txid,) = SIGNER.sign_group([(txn, self.account.address)])
+                with span("submit"):
+                    SUBMITTER.send(blob, txid, params.last, PRIORITY_NORMAL)
+                with span("confirm"):
+                    rnd = wait(txid)["confirmed-round"]
+                with span("store"):
+                    self.store.anchored(batch_id, root, txid, rnd, proofs)
+            except Exception:
+                self.store.release(batch_id)
+                raise
+            finally:
+                end_trace(trace, token)
+            EVIDENCE_ANCHORED.inc(len(hashes))
+            print(f"Anchored {len(hashes)} evidence hashes in round {rnd}: root {root[:16]}..., txid {txid}")
+            return {"batch_id": batch_id, "root": root, "txid": txid, "round": rnd, "leaves": len(hashes)}
+
+    def _start_heartbeat(self):
+        if self.heartbeat_thread is not None:
+            return
+        with self.flushing:
+            if self.heartbeat_thread is not None:
+                return
+
+            def run():
+                while True:
+                    threading.Event().wait(HEARTBEAT_SECONDS)
+                    try:
+                        self.store.heartbeat(self.owner)
+                    except Exception as e:
+                        print(f"Evidence heartbeat error: {e}")
+
+            self.heartbeat_thread = threading.Thread(target=run, name="evidence-heartbeat", daemon=True)
+            self.heartbeat_thread.start()
+
+    def start(self):
+        """Flush in the background whenever a batch is due"""
+        if self.thread is not None:
+            return self.thread
+
+        def run():
+            while True:
+                # Batches a crashed worker claimed but never finished go back to the pool
+                self.store.release(expiry=OWNER_EXPIRY)
+                count, oldest = self.store.pending()
+                due = oldest + self.window if oldest is not None else time.time() + self.window
+                if count and (count >= self.max_leaves or time.time() >= due):
+                    try:
+                        self.flush()
+                    except Exception as e:
+                        print(f"Evidence anchoring failed: {e}")
+                        threading.Event().wait(min(self.window, 5.0))
+                    continue
+                self.wake.wait(max(0.05, due - time.time()))
+                self.wake.clear()
+
+        self.thread = threading.Thread(target=run, name="evidence-anchor", daemon=True)
+        self.thread.start()
+        return self.thread
+
+def make_anchor(path=DEFAULT_EVIDENCE_DB, conf=CONF):
+    """EvidenceAnchor configured from the "evidence" section (window, max_leaves, account)"""
+    section = conf.get("evidence", {})
+    account = Minter(section["account"]) if section.get("account") else None
+    return EvidenceAnchor(EvidenceStore(path), account,
+                          window=section.get("window", 30.0),
+                          max_leaves=section.get("max_leaves", 4096))
+
+def main():
+    action = sys.argv[1] if len(sys.argv) > 1 else None
+    if action not in ("add", "proof", "flush") or (action != "flush" and len(sys.argv) < 3):
+        print("Usage: python evidence.py add <file.json> | proof <hash> | flush")
+        return
+
+    anchor = make_anchor()
+    try:
+        if action == "add":
+            with open(sys.argv[2]) as f:
+                hash_hex = evidence_hash(json.load(f))
+            added = anchor.add(hash_hex, {"source": Path(sys.argv[2]).name})
+            print(f"{'✅ Queued' if added else 'ℹ️  Already recorded'}: {hash_hex}")
+        elif action == "flush":
+            batch = anchor.flush()
+            print(f"✅ Anchored batch {batch['batch_id']}" if batch else "Nothing pending")
+        else:
+            record = anchor.store.get(normalize_hash(sys.argv[2]))
+            if record is None:
+                print("❌ Unknown evidence hash")
+            elif record["status"] != "anchored":
+                print("⏳ Pending, not anchored yet")
+            else:
+                ok = verify_proof(record["hash"], record["proof"], record["root"])
+                print(f"{'✅' if ok else '❌'} Root {record['root']} in txn {record['txid']} "
+                      f"(round {record['round']}), {len(record['proof'])} proof steps")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+
+if __name__ == "__main__":
+    main()
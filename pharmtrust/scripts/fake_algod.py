@@ -0,0 +1,454 @@
+import base64
+import io
+import random
+import threading
+import time
+import msgpack  # type: ignore
+from algosdk import encoding, transaction as tx  # type: ignore
+from algosdk.error import AlgodHTTPError  # type: ignore
+
+GENESIS_ID = "fakenet-v1"
+GENESIS_HASH = base64.b64encode(b"pharmtrust-fake-ledger".ljust(32, b"\0")).decode()
+
+MIN_FEE = 1000
+MIN_BALANCE = 100000          # per account, plus this much per asset held
+FIRST_ASSET_ID = 1000
+ADDRESS_FIELDS = ("snd", "rcv", "arcv", "asnd", "aclose", "close", "fadd")
+
+class FakeAlgod:
+    """In-process stand-in for algod, for load tests and benchmarks without a network.
+
+    Implements the calls this project makes (suggested_params,
+    send_transaction(s), send_raw_transaction, pending_transaction_info,
+    status, status_after_block, get_block_txids, block_info, account_info,
+    account_asset_info, asset_info)
+    against an in-memory ledger that closes a block every block_time
+    seconds. latency adds a delay to every call and failure_rate makes that
+    fraction of calls fail with failure_status.
+    """
+
+    def __init__(self, block_time=0.1, latency=0.0, failure_rate=0.0, failure_status=503,
+                 funded=(), initial_balance=10_000_000_000, max_wait=5.0, seed=None):
+        self.block_time = block_time
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.max_wait = max_wait
+        self.random = random.Random(seed)
+
+        self.cond = threading.Condition()
+        self.round = 1
+        self.round_time = time.monotonic()
+        self.balances = {addr: initial_balance for addr in funded}
+        self.holdings = {}     # addr -> {asset_id: {"amount": n, "is-frozen": bool}}
+        self.assets = {}       # asset_id -> params dict
+        self.next_asset_id = FIRST_ASSET_ID
+        self.pool = []         # list of groups, each a list of (txid, stx)
+        self.pending = {}      # txid -> info dict
+        self.blocks = {}       # round -> list of (txid, stx, info)
+        self.block_times = {}  # round -> unix time the block was closed
+
+        self.thread = threading.Thread(target=self._produce_blocks, name="fake-algod", daemon=True)
+        self.thread.start()
+
+    def register_assets(self, creator, asset_ids, **params):
+        """Create single-unit assets held by creator without transactions, for seeding benchmarks"""
+        asset_ids = [int(asset_id) for asset_id in asset_ids]
+        with self.cond:
+            holdings = self.holdings.setdefault(creator, {})
+            for asset_id in asset_ids:
+                self.assets[asset_id] = {
+                    "creator": creator, "total": 1, "decimals": 0, "default-frozen": False,
+                    "unit-name": "", "name": "", "url": "", "manager": creator, "reserve": creator,
+                    "freeze": creator, "clawback": creator, **params,
+                }
+                holdings[asset_id] = {"amount": 1, "is-frozen": False}
+            # Cover the minimum balance the new holdings add
+            self.balances[creator] = self.balances.get(creator, 0) + MIN_BALANCE * len(asset_ids)
+            self.next_asset_id = max([self.next_asset_id] + [asset_id + 1 for asset_id in asset_ids])
+
+    # -- algod API -------------------------------------------------------
+
+    def status(self, **kwargs):
+        self._call()
+        with self.cond:
+            return self._status()
+
+    def status_after_block(self, block_num=None, round_num=None, **kwargs):
+        self._call()
+        target = block_num if block_num is not None else round_num
+        with self.cond:
+            self.cond.wait_for(lambda: self.round > target, timeout=self.max_wait)
+            return self._status()
+
+    def suggested_params(self, **kwargs):
+        self._call()
+        with self.cond:
+            return tx.SuggestedParams(MIN_FEE, self.round, self.round + 1000, GENESIS_HASH,
+                                      GENESIS_ID, flat_fee=True, min_fee=MIN_FEE)
+
+    def send_transaction(self, txn, **kwargs):
+        return self.send_transactions([txn], **kwargs)
+
+    def send_transactions(self, txns, **kwargs):
+        self._call()
+        group = [(stx.get_txid(), stx) for stx in txns]
+        with self.cond:
+            for txid, _ in group:
+                if txid in self.pending:
+                    raise AlgodHTTPError(f"transaction already in ledger: {txid}", 400)
+            # Reject up front what would fail against current state, like algod does
+            error = self._apply_group(group, self.round + 1, dry_run=True)
+            if error:
+                raise AlgodHTTPError(f"TransactionPool.Remember: {error}", 400)
+            self.pool.append(group)
+            for txid, _ in group:
+                self.pending[txid] = {"confirmed-round": 0, "pool-error": ""}
+        return group[0][0]
+
+    def send_raw_transaction(self, txn, **kwargs):
+        return self.send_transactions(self._decode_raw(base64.b64decode(txn)))
+
+    def pending_transaction_info(self, transaction_id, **kwargs):
+        self._call()
+        with self.cond:
+            info = self.pending.get(transaction_id)
+            if info is None:
+                raise AlgodHTTPError("txn does not exist", 404)
+            return dict(info)
+
+    def get_block_txids(self, round_num, **kwargs):
+        self._call()
+        with self.cond:
+            if round_num > self.round:
+                raise AlgodHTTPError("failed to retrieve information from the ledger", 404)
+            return {"blockTxids": [txid for txid, _, _ in self.blocks.get(round_num, [])]}
+
+    def block_info(self, block=None, response_format="json", round_num=None, **kwargs):
+        self._call()
+        rnd = block if block is not None else round_num
+        with self.cond:
+            if rnd > self.round:
+                raise AlgodHTTPError("failed to retrieve information from the ledger", 404)
+            txns = []
+            for txid, stx, info in self.blocks.get(rnd, []):
+                # Block encoding: msgpack field names, addresses as strings, asset created by the txn as caid
+                entry = {"txn": {key: encoding.encode_address(value) if key in ADDRESS_FIELDS else value
+                                 for key, value in stx.transaction.dictify().items()
+                                 if isinstance(value, (int, str)) or key in ADDRESS_FIELDS}}
+                if "asset-index" in info:
+                    entry["caid"] = info["asset-index"]
+                txns.append(entry)
+            return {"block": {"rnd": rnd, "gen": GENESIS_ID, "txns": txns}}
+
+    def account_info(self, address, exclude=None, **kwargs):
+        self._call()
+        with self.cond:
+            holdings = self.holdings.get(address, {})
+            created = [{"index": asset_id, "params": dict(params)}
+                       for asset_id, params in self.assets.items() if params["creator"] == address]
+            info = {
+                "address": address,
+                "amount": self.balances.get(address, 0),
+                "min-balance": self._min_balance(address),
+                "assets": [{"asset-id": asset_id, "amount": h["amount"], "is-frozen": h["is-frozen"]}
+                           for asset_id, h in holdings.items()],
+                "created-assets": created,
+                "total-assets-opted-in": len(holdings),
+                "total-created-assets": len(created),
+                "round": self.round,
+            }
+            if exclude == "all":
+                # Like algod: the counts stay, the lists go
+                del info["assets"], info["created-assets"]
+            return info
+
+    def account_asset_info(self, address, asset_id, **kwargs):
+        self._call()
+        with self.cond:
+            holding = self.holdings.get(address, {}).get(int(asset_id))
+            if holding is None:
+                raise AlgodHTTPError("account asset info not found", 404)
+            return {"asset-holding": {"asset-id": int(asset_id), **holding}, "round": self.round}
+
+    def asset_info(self, asset_id, **kwargs):
+        self._call()
+        with self.cond:
+            params = self.assets.get(int(asset_id))
+            if params is None:
+                raise AlgodHTTPError("asset does not exist", 404)
+            return {"index": int(asset_id), "params": dict(params)}
+
+    # -- ledger ----------------------------------------------------------
+
+    def _call(self):
+        if self.latency:
+            time.sleep(self.latency * (0.5 + self.random.random()))
+        if self.failure_rate and self.random.random() < self.failure_rate:
+            raise AlgodHTTPError("injected failure", self.failure_status)
+
+    def _status(self):
+        return {
+            "last-round": self.round,
+            "time-since-last-round": int((time.monotonic() - self.round_time) * 1e9),
+            "catchup-time": 0,
+        }
+
+    def _decode_raw(self, raw):
+        stxs = []
+        for item in msgpack.Unpacker(io.BytesIO(raw), raw=False, strict_map_key=False):
+            stxs.append(encoding.msgpack_decode(base64.b64encode(msgpack.packb(item)).decode()))
+        return stxs
+
+    def _produce_blocks(self):
+        while True:
+            time.sleep(self.block_time)
+            with self.cond:
+                rnd = self.round + 1
+                block = []
+                for group in self.pool:
+                    error = self._apply_group(group, rnd, dry_run=False)
+                    for txid, stx in group:
+                        info = self.pending[txid]
+                        if error:
+                            info["pool-error"] = error
+                        else:
+                            info["confirmed-round"] = rnd
+                            block.append((txid, stx, info))
+                self.pool = []
+                self.blocks[rnd] = block
+                self.block_times[rnd] = int(time.time())
+                self.round = rnd
+                self.round_time = time.monotonic()
+                self.cond.notify_all()
+
+    def _min_balance(self, addr):
+        # The creator's own holding of an asset it created is counted once
+        return MIN_BALANCE * (1 + len(self.holdings.get(addr, {})))
+
+    def _apply_group(self, group, rnd, dry_run):
+        """Apply a group atomically; returns an error string, or None on success"""
+        self.undo = []
+        results = []
+        try:
+            for txid, stx in group:
+                results.append(self._apply(stx.transaction, rnd))
+        except ValueError as e:
+            self._rollback()
+            return str(e)
+
+        if dry_run:
+            self._rollback()
+        else:
+            for (txid, _), result in zip(group, results):
+                self.pending[txid].update(result)
+        return None
+
+    def _rollback(self):
+        for restore in reversed(self.undo):
+            restore()
+        self.undo = []
+
+    def _save(self, table, key):
+        """Record table[key] so _rollback can restore it"""
+        if key in table:
+            old = table[key]
+            old = dict(old) if isinstance(old, dict) else old
+            self.undo.append(lambda: table.__setitem__(key, old))
+        else:
+            self.undo.append(lambda: table.pop(key, None))
+
+    def _holding(self, addr, asset_id):
+        holdings = self.holdings.setdefault(addr, {})
+        self._save(holdings, asset_id)
+        return holdings.get(asset_id)
+
+    def _apply(self, txn, rnd):
+        if not (txn.first_valid_round <= rnd <= txn.last_valid_round):
+            raise ValueError(f"txn dead: round {rnd} outside of {txn.first_valid_round}--{txn.last_valid_round}")
+        if txn.fee < MIN_FEE:
+            raise ValueError(f"fee {txn.fee} below threshold {MIN_FEE}")
+
+        sender = txn.sender
+        self._debit(sender, txn.fee)
+        result = {}
+
+        if txn.type == "pay":
+            self._debit(sender, txn.amt)
+            self._save(self.balances, txn.receiver)
+            self.balances[txn.receiver] = self.balances.get(txn.receiver, 0) + txn.amt
+        elif txn.type == "acfg" and not txn.index:
+            asset_id = self.next_asset_id
+            next_asset_id = self.next_asset_id
+            self.undo.append(lambda: setattr(self, "next_asset_id", next_asset_id))
+            self.next_asset_id += 1
+            self._save(self.assets, asset_id)
+            self._holding(sender, asset_id)
+            self.assets[asset_id] = {
+                "creator": sender, "total": txn.total or 0, "decimals": txn.decimals,
+                "default-frozen": txn.default_frozen, "unit-name": txn.unit_name or "",
+                "name": txn.asset_name or "", "url": txn.url or "",
+                "manager": txn.manager, "reserve": txn.reserve,
+                "freeze": txn.freeze, "clawback": txn.clawback,
+            }
+            self.holdings.setdefault(sender, {})[asset_id] = {"amount": txn.total or 0,
+                                                               "is-frozen": False}
+            result["asset-index"] = asset_id
+        elif txn.type == "acfg":
+            params = self._asset(txn.index)
+            if params["manager"] != sender:
+                raise ValueError(f"this transaction should be issued by the manager")
+            self._save(self.assets, txn.index)
+            if not (txn.manager or txn.reserve or txn.freeze or txn.clawback):
+                holding = self._holding(params["creator"], txn.index) or {}
+                if holding.get("amount") != params["total"]:
+                    raise ValueError(f"cannot destroy asset {txn.index}: creator is holding only part of it")
+                del self.assets[txn.index]
+                self.holdings[params["creator"]].pop(txn.index, None)
+            else:
+                params = self.assets[txn.index] = dict(params)
+                params.update(manager=txn.manager, reserve=txn.reserve,
+                              freeze=txn.freeze, clawback=txn.clawback)
+        elif txn.type == "afrz":
+            params = self._asset(txn.index)
+            if params["freeze"] != sender:
+                raise ValueError(f"freeze not allowed: sender {sender} is not the freeze address")
+            holding = self._holding(txn.target, txn.index)
+            if holding is None:
+                raise ValueError(f"asset {txn.index} missing from {txn.target}")
+            self.holdings[txn.target][txn.index] = dict(holding, **{"is-frozen": bool(txn.new_freeze_state)})
+        elif txn.type == "axfer":
+            params = self._asset(txn.index)
+            source = txn.revocation_target or sender
+            if txn.revocation_target and params["clawback"] != sender:
+                raise ValueError(f"clawback not allowed: sender {sender} is not the clawback address")
+            if txn.amount == 0 and source == txn.receiver:
+                # Opt-in
+                if self._holding(txn.receiver, txn.index) is None:
+                    self.holdings[txn.receiver][txn.index] = {"amount": 0, "is-frozen": params["default-frozen"]}
+            else:
+                src = self._holding(source, txn.index)
+                dst = self._holding(txn.receiver, txn.index)
+                if dst is None:
+                    raise ValueError(f"receiver error: must optin, asset {txn.index} missing from {txn.receiver}")
+                if src is None or src["amount"] < txn.amount:
+                    raise ValueError(f"underflow on subtracting {txn.amount} from sender amount")
+                if not txn.revocation_target and (src["is-frozen"] or dst["is-frozen"]):
+                    raise ValueError(f"asset {txn.index} frozen")
+                self.holdings[source][txn.index] = dict(src, amount=src["amount"] - txn.amount)
+                dst = self.holdings[txn.receiver][txn.index]
+                self.holdings[txn.receiver][txn.index] = dict(dst, amount=dst["amount"] + txn.amount)
+        else:
+            raise ValueError(f"unsupported transaction type {txn.type}")
+
+        if self.balances.get(sender, 0) < self._min_balance(sender):
+            raise ValueError(f"account {sender} balance below min {self._min_balance(sender)}")
+        return result
+
+    def _asset(self, asset_id):
+        params = self.assets.get(asset_id)
+        if params is None:
+            raise ValueError(f"asset {asset_id} does not exist or has been deleted")
+        return params
+
+    def _debit(self, addr, amount):
+        self._save(self.balances, addr)
+        balance = self.balances.get(addr, 0)
+        if balance < amount:
+            raise ValueError(f"overspend (account {addr}, data {{balance {balance}}}, tried to spend {amount})")
+        self.balances[addr] = balance - amount
+
+class FakeIndexer:
+    """Indexer stand-in answering search_transactions from a FakeAlgod's blocks.
+
+    Supports the address, address_role, txn_type, min_round, max_round,
+    limit and next_page filters, plus asset_balances. Results come oldest first, or newest first
+    with newest_first=True, which is what a real indexer does for address
+    searches.
+    """
+
+    def __init__(self, algod, newest_first=False):
+        self.algod = algod
+        self.newest_first = newest_first
+
+    def search_transactions(self, address=None, address_role=None, txn_type=None, min_round=None,
+                            max_round=None, limit=None, next_page=None, **kwargs):
+        self.algod._call()
+        with self.algod.cond:
+            current = self.algod.round
+            rounds = sorted(r for r in self.algod.blocks
+                            if (min_round is None or r >= min_round) and (max_round is None or r <= max_round))
+            blocks = [(r, self.algod.blocks[r], self.algod.block_times.get(r, 0)) for r in rounds]
+
+        # next-token is "round:position" of the last transaction returned
+        after = tuple(int(part) for part in next_page.split(":")) if next_page else None
+        limit = limit or 1000
+        transactions = []
+        last = None
+        ordered = [(rnd, position, entry, round_time)
+                   for rnd, block, round_time in blocks for position, entry in enumerate(block)]
+        if self.newest_first:
+            ordered.reverse()
+        for rnd, position, (txid, stx, info), round_time in ordered:
+            if after is not None and ((rnd, position) >= after if self.newest_first else (rnd, position) <= after):
+                continue
+            txn = stx.transaction
+            if txn_type and txn.type != txn_type:
+                continue
+            if address and not self._involves(txn, address, address_role):
+                continue
+            if len(transactions) == limit:
+                return {"current-round": current, "transactions": transactions,
+                        "next-token": f"{last[0]}:{last[1]}"}
+            transactions.append(self._transaction(txid, txn, info, rnd, round_time, position))
+            last = (rnd, position)
+        return {"current-round": current, "transactions": transactions,
+                "next-token": f"{last[0]}:{last[1]}" if last else None}
+
+    def asset_balances(self, asset_id, min_balance=None, limit=None, next_page=None, **kwargs):
+        """Accounts holding asset_id, more than min_balance of it if given (no paging)"""
+        self.algod._call()
+        with self.algod.cond:
+            held = [(address, holdings.get(int(asset_id))) for address, holdings in self.algod.holdings.items()]
+            balances = [{"address": address, "amount": holding["amount"], "is-frozen": holding["is-frozen"]}
+                        for address, holding in held
+                        if holding is not None and (min_balance is None or holding["amount"] > min_balance)]
+            current = self.algod.round
+        return {"current-round": current, "balances": balances[:limit or 1000], "next-token": None}
+
+    def _involves(self, txn, address, role):
+        senders = {txn.sender}
+        receivers = {getattr(txn, "receiver", None), getattr(txn, "target", None)}
+        if role == "sender":
+            return address in senders
+        if role == "receiver":
+            return address in receivers
+        return address in senders | receivers
+
+    def _transaction(self, txid, txn, info, rnd, round_time, position):
+        result = {
+            "id": txid,
+            "tx-type": txn.type,
+            "sender": txn.sender,
+            "fee": txn.fee,
+            "confirmed-round": rnd,
+            "intra-round-offset": position,
+            "round-time": round_time,
+            "first-valid": txn.first_valid_round,
+            "last-valid": txn.last_valid_round,
+        }
+        if txn.note:
+            result["note"] = base64.b64encode(txn.note).decode()
+        if txn.type == "acfg":
+            params = {}
+            if not txn.index:
+                params = {"creator": txn.sender, "total": txn.total or 0, "decimals": txn.decimals,
+                          "default-frozen": txn.default_frozen, "unit-name": txn.unit_name or "",
+                          "name": txn.asset_name or "", "url": txn.url or ""}
+            for role in ("manager", "reserve", "freeze", "clawback"):
+                if getattr(txn, role):
+                    params[role] = getattr(txn, role)
+            result["asset-config-transaction"] = {"asset-id": txn.index or 0, "params": params}
+            if "asset-index" in info:
+                result["created-asset-index"] = info["asset-index"]
+        return result
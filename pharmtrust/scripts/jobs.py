@@ -0,0 +1,262 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from tracing import current_trace, end_trace, start_trace
+
+ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_JOBS_DB = ROOT / "pharmtrust" / "artifacts.db"
+
+HEARTBEAT_SECONDS = 10       # how often a worker process marks its running jobs alive
+OWNER_EXPIRY = 60            # a running job whose heartbeat is older than this is re-queued
+
+class QueueFull(Exception):
+    """Raised when the job queue cannot take more work"""
+
+class JobStore:
+    """Persists jobs in SQLite so queued and running jobs survive a restart"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id     TEXT PRIMARY KEY,
+            kind       TEXT NOT NULL,
+            params     TEXT NOT NULL,
+            status     TEXT NOT NULL,
+            progress   TEXT,
+            result     TEXT,
+            error      TEXT,
+            attempts   INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            owner      TEXT,
+            heartbeat  REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+    """
+
+    def __init__(self, path=DEFAULT_JOBS_DB):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(path), check_same_thread=False,
+                                    isolation_level=None, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self.SCHEMA)
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat", "REAL")):
+            if column not in columns:
+                # Databases from before jobs were claimed by a worker process
+                self.conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+    def insert(self, job):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO jobs (job_id, kind, params, status, progress, attempts, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job["job_id"], job["kind"], json.dumps(job["params"]), job["status"],
+                 json.dumps(job["progress"]), 0, job["created_at"], job["created_at"]))
+
+    def update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        for key in ("progress", "result"):
+            if key in fields:
+                fields[key] = json.dumps(fields[key])
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self.lock:
+            self.conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?",
+                              list(fields.values()) + [job_id])
+
+    def get(self, job_id):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, status=None, limit=50):
+        query = "SELECT * FROM jobs"
+        args = []
+        if status:
+            query += " WHERE status = ?"
+            args.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        args.append(limit)
+        with self.lock:
+            rows = self.conn.execute(query, args).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def claim(self, job_id, owner):
+        """Atomically move a queued job to running for owner, returns False if someone else has it"""
+        now = time.time()
+        with self.lock:
+            cur = self.conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, heartbeat = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE job_id = ? AND status = 'queued'", (owner, now, now, job_id))
+        return cur.rowcount == 1
+
+    def heartbeat(self, owner):
+        """Mark every job owner is running as alive"""
+        with self.lock:
+            self.conn.execute("UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = 'running'",
+                              (time.time(), owner))
+
+    def recover(self, expiry=OWNER_EXPIRY):
+        """Re-queue running jobs whose owner stopped sending heartbeats, returns how many"""
+        with self.lock:
+            cur = self.conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL WHERE status = 'running' "
+                "AND (heartbeat IS NULL OR heartbeat < ?)", (time.time() - expiry,))
+        return cur.rowcount
+
+    def queued(self, limit):
+        """Oldest queued job IDs"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT ?", (limit,)).fetchall()
+        return [row["job_id"] for row in rows]
+
+    def _to_dict(self, row):
+        job = dict(row)
+        for key in ("params", "progress", "result"):
+            job[key] = json.loads(job[key]) if job[key] else None
+        return job
+
+class JobQueue:
+    """Bounded pool of worker threads running persisted jobs.
+
+    handlers maps a job kind to fn(params, progress) -> result, where
+    progress(done, total) records progress. Handlers must be safe to re-run.
+
+    Several server processes can share one job table: a job is claimed
+    atomically before it runs, and each process sends heartbeats for the
+    jobs it runs. Jobs whose owner stopped sending them (it crashed or was
+    killed) go back to queued, after the dead owner's store leases are
+    released (leases is the artifact store, or None). Queued jobs in the
+    table are picked up as room frees in the in-memory queue.
+
+    Each run is traced as job.<kind>, linked to the trace that submitted it.
+    """
+
+    def __init__(self, handlers, store=None, workers=4, max_queued=1000, leases=None,
+                 heartbeat_interval=HEARTBEAT_SECONDS, owner_expiry=OWNER_EXPIRY):
+        self.handlers = handlers
+        self.store = store or JobStore()
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.leases = leases
+        self.heartbeat_interval = heartbeat_interval
+        self.owner_expiry = owner_expiry
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.threads = []
+        self.local = set()        # job IDs in self.queue, so the table scan doesn't add them twice
+        self.local_lock = threading.Lock()
+        self.parent_traces = {}   # job_id -> submitting trace_id, in memory only
+
+    def start(self):
+        if self.threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        thread = threading.Thread(target=self._monitor, name="job-monitor", daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def _monitor(self):
+        while True:
+            try:
+                self.store.heartbeat(self.owner)
+                self.recover()
+            except Exception as e:
+                print(f"Job monitor error: {e}")
+            threading.Event().wait(self.heartbeat_interval)
+
+    def recover(self):
+        """Re-queue jobs of dead owners and top up the in-memory queue from the table, never blocking"""
+        if self.leases is not None:
+            self.leases.release_dead_leases(self.owner_expiry)
+        self.store.recover(self.owner_expiry)
+        room = self.queue.maxsize - self.queue.qsize() if self.queue.maxsize else 1000
+        for job_id in self.store.queued(max(room, 0) + len(self.local)):
+            if not self._enqueue(job_id):
+                break
+
+    def _enqueue(self, job_id):
+        with self.local_lock:
+            if job_id in self.local:
+                return True
+            try:
+                self.queue.put_nowait(job_id)
+            except queue.Full:
+                return False
+            self.local.add(job_id)
+            return True
+
+    def submit(self, kind, params):
+        """Persist and enqueue a job, returns the job record"""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self.queue.full():
+            raise QueueFull("Job queue is full, try again later")
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "kind": kind,
+            "params": params,
+            "status": "queued",
+            "progress": {"done": 0, "total": None},
+            "created_at": time.time(),
+        }
+        self.store.insert(job)
+        trace = current_trace()
+        if trace is not None:
+            self.parent_traces[job["job_id"]] = trace.trace_id
+        # If the queue filled up meanwhile the job stays queued in the table for the monitor
+        self._enqueue(job["job_id"])
+        return self.store.get(job["job_id"])
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def list(self, status=None, limit=50):
+        return self.store.list(status, limit)
+
+    def depth(self):
+        """Jobs waiting for a worker"""
+        return self.queue.qsize()
+
+    def _worker(self):
+        while True:
+            job_id = self.queue.get()
+            with self.local_lock:
+                self.local.discard(job_id)
+            try:
+                self._run(job_id)
+            finally:
+                self.queue.task_done()
+
+    def _run(self, job_id):
+        parent = self.parent_traces.pop(job_id, None)
+        # Another worker process may have claimed it first
+        if not self.store.claim(job_id, self.owner):
+            return
+        job = self.store.get(job_id)
+        trace, token = start_trace(f"job.{job['kind']}", parent, job_id=job_id)
+        try:
+            self._execute(job)
+        finally:
+            end_trace(trace, token)
+
+    def _execute(self, job):
+        job_id = job["job_id"]
+
+        def progress(done, total):
+            self.store.update(job_id, progress={"done": done, "total": total})
+
+        try:
+            result = self.handlers[job["kind"]](job["params"], progress)
+            self.store.update(job_id, status="succeeded", result=result)
+        except Exception as e:
+            self.store.update(job_id, status="failed", error=str(e))
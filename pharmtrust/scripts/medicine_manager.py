@@ -1,38 +1,238 @@
-import json
-from pathlib import Path
-from common import ALGOD, acct, sp, wait
+from common import MAX_GROUP_SIZE, SUBMITTER, send_groups, sp, wait
+from custody import open_custody_log
+from storage import ARTIFACTS_FILE, open_store
+from metrics import MINT_FAILURES, UNITS_MINTED
+from minters import MINTERS
+from signer import SIGNER
+from submitter import PRIORITY_BULK, PRIORITY_INTERACTIVE
+from tracing import span, traced
 from algosdk import transaction as tx  # type: ignore
 from datetime import datetime
+import base64
+import bisect
+import json
+import os
+import threading
 import uuid
 
-ROOT = Path(__file__).resolve().parents[2]
-ARTIFACTS_FILE = ROOT / "pharmtrust" / "artifacts.json"
+# Algorand limits on asset parameters, in encoded bytes
+MAX_UNIT_NAME_BYTES = 8
+MAX_ASSET_NAME_BYTES = 32
+MAX_ASSET_URL_BYTES = 96
+
+# Fields returned by query_medicines unless a projection is requested
+DEFAULT_MEDICINE_FIELDS = ("medicine_name", "batch_no", "batch_asa_id", "total_units",
+                           "expiry_date", "created_date", "minter", "unit_count")
 
 class MedicineManager:
-    def __init__(self):
+    def __init__(self, store=None, minters=MINTERS, custody=None):
+        self.store = store or open_store()
+        self.minters = minters                 # accounts that create and hold the assets
+        self.lock = threading.Lock()           # guards the medicines dict and the lock table
+        self.medicine_locks = {}
+        self.refresh_lock = threading.Lock()   # one refresh at a time, change_seq moves with it
+        self.version = 0                       # bumped on every in-memory change
+        self.instance_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.sorted_ids = (None, [])           # (medicines dict, its sorted keys)
         self.artifacts = self.load_artifacts()
-        self.creator_addr, self.creator_sk = acct("creator")
+        self.custody = custody or open_custody_log(self.store, self.batch_of)
     
     def load_artifacts(self):
-        """Load existing artifacts from JSON file"""
+        """Load existing artifacts from the storage backend and rebuild the unit index"""
+        self.change_seq = self.store.latest_change()
+        artifacts = self.store.load()
+        self.unit_index = self.build_unit_index(artifacts)
+        self.batch_index = {m["batch_asa_id"]: medicine_id
+                            for medicine_id, m in artifacts.get("medicines", {}).items()}
+        return artifacts
+    
+    def medicine_lock(self, medicine_id):
+        """Per-medicine lock for in-memory updates"""
+        with self.lock:
+            lock = self.medicine_locks.get(medicine_id)
+            if lock is None:
+                lock = self.medicine_locks[medicine_id] = threading.Lock()
+            return lock
+    
+    def apply_medicine(self, medicine_id, medicine):
+        """Swap a medicine record into the in-memory view (copy-on-write for readers)"""
+        with self.medicine_lock(medicine_id):
+            for unit_serial, nft_id in medicine.get("unit_nfts", {}).items():
+                self.unit_index[str(nft_id)] = (medicine_id, unit_serial)
+            self.batch_index[medicine["batch_asa_id"]] = medicine_id
+            with self.lock:
+                medicines = dict(self.artifacts.get("medicines", {}))
+                medicines[medicine_id] = medicine
+                self.artifacts["medicines"] = medicines
+                self.version += 1
+    
+    def apply_units(self, medicine_id, units):
+        """Add minted units to the in-memory view of a medicine"""
+        with self.medicine_lock(medicine_id):
+            medicine = self.artifacts["medicines"][medicine_id]
+            updated = dict(medicine, unit_nfts={**medicine["unit_nfts"], **units})
+            for unit_serial, nft_id in units.items():
+                self.unit_index[str(nft_id)] = (medicine_id, unit_serial)
+            with self.lock:
+                self.artifacts["medicines"][medicine_id] = updated
+                self.version += 1
+    
+    def refresh(self):
+        """Pick up medicines changed by other worker processes"""
+        with self.refresh_lock:
+            if not self.store.has_changed():
+                return 0
+            seq, medicine_ids = self.store.changes_since(self.change_seq)
+            self.reload_medicines(medicine_ids)
+            self.change_seq = seq
+            return len(medicine_ids)
+    
+    def reload_medicines(self, medicine_ids):
+        """Re-read medicines from the store into the in-memory view"""
+        for medicine_id in medicine_ids:
+            medicine = self.store.load_medicine(medicine_id)
+            if medicine is not None:
+                self.apply_medicine(medicine_id, medicine)
+    
+    def start_change_listener(self, interval=1.0):
+        """Poll the store for changes from other processes in a background thread"""
+        def run():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"Change listener error: {e}")
+                threading.Event().wait(interval)
+        
+        thread = threading.Thread(target=run, name="medicine-changes", daemon=True)
+        thread.start()
+        return thread
+    
+    def build_unit_index(self, artifacts):
+        """Build reverse index: unit NFT ID -> (medicine_id, unit_serial)"""
+        index = {}
+        for medicine_id, medicine in artifacts.get("medicines", {}).items():
+            for unit_serial, nft_id in medicine.get("unit_nfts", {}).items():
+                index[str(nft_id)] = (medicine_id, unit_serial)
+        return index
+    
+    def find_unit(self, unit_nft_id):
+        """Look up a unit NFT, returns (medicine_id, medicine, unit_serial) or None"""
+        entry = self.unit_index.get(str(unit_nft_id))
+        if entry is None:
+            # Possibly minted by another worker since our last refresh. Look again
+            # even if ours found nothing: a refresh running in another thread
+            # took the change and has finished by the time ours gets the lock
+            self.refresh()
+            entry = self.unit_index.get(str(unit_nft_id))
+            if entry is None:
+                return None
+        
+        medicine_id, unit_serial = entry
+        medicine = self.artifacts.get("medicines", {}).get(medicine_id)
+        if medicine is None:
+            return None
+        return medicine_id, medicine, unit_serial
+    
+    def batch_of(self, asset_id):
+        """Batch ASA ID for one of our unit NFTs or batch ASAs, None for other assets"""
+        if int(asset_id) in self.batch_index:
+            return int(asset_id)
+        entry = self.unit_index.get(str(asset_id))
+        medicine = self.artifacts.get("medicines", {}).get(entry[0]) if entry else None
+        return medicine["batch_asa_id"] if medicine else None
+    
+    def record_custody(self, events):
+        """Append mint events to the custody log; the mint itself already succeeded"""
         try:
-            with open(ARTIFACTS_FILE, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {"medicines": {}}
+            self.custody.record(events)
+        except Exception as e:
+            print(f"Custody log error: {e}")
+    
+    def find_units(self, unit_nft_ids):
+        """Look up many unit NFTs at once, grouped by medicine.
+        
+        Returns ({medicine_id: (medicine, [(unit_nft_id, unit_serial), ...])},
+        [unit_nft_ids not found]). Input order is kept within each group.
+        """
+        groups = {}
+        missing = list(unit_nft_ids)
+        for attempt in range(2):
+            pending, missing = missing, []
+            for unit_nft_id in pending:
+                entry = self.unit_index.get(str(unit_nft_id))
+                medicine = self.artifacts.get("medicines", {}).get(entry[0]) if entry else None
+                if medicine is None:
+                    missing.append(unit_nft_id)
+                    continue
+                groups.setdefault(entry[0], (medicine, []))[1].append((unit_nft_id, entry[1]))
+            # One refresh for the whole batch, in case other workers minted them
+            if not missing or attempt:
+                break
+            self.refresh()
+        return groups, missing
+    
+    def query_medicines(self, cursor=None, limit=50, name=None, batch_no=None,
+                        expiry_from=None, expiry_to=None, fields=DEFAULT_MEDICINE_FIELDS):
+        """Page through medicines ordered by ID.
+        
+        cursor is the opaque next_cursor of the previous page. name matches
+        case-insensitively as a substring, batch_no exactly, and the expiry
+        bounds are inclusive "YYYY-MM" strings. Returns ({medicine_id: record},
+        next_cursor or None).
+        """
+        medicines = self.artifacts.get("medicines", {})
+        cached, ids = self.sorted_ids
+        if cached is not medicines:
+            ids = sorted(medicines)
+            self.sorted_ids = (medicines, ids)
+        
+        start = 0
+        if cursor:
+            after = base64.b64decode(cursor.encode(), altchars=b"-_", validate=True).decode()
+            if not after:
+                raise ValueError("bad cursor")
+            start = bisect.bisect_right(ids, after)
+        
+        name = name.lower() if name else None
+        page = {}
+        last_id = None
+        for medicine_id in ids[start:]:
+            medicine = medicines.get(medicine_id)
+            if medicine is None:
+                continue
+            if name and name not in medicine["medicine_name"].lower():
+                continue
+            if batch_no and medicine["batch_no"] != batch_no:
+                continue
+            if expiry_from and medicine["expiry_date"] < expiry_from:
+                continue
+            if expiry_to and medicine["expiry_date"] > expiry_to:
+                continue
+            if len(page) == limit:
+                return page, base64.urlsafe_b64encode(last_id.encode()).decode()
+            
+            record = {field: medicine[field] for field in fields if field in medicine}
+            if "unit_count" in fields:
+                record["unit_count"] = len(medicine.get("unit_nfts", {}))
+            page[medicine_id] = record
+            last_id = medicine_id
+        return page, None
     
-    def save_artifacts(self):
-        """Save artifacts to JSON file"""
-        with open(ARTIFACTS_FILE, 'w') as f:
-            json.dump(self.artifacts, f, indent=2)
+    def save_artifacts(self, path=ARTIFACTS_FILE):
+        """Export all artifacts to a JSON file"""
+        self.store.export_json(path)
     
     def generate_medicine_id(self, medicine_name, batch_no):
         """Generate unique medicine ID"""
         return f"{medicine_name}_{batch_no}_{datetime.now().strftime('%Y%m%d')}"
     
-    def create_batch_asa(self, medicine_name, batch_no, total_units=1000, expiry_date="2027-08"):
-        """Create a new batch ASA for a medicine"""
-        medicine_id = self.generate_medicine_id(medicine_name, batch_no)
+    @traced("manager.create_batch_asa")
+    def create_batch_asa(self, medicine_name, batch_no, total_units=1000, expiry_date="2027-08", minter=None,
+                         medicine_id=None):
+        """Create a new batch ASA for a medicine, from minter (default pool account if None)"""
+        minter = minter or self.minters.default
+        medicine_id = medicine_id or self.generate_medicine_id(medicine_name, batch_no)
         
         print(f"Creating batch ASA for {medicine_name} - Batch {batch_no}")
         
@@ -45,106 +245,257 @@ class MedicineManager:
         # Create metadata URL (you'll need to upload to IPFS)
         batch_url = f"ipfs://QmYourCIDHere/batch_{medicine_id}.json"
         
-        params = sp()
+        with span("params"):
+            params = sp()
         txn = tx.AssetCreateTxn(
-            sender=self.creator_addr, sp=params,
+            sender=minter.address, sp=params,
             total=total_units, decimals=0, default_frozen=False,
             unit_name=unit_name, asset_name=asset_name,
             url=batch_url,
-            manager=self.creator_addr, reserve=self.creator_addr, 
-            freeze=self.creator_addr, clawback=self.creator_addr,
+            manager=minter.address, reserve=minter.address, 
+            freeze=minter.address, clawback=minter.address,
+            # ARC-69 note so the batch record can be rebuilt from the chain (see chain_sync.py)
+            note=json.dumps({"standard": "arc69", "properties": {"expiry": expiry_date}}).encode(),
         )
         
-        stx = txn.sign(self.creator_sk)
-        txid = ALGOD.send_transaction(stx)
-        res = wait(txid)
+        blob, (txid,) = SIGNER.sign_group([(txn, minter.address)])
+        with span("submit"):
+            SUBMITTER.send(blob, txid, params.last, PRIORITY_INTERACTIVE)
+        with span("confirm"):
+            res = wait(txid)
         
         batch_asa_id = res["asset-index"]
         print(f"Batch ASA created: {batch_asa_id}")
+        self.record_custody([{"asset_id": batch_asa_id, "batch_asa_id": batch_asa_id, "kind": "mint",
+                              "receiver": minter.address, "amount": total_units,
+                              "round": res["confirmed-round"], "txid": txid}])
         
         return batch_asa_id
     
-    def create_unit_nft(self, medicine_name, batch_no, unit_serial):
-        """Create a new unit NFT for a specific medicine unit"""
+    def unit_nft_fields(self, medicine_name, batch_no, unit_serial):
+        """(unit_name, asset_name, url) of a unit NFT"""
         medicine_id = self.generate_medicine_id(medicine_name, batch_no)
         
-        print(f"Creating unit NFT for {medicine_name} - Unit {unit_serial}")
-        
-        # Generate unique unit name and asset name (max 8 chars for unit_name)
+        # Generate unique unit name and asset name (unit_name cut to 8 bytes on a character boundary)
         medicine_short = medicine_name.replace(' ', '')[:3].upper()
-        unit_name = f"{medicine_short}U{unit_serial}"[:8]  # Ensure max 8 chars
+        unit_name = f"{medicine_short}U{unit_serial}".encode()[:MAX_UNIT_NAME_BYTES].decode("utf-8", "ignore")
         asset_name = f"{medicine_name} Unit #{unit_serial}"
         
         # Create metadata URL (you'll need to upload to IPFS)
         nft_url = f"ipfs://QmYourCIDHere/unit_{medicine_id}_{unit_serial}.json#arc3"
-        
-        params = sp()
-        txn = tx.AssetCreateTxn(
-            sender=self.creator_addr, sp=params,
+        return unit_name, asset_name, nft_url
+    
+    def check_unit_serials(self, medicine_id, serials):
+        """Raise ValueError if a serial would make a unit NFT field longer than Algorand allows"""
+        medicine = self.artifacts["medicines"][medicine_id]
+        limits = (("unit name", MAX_UNIT_NAME_BYTES), ("asset name", MAX_ASSET_NAME_BYTES),
+                  ("URL", MAX_ASSET_URL_BYTES))
+        for serial in serials:
+            fields = self.unit_nft_fields(medicine["medicine_name"], medicine["batch_no"], serial)
+            for (label, limit), value in zip(limits, fields):
+                size = len(value.encode())
+                if size > limit:
+                    raise ValueError(f"Unit serial {serial!r} makes the {label} {size} bytes, "
+                                     f"Algorand allows {limit}")
+    
+    def build_unit_nft_txn(self, medicine_name, batch_no, unit_serial, params, minter):
+        """Build the AssetCreateTxn for a unit NFT, sent by minter"""
+        unit_name, asset_name, nft_url = self.unit_nft_fields(medicine_name, batch_no, unit_serial)
+        return tx.AssetCreateTxn(
+            sender=minter.address, sp=params,
             total=1, decimals=0, default_frozen=False,
             unit_name=unit_name, asset_name=asset_name,
             url=nft_url,
-            manager=self.creator_addr, reserve=self.creator_addr,
-            freeze=self.creator_addr, clawback=self.creator_addr
+            manager=minter.address, reserve=minter.address,
+            freeze=minter.address, clawback=minter.address
         )
+    
+    @traced("manager.create_unit_nft")
+    def create_unit_nft(self, medicine_name, batch_no, unit_serial, minter=None, batch_asa_id=None):
+        """Create a new unit NFT for a specific medicine unit"""
+        minter = minter or self.minters.default
+        print(f"Creating unit NFT for {medicine_name} - Unit {unit_serial}")
         
-        stx = txn.sign(self.creator_sk)
-        txid = ALGOD.send_transaction(stx)
-        res = wait(txid)
+        with span("params"):
+            params = sp()
+        txn = self.build_unit_nft_txn(medicine_name, batch_no, unit_serial, params, minter)
+        blob, (txid,) = SIGNER.sign_group([(txn, minter.address)])
+        with span("submit"):
+            SUBMITTER.send(blob, txid, params.last, PRIORITY_INTERACTIVE)
+        with span("confirm"):
+            res = wait(txid)
         
         unit_nft_id = res["asset-index"]
         print(f"Unit NFT created: {unit_nft_id}")
+        self.record_custody([{"asset_id": unit_nft_id, "batch_asa_id": batch_asa_id, "kind": "mint",
+                              "receiver": minter.address, "amount": 1,
+                              "round": res["confirmed-round"], "txid": txid}])
         
         return unit_nft_id
     
-    def add_medicine(self, medicine_name, batch_no, total_units=1000, expiry_date="2027-08"):
-        """Add a new medicine with batch ASA and track it"""
-        medicine_id = self.generate_medicine_id(medicine_name, batch_no)
+    @traced("manager.mint_unit_nft_groups")
+    def mint_unit_nft_groups(self, medicine_name, batch_no, serials, progress=None, minter=None,
+                             batch_asa_id=None):
+        """Mint unit NFTs in atomic groups, keeping several groups in flight.
         
-        # Create batch ASA
-        batch_asa_id = self.create_batch_asa(medicine_name, batch_no, total_units, expiry_date)
+        progress(done, total) is called after each window of groups. Returns
+        ({unit_serial: unit_nft_id}, {unit_serial: error}).
+        """
+        minter = minter or self.minters.default
+        with span("params"):
+            params = sp()
+        with span("build", txns=len(serials)):
+            txns = [self.build_unit_nft_txn(medicine_name, batch_no, serial, params, minter)
+                    for serial in serials]
         
-        # Initialize medicine entry
-        if "medicines" not in self.artifacts:
-            self.artifacts["medicines"] = {}
+        groups = []
+        for i in range(0, len(txns), MAX_GROUP_SIZE):
+            group = txns[i:i + MAX_GROUP_SIZE]
+            if len(group) > 1:
+                tx.assign_group_id(group)
+            groups.append([(t, minter.address) for t in group])
         
-        self.artifacts["medicines"][medicine_id] = {
-            "medicine_name": medicine_name,
-            "batch_no": batch_no,
-            "batch_asa_id": batch_asa_id,
-            "total_units": total_units,
-            "expiry_date": expiry_date,
-            "created_date": datetime.now().isoformat(),
-            "unit_nfts": {}  # Will store individual unit NFT IDs
-        }
+        # Signed in worker processes for large runs, returned as wire-ready blobs
+        signed = SIGNER.sign_groups(groups)
+        keys = [serials[i:i + MAX_GROUP_SIZE] for i in range(0, len(serials), MAX_GROUP_SIZE)]
+        confirmed, failed = send_groups(list(zip(keys, signed)), progress, label="unit NFTs",
+                                        priority=PRIORITY_BULK, last_valid=params.last)
+        minted = {serial: info["asset-index"] for serial, info in confirmed.items()}
+        self.record_custody([{"asset_id": info["asset-index"], "batch_asa_id": batch_asa_id, "kind": "mint",
+                              "receiver": minter.address, "amount": 1,
+                              "round": info["confirmed-round"], "txid": info["txid"]}
+                             for info in confirmed.values()])
+        UNITS_MINTED.inc(len(minted))
+        MINT_FAILURES.inc(len(failed))
+        return minted, failed
+    
+    def find_batch(self, medicine_name, batch_no):
+        """medicine_id of an existing batch, whatever day it was created on, or None"""
+        self.refresh()
+        for medicine_id, medicine in self.artifacts.get("medicines", {}).items():
+            if medicine["medicine_name"] == medicine_name and medicine["batch_no"] == batch_no:
+                return medicine_id
+        return None
+    
+    @traced("manager.add_medicine")
+    def add_medicine(self, medicine_name, batch_no, total_units=1000, expiry_date="2027-08", medicine_id=None):
+        """Add a new medicine with batch ASA and track it"""
+        medicine_id = medicine_id or self.generate_medicine_id(medicine_name, batch_no)
+        
+        # Lease the medicine ID and the batch so no other thread or worker creates the same batch
+        lease = [f"medicine:{medicine_id}", f"batch:{medicine_name}:{batch_no}"]
+        with span("lease"):
+            self.store.reserve(lease)
+        try:
+            if self.store.load_medicine(medicine_id) is not None or self.find_batch(medicine_name, batch_no):
+                raise ValueError(f"Medicine with batch {batch_no} already exists")
+            
+            # Create batch ASA; its unit NFTs will be minted by the same account
+            minter = self.minters.choose()
+            with self.minters.reserve(minter, 1):
+                batch_asa_id = self.create_batch_asa(medicine_name, batch_no, total_units, expiry_date, minter,
+                                                     medicine_id)
+            
+            medicine = {
+                "medicine_name": medicine_name,
+                "batch_no": batch_no,
+                "batch_asa_id": batch_asa_id,
+                "total_units": total_units,
+                "expiry_date": expiry_date,
+                "created_date": datetime.now().isoformat(),
+                "minter": minter.address,
+                "unit_nfts": {}  # Will store individual unit NFT IDs
+            }
+            
+            with span("store"):
+                self.store.put_medicine(medicine_id, medicine)
+            self.apply_medicine(medicine_id, medicine)
+        finally:
+            self.store.release(lease)
         
-        self.save_artifacts()
         print(f"Medicine {medicine_name} added successfully!")
         print(f"Medicine ID: {medicine_id}")
         print(f"Batch ASA ID: {batch_asa_id}")
         
         return medicine_id, batch_asa_id
     
-    def create_unit_nft_for_medicine(self, medicine_id, unit_serial):
-        """Create a unit NFT for an existing medicine"""
+    def reserve_units(self, medicine_id, serials):
+        """Lease unit serials and check none are minted yet, returns the lease names"""
+        self.refresh()
         if medicine_id not in self.artifacts["medicines"]:
             raise ValueError(f"Medicine {medicine_id} not found")
         
-        medicine = self.artifacts["medicines"][medicine_id]
-        medicine_name = medicine["medicine_name"]
-        batch_no = medicine["batch_no"]
-        
-        # Create unit NFT
-        unit_nft_id = self.create_unit_nft(medicine_name, batch_no, unit_serial)
-        
-        # Store unit NFT ID
-        self.artifacts["medicines"][medicine_id]["unit_nfts"][unit_serial] = unit_nft_id
+        lease = [f"unit:{medicine_id}:{serial}" for serial in serials]
+        with span("lease", units=len(serials)):
+            self.store.reserve(lease)
         
-        self.save_artifacts()
+        medicine = self.store.load_medicine(medicine_id) or self.artifacts["medicines"][medicine_id]
+        existing = [serial for serial in serials if serial in medicine["unit_nfts"]]
+        if existing:
+            self.store.release(lease)
+            raise ValueError(f"Unit serials already minted: {', '.join(existing[:10])}")
+        return lease
+    
+    @traced("manager.create_unit_nft_for_medicine")
+    def create_unit_nft_for_medicine(self, medicine_id, unit_serial):
+        """Create a unit NFT for an existing medicine"""
+        lease = self.reserve_units(medicine_id, [unit_serial])
+        try:
+            medicine = self.artifacts["medicines"][medicine_id]
+            medicine_name = medicine["medicine_name"]
+            batch_no = medicine["batch_no"]
+            minter = self.minters.get(medicine.get("minter"))
+            
+            # Create unit NFT
+            try:
+                with self.minters.reserve(minter, 1):
+                    unit_nft_id = self.create_unit_nft(medicine_name, batch_no, unit_serial, minter,
+                                                       medicine["batch_asa_id"])
+            except Exception:
+                MINT_FAILURES.inc()
+                raise
+            UNITS_MINTED.inc()
+            
+            # Store unit NFT ID
+            with span("store"):
+                self.store.put_units(medicine_id, {unit_serial: unit_nft_id})
+            self.apply_units(medicine_id, {unit_serial: unit_nft_id})
+        finally:
+            self.store.release(lease)
         print(f"Unit NFT created for {medicine_name} Unit {unit_serial}: {unit_nft_id}")
         
         return unit_nft_id
     
+    @traced("manager.create_unit_nfts")
+    def create_unit_nfts(self, medicine_id, serials, progress=None):
+        """Create unit NFTs for many serials of an existing medicine in bulk.
+        
+        All minted IDs are recorded in one storage commit. Returns
+        ({unit_serial: unit_nft_id}, {unit_serial: error}).
+        """
+        serials = list(dict.fromkeys(serials))  # drop duplicates, keep order
+        if not serials:
+            return {}, {}
+        
+        lease = self.reserve_units(medicine_id, serials)
+        try:
+            medicine = self.artifacts["medicines"][medicine_id]
+            minter = self.minters.get(medicine.get("minter"))
+            with self.minters.reserve(minter, len(serials)) as reservation:
+                minted, failed = self.mint_unit_nft_groups(medicine["medicine_name"], medicine["batch_no"],
+                                                           serials, progress, minter, medicine["batch_asa_id"])
+                reservation.created = len(minted)
+            
+            with span("store", units=len(minted)):
+                self.store.put_units(medicine_id, minted)
+            self.apply_units(medicine_id, minted)
+        finally:
+            self.store.release(lease)
+        
+        print(f"Bulk mint for {medicine['medicine_name']}: {len(minted)} created, {len(failed)} failed")
+        
+        return minted, failed
+    
     def list_medicines(self):
         """List all medicines"""
         if not self.artifacts.get("medicines"):
@@ -0,0 +1,225 @@
+import bisect
+import threading
+import time
+from tracing import span
+
+# Seconds; covers cached lookups up to slow chain round-trips
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter, optionally split by labels"""
+
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {} if self.labelnames else {(): 0}
+
+    def inc(self, amount=1, *labels):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        for labels, value in items:
+            yield self.name, format_labels(self.labelnames, labels), value
+
+class Histogram:
+    """Cumulative histogram with fixed buckets, optionally split by labels"""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.values = {}          # labels -> [bucket counts..., sum, count]
+        if not self.labelnames:
+            self.values[()] = [0] * (len(self.buckets) + 2)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            row = self.values.get(labels)
+            if row is None:
+                row = self.values[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                row[index] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def time(self, *labels):
+        """Context manager observing the duration of a block"""
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self.lock:
+            items = [(labels, list(row)) for labels, row in self.values.items()]
+        names = self.labelnames + ("le",)
+        for labels, row in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                yield f"{self.name}_bucket", format_labels(names, labels + (format_value(float(bound)),)), cumulative
+            yield f"{self.name}_bucket", format_labels(names, labels + ("+Inf",)), row[-1]
+            yield f"{self.name}_sum", format_labels(self.labelnames, labels), row[-2]
+            yield f"{self.name}_count", format_labels(self.labelnames, labels), row[-1]
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+class Registry:
+    """Holds metrics and scrape-time collectors, renders the Prometheus text format.
+
+    Collectors are callables returning [(name, type, help, [(labels, value)])]
+    and are only run on scrape, for values other objects already track.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        with self.lock:
+            self.collectors.append(collector)
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics)
+            collectors = list(self.collectors)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {format_value(value)}")
+        # Collectors may return a family in several parts; each is rendered once
+        families = {}
+        for collector in collectors:
+            try:
+                collected = collector()
+            except Exception as e:
+                lines.append(f"# collector error: {escape(str(e))}")
+                continue
+            for name, kind, help, samples in collected:
+                families.setdefault(name, (kind, help, []))[2].extend(samples)
+        for name, (kind, help, samples) in families.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = format_labels(tuple(labels), tuple(labels.values()))
+                lines.append(f"{name}{label_text} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "pharmtrust_http_requests_total", "HTTP responses by route, method and status",
+    ("route", "method", "status"))
+HTTP_LATENCY = REGISTRY.histogram(
+    "pharmtrust_http_request_duration_seconds", "Time to build the HTTP response",
+    ("route", "method"))
+HTTP_EXCEPTIONS = REGISTRY.counter(
+    "pharmtrust_http_exceptions_total", "Exceptions that escaped route handlers", ("route", "exception"))
+ALGOD_CALLS = REGISTRY.histogram(
+    "pharmtrust_algod_call_duration_seconds", "algod client call latency", ("method",))
+ALGOD_ERRORS = REGISTRY.counter(
+    "pharmtrust_algod_errors_total", "Failed algod client calls", ("method", "status"))
+CONFIRMATION_SECONDS = REGISTRY.histogram(
+    "pharmtrust_confirmation_seconds", "Time from registering a txid to its confirmation",
+    buckets=(0.5, 1, 2, 3, 4, 5, 7.5, 10, 15, 20, 30, 60))
+CONFIRMATION_ROUNDS = REGISTRY.histogram(
+    "pharmtrust_confirmation_rounds", "Rounds from registering a txid to its confirmation",
+    buckets=(0, 1, 2, 3, 4, 5, 7, 10, 15, 20))
+UNITS_MINTED = REGISTRY.counter(
+    "pharmtrust_units_minted_total", "Unit NFTs minted")
+MINT_FAILURES = REGISTRY.counter(
+    "pharmtrust_mint_failures_total", "Unit NFTs that failed to mint")
+MINTER_TOP_UPS = REGISTRY.counter(
+    "pharmtrust_minter_top_ups_total", "Treasury payments to minter accounts", ("minter",))
+SIGNED_TXNS = REGISTRY.counter(
+    "pharmtrust_signed_transactions_total", "Transactions signed by the signer service")
+SIGNING_SECONDS = REGISTRY.histogram(
+    "pharmtrust_signing_batch_seconds", "Time to sign one batch of transaction groups")
+SUBMISSIONS = REGISTRY.counter(
+    "pharmtrust_submissions_total", "send_raw_transaction attempts by the submission scheduler",
+    ("result",))
+EVIDENCE_ANCHORED = REGISTRY.counter(
+    "pharmtrust_evidence_anchored_total", "Evidence hashes anchored on-chain")
+ASSETS_SHIPPED = REGISTRY.counter(
+    "pharmtrust_assets_shipped_total", "Assets transferred in shipments", ("result",))
+
+class InstrumentedClient:
+    """Wraps an algod client so every public method call is timed and errors counted.
+
+    Calls made while a trace is active are also recorded as algod.<method> spans.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._wrapped = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name.startswith("_") or name == "stats" or not callable(attr):
+            return attr
+        wrapped = self._wrapped.get(name)
+        if wrapped is None:
+            wrapped = self._wrapped[name] = self._wrap(name)
+        return wrapped
+
+    def _wrap(self, name):
+        span_name = f"algod.{name}"
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                with span(span_name):
+                    return getattr(self._client, name)(*args, **kwargs)
+            except Exception as e:
+                ALGOD_ERRORS.inc(1, name, getattr(e, "code", None) or type(e).__name__)
+                raise
+            finally:
+                ALGOD_CALLS.observe(time.perf_counter() - start, name)
+        return call
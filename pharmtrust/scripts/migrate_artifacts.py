@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Script to move artifacts between artifacts.json and the storage backend
+Usage: python migrate_artifacts.py import|export [json_path]
+"""
+
+import sys
+from storage import ARTIFACTS_FILE, open_store
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("import", "export"):
+        print("Usage: python migrate_artifacts.py import|export [json_path]")
+        print("Example: python migrate_artifacts.py import ../artifacts.json")
+        return
+    
+    action = sys.argv[1]
+    path = sys.argv[2] if len(sys.argv) > 2 else ARTIFACTS_FILE
+    store = open_store()
+    
+    try:
+        if action == "import":
+            count = store.import_json(path)
+            print(f"✅ Imported {count} medicines from {path}")
+        else:
+            store.export_json(path)
+            print(f"✅ Exported artifacts to {path}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Pool of minter accounts that batch ASAs and unit NFTs are spread across
+Usage: python minters.py [status|fund]
+"""
+
+import contextlib
+import sys
+import threading
+import time
+from algosdk import constants, transaction as tx  # type: ignore
+from common import ALGOD, ASSET_MIN_BALANCE, CONF, SUBMITTER, acct, sp, wait
+from metrics import MINTER_TOP_UPS
+from signer import SIGNER
+from storage import open_store
+from submitter import PRIORITY_NORMAL
+from tracing import span
+
+MINT_COST = ASSET_MIN_BALANCE + constants.min_txn_fee   # microAlgos tied up per created asset
+FUNDING_LEASE = "minter-funding"
+LEGACY_MINTER = "creator"    # minted every record from before the pool, which have no minter field
+
+class Minter:
+    """One signing account in the pool and what the scheduler knows about it"""
+
+    def __init__(self, key):
+        self.key = key
+        self.address, self.sk = acct(key)
+        self.spendable = None        # amount - min-balance at the last refresh, microAlgos
+        self.reserved = 0            # microAlgos held back for mints in flight
+        self.in_flight = 0           # assets being minted
+
+    def headroom(self):
+        return (self.spendable or 0) - self.reserved
+
+class MinterPool:
+    """Spreads mints across the configured minter accounts.
+
+    New medicines go to the account with the fewest mints in flight among
+    those that can pay for them; a medicine's unit NFTs are minted by the
+    account that holds its batch ASA. Every created asset raises the
+    account's minimum balance by 0.1 ALGO, so reserve() holds back that much
+    per asset and asks the funding monitor for a top-up when it runs short.
+    """
+
+    def __init__(self, keys, client=ALGOD):
+        if not keys:
+            raise ValueError("At least one minter account is required")
+        self.client = client
+        self.minters = [Minter(key) for key in keys]
+        self.by_address = {m.address: m for m in self.minters}
+        self.lock = threading.Lock()
+        self.funder = None
+
+    @property
+    def default(self):
+        """Account for callers that don't pick one: the first in the pool"""
+        return self.minters[0]
+
+    def addresses(self):
+        return list(self.by_address)
+
+    def get(self, address=None):
+        """Minter for an address from a medicine record; None (a record from before the pool) means the creator"""
+        key = None
+        if address is None:
+            key = LEGACY_MINTER
+            address = acct(LEGACY_MINTER)[0]
+        minter = self.by_address.get(address)
+        if minter is None:
+            raise ValueError(f"Minter account {key or address} is not in the pool, "
+                             f"add its key to minters.accounts")
+        return minter
+
+    def refresh(self, minter):
+        """Re-read an account's spendable balance from algod"""
+        info = self.client.account_info(minter.address)
+        with self.lock:
+            minter.spendable = info["amount"] - info.get("min-balance", 0)
+        return info
+
+    def choose(self, count=1):
+        """Pick the account to create a new medicine's assets with"""
+        for minter in self.minters:
+            if minter.spendable is None:
+                self.refresh(minter)
+        cost = count * MINT_COST
+        with self.lock:
+            funded = [m for m in self.minters if m.headroom() >= cost] or self.minters
+            return min(funded, key=lambda m: (m.in_flight, -m.headroom()))
+
+    def reserve(self, minter, count):
+        """Context manager holding back the balance for count asset creations.
+
+        It yields the reservation; set its created to the number of assets
+        actually made when that can be fewer than count.
+        """
+        return _Reservation(self, minter, count)
+
+    def _acquire(self, minter, count):
+        cost = count * MINT_COST
+        if self._try_reserve(minter, cost, count):
+            return
+        # The cached balance may predate a top-up, re-read it before asking for one
+        self.refresh(minter)
+        if self._try_reserve(minter, cost, count):
+            return
+        if self.funder is not None:
+            self.funder.fund(minter, cost)
+            if self._try_reserve(minter, cost, count):
+                return
+        raise ValueError(f"Minter {minter.key} needs {cost / 1e6:.3f} ALGO free to create "
+                         f"{count} assets, has {minter.headroom() / 1e6:.3f}")
+
+    def _try_reserve(self, minter, cost, count):
+        with self.lock:
+            if minter.spendable is None or minter.headroom() < cost:
+                return False
+            minter.reserved += cost
+            minter.in_flight += count
+            return True
+
+    def _release(self, minter, count, created):
+        """Drop a reservation; created is how many assets were made, None if that isn't known"""
+        with self.lock:
+            minter.reserved -= count * MINT_COST
+            minter.in_flight -= count
+            if created is not None:
+                minter.spendable = (minter.spendable or 0) - created * MINT_COST
+                return
+        # A mint that raised may still have confirmed, so ask algod
+        try:
+            self.refresh(minter)
+        except Exception:
+            with self.lock:
+                minter.spendable = (minter.spendable or 0) - count * MINT_COST
+
+    def stats(self):
+        with self.lock:
+            return [{
+                "key": m.key,
+                "address": m.address,
+                "spendable": m.spendable,
+                "reserved": m.reserved,
+                "in_flight": m.in_flight,
+            } for m in self.minters]
+
+class _Reservation:
+    def __init__(self, pool, minter, count):
+        self.pool = pool
+        self.minter = minter
+        self.count = count
+        self.created = None
+
+    def __enter__(self):
+        with span("reserve_minter", count=self.count):
+            self.pool._acquire(self.minter, self.count)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None and self.created is None:
+            self.created = self.count
+        self.pool._release(self.minter, self.count, self.created)
+        return False
+
+class FundingMonitor:
+    """Tops up pool accounts from the treasury account.
+
+    Every interval seconds, accounts with less than low_water microAlgos
+    spendable get top_up sent to them. The pool also calls fund() directly
+    when a mint needs more than an account has. With a store in leases,
+    checks and payments run under one lease shared by all workers, and
+    balances are re-read under it so a top-up another worker just sent
+    isn't paid twice.
+    """
+
+    def __init__(self, pool, treasury_key, low_water=10_000_000, top_up=50_000_000, client=ALGOD,
+                 leases=None, lease_wait=60.0):
+        self.pool = pool
+        self.client = client
+        self.treasury_key = treasury_key
+        self.treasury_addr = acct(treasury_key)[0]
+        self.low_water = low_water
+        self.top_up = top_up
+        self.leases = leases              # ArtifactStore whose leases span worker processes
+        self.lease_wait = lease_wait
+        self.lock = threading.Lock()      # one payment at a time keeps the treasury check honest
+        self.thread = None
+        pool.funder = self
+
+    @contextlib.contextmanager
+    def _lease(self, wait):
+        """Hold the funding lease, waiting up to wait seconds; ValueError if another worker keeps it"""
+        with self.lock:
+            if self.leases is None:
+                yield
+                return
+            deadline = time.monotonic() + wait
+            while True:
+                try:
+                    self.leases.reserve([FUNDING_LEASE], ttl=max(120, self.lease_wait * 2))
+                    break
+                except ValueError:
+                    if time.monotonic() >= deadline:
+                        raise
+                    time.sleep(0.2)
+            try:
+                yield
+            finally:
+                self.leases.release([FUNDING_LEASE])
+
+    def fund(self, minter, needed=0):
+        """Top a minter up until it has needed spendable, returns the amount sent (0 if it already has)"""
+        if minter.address == self.treasury_addr:
+            raise ValueError(f"Minter {minter.key} is the treasury and can't be topped up")
+        with self._lease(self.lease_wait):
+            return self._fund(minter, needed)
+
+    def _fund(self, minter, needed):
+        # Re-read under the lease: another worker may have just paid this account
+        self.pool.refresh(minter)
+        shortfall = needed - minter.headroom()
+        if shortfall <= 0:
+            return 0
+        amount = max(self.top_up, shortfall)
+        info = self.client.account_info(self.treasury_addr)
+        available = info["amount"] - info.get("min-balance", 0) - constants.min_txn_fee
+        if available < amount:
+            raise ValueError(f"Treasury {self.treasury_key} has {available / 1e6:.3f} ALGO free, "
+                             f"{minter.key} needs {amount / 1e6:.3f}")
+        with span("fund_minter"):
+            params = sp()
+            txn = tx.PaymentTxn(self.treasury_addr, params, minter.address, amount)
+            blob, (txid,) = SIGNER.sign_group([(txn, self.treasury_addr)])
+            SUBMITTER.send(blob, txid, params.last, PRIORITY_NORMAL)
+            wait(txid)
+        MINTER_TOP_UPS.inc(1, minter.key)
+        self.pool.refresh(minter)
+        print(f"Funded minter {minter.key} with {amount / 1e6:.3f} ALGO")
+        return amount
+
+    def check(self):
+        """Refresh every pool account and top up the ones below low_water"""
+        funded = {}
+        try:
+            with self._lease(0):
+                for minter in self.pool.minters:
+                    try:
+                        self.pool.refresh(minter)
+                        if minter.address != self.treasury_addr and minter.spendable < self.low_water:
+                            funded[minter.key] = self._fund(minter, self.low_water)
+                    except Exception as e:
+                        print(f"Funding monitor: {minter.key}: {e}")
+        except ValueError:
+            pass  # another worker is checking
+        return funded
+
+    def start(self, interval=60.0):
+        if self.thread is not None:
+            return self.thread
+
+        def run():
+            while True:
+                self.check()
+                threading.Event().wait(interval)
+
+        self.thread = threading.Thread(target=run, name="minter-funding", daemon=True)
+        self.thread.start()
+        return self.thread
+
+def make_pool(conf=CONF):
+    """MinterPool and FundingMonitor (None without a treasury) from the "minters" config section"""
+    section = conf.get("minters", {})
+    pool = MinterPool(section.get("accounts", ["creator"]))
+    monitor = None
+    if section.get("treasury"):
+        monitor = FundingMonitor(pool, section["treasury"],
+                                 low_water=int(section.get("low_water", 10.0) * 1e6),
+                                 top_up=int(section.get("top_up", 50.0) * 1e6))
+    return pool, monitor
+
+MINTERS, FUNDING = make_pool()
+
+def main():
+    action = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if action not in ("status", "fund"):
+        print("Usage: python minters.py [status|fund]")
+        return
+    if action == "fund":
+        if FUNDING is None:
+            print("❌ ERROR: No treasury configured, set minters.treasury in config/accounts.json")
+            return
+        FUNDING.leases = open_store()
+        funded = FUNDING.check()
+        print(f"✅ Topped up {len(funded)} accounts")
+    for minter in MINTERS.minters:
+        if minter.spendable is None:
+            MINTERS.refresh(minter)
+        print(f"{minter.key:<12} {minter.address}  {minter.spendable / 1e6:>12.3f} ALGO free "
+              f"(~{minter.spendable // MINT_COST} more assets)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import qrcode  # type: ignore
+import qrcode.image.svg  # type: ignore
+
+ROOT = Path(__file__).resolve().parents[2]
+QR_DIR = ROOT / "pharmtrust" / "static" / "qr_codes"
+
+# Bump when rendering settings change so old cached images are not served
+RENDER_VERSION = 1
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+def qr_payload(unit_nft_id):
+    """Deterministic QR payload for a unit NFT"""
+    return json.dumps({
+        "unit_nft_id": str(unit_nft_id),
+        "verification_url": f"/verify/{unit_nft_id}",
+    }, sort_keys=True, separators=(",", ":"))
+
+def render_qr(data, fmt="png"):
+    """Render data as a QR code image and return the encoded bytes"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    buffer = io.BytesIO()
+    if fmt == "svg":
+        img = qr.make_image(image_factory=qrcode.image.svg.SvgPathImage)
+        img.save(buffer)
+    else:
+        img = qr.make_image(fill_color="black", back_color="white")
+        img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def qr_etag(unit_nft_id, fmt="png"):
+    key = f"{RENDER_VERSION}:{fmt}:{qr_payload(unit_nft_id)}"
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+class QRCache:
+    """Bounded in-memory LRU in front of an on-disk cache of rendered QR codes"""
+
+    def __init__(self, directory=QR_DIR, max_entries=1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # etag -> bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, unit_nft_id, fmt="png"):
+        """Return (image bytes, etag) for a unit NFT's QR code"""
+        if fmt not in CONTENT_TYPES:
+            raise ValueError(f"Unsupported QR format: {fmt}")
+        etag = qr_etag(unit_nft_id, fmt)
+
+        with self.lock:
+            image = self.entries.get(etag)
+            if image is not None:
+                self.entries.move_to_end(etag)
+                self.hits += 1
+                return image, etag
+
+        path = self.directory / f"{etag}.{fmt}"
+        if path.exists():
+            image = path.read_bytes()
+            with self.lock:
+                self.disk_hits += 1
+        else:
+            image = render_qr(qr_payload(unit_nft_id), fmt)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(image)
+            tmp.replace(path)
+            with self.lock:
+                self.misses += 1
+
+        with self.lock:
+            self.entries[etag] = image
+            self.entries.move_to_end(etag)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return image, etag
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / total if total else 0.0,
+            }
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Script to export QR labels for every unit NFT of a medicine
+Usage: python qr_labels.py "Medicine ID" [zip|pdf] [output_path]
+"""
+
+import io
+import sys
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from PIL import Image, ImageDraw  # type: ignore
+from qr_codes import qr_payload, render_qr
+from spawn_pool import spawn_context
+
+# A4 at 150 dpi, 3 x 4 labels per page
+PAGE_SIZE = (1240, 1754)
+PAGE_COLUMNS = 3
+PAGE_ROWS = 4
+LABEL_SIZE = (PAGE_SIZE[0] // PAGE_COLUMNS, PAGE_SIZE[1] // PAGE_ROWS)
+
+# Labels rendered ahead of the consumer; bounds memory regardless of batch size
+RENDER_WINDOW = 64
+
+# One render pool per process, started by the first export and reused by the next ones
+_pool = None
+_pool_lock = threading.Lock()
+
+def render_label(unit):
+    """Render one label (QR code plus caption) as PNG bytes; runs in a worker process"""
+    medicine_name, unit_serial, unit_nft_id = unit
+    qr = Image.open(io.BytesIO(render_qr(qr_payload(unit_nft_id)))).convert("RGB")
+
+    label = Image.new("RGB", LABEL_SIZE, "white")
+    size = min(LABEL_SIZE[0], LABEL_SIZE[1] - 60)
+    qr = qr.resize((size, size))
+    label.paste(qr, ((LABEL_SIZE[0] - size) // 2, 0))
+
+    draw = ImageDraw.Draw(label)
+    draw.text((20, size + 5), f"{medicine_name}", fill="black")
+    draw.text((20, size + 25), f"Unit {unit_serial}  NFT {unit_nft_id}", fill="black")
+
+    buffer = io.BytesIO()
+    label.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def label_pool():
+    """The shared process pool labels are rendered in, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(mp_context=spawn_context())
+        return _pool
+
+def iter_labels(medicine):
+    """Yield (unit_serial, unit_nft_id, png_bytes) in order, rendered in the shared process pool"""
+    units = [(medicine["medicine_name"], serial, nft_id)
+             for serial, nft_id in medicine.get("unit_nfts", {}).items()]
+
+    pool = label_pool()
+    in_flight = deque()
+    try:
+        for unit in units:
+            in_flight.append((unit, pool.submit(render_label, unit)))
+            if len(in_flight) >= RENDER_WINDOW:
+                (_, serial, nft_id), future = in_flight.popleft()
+                yield serial, nft_id, future.result()
+        while in_flight:
+            (_, serial, nft_id), future = in_flight.popleft()
+            yield serial, nft_id, future.result()
+    finally:
+        # An abandoned download leaves at most RENDER_WINDOW labels queued; drop them
+        for _, future in in_flight:
+            future.cancel()
+
+class _StreamBuffer:
+    """Write-only file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def stream_zip(labels):
+    """Stream labels as a ZIP archive, one PNG per unit"""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for serial, nft_id, png in labels:
+            archive.writestr(f"{serial}_{nft_id}.png", png)
+            yield buffer.drain()
+    yield buffer.drain()
+
+def _pdf_object(number, body, stream=None):
+    """One indirect PDF object, with an optional stream"""
+    data = f"{number} 0 obj\n".encode() + body
+    if stream is not None:
+        data += b"\nstream\n" + stream + b"\nendstream"
+    return data + b"\nendobj\n"
+
+def stream_pdf(labels, resolution=150):
+    """Stream labels as a multi-page print-ready PDF sheet, one page in memory at a time.
+
+    Each full page is written out as soon as it is laid out, as a lossless
+    image covering the page; the page tree and cross-reference table follow
+    the last page, so nothing written is read back.
+    """
+    width, height = (size * 72 / resolution for size in PAGE_SIZE)
+    offsets = {}          # object number -> byte offset
+    written = 0
+    kids = []
+
+    def emit(number, body, stream=None):
+        nonlocal written
+        offsets[number] = written
+        data = _pdf_object(number, body, stream)
+        written += len(data)
+        return data
+
+    def page_objects(page):
+        # Objects 1 and 2 are the catalog and the page tree; each page takes the next three
+        number = 3 + 3 * len(kids)
+        kids.append(number)
+        pixels = zlib.compress(page.tobytes())
+        image = emit(number + 2, (f"<< /Type /XObject /Subtype /Image /Width {PAGE_SIZE[0]} "
+                                  f"/Height {PAGE_SIZE[1]} /ColorSpace /DeviceRGB /BitsPerComponent 8 "
+                                  f"/Filter /FlateDecode /Length {len(pixels)} >>").encode(), pixels)
+        draw = f"q {width:.2f} 0 0 {height:.2f} 0 0 cm /Im0 Do Q".encode()
+        content = emit(number + 1, f"<< /Length {len(draw)} >>".encode(), draw)
+        page = emit(number, (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width:.2f} {height:.2f}] "
+                             f"/Resources << /XObject << /Im0 {number + 2} 0 R >> >> "
+                             f"/Contents {number + 1} 0 R >>").encode())
+        return image + content + page
+
+    header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+    written = len(header)
+    yield header
+
+    page = None
+    for i, (_, _, png) in enumerate(labels):
+        slot = i % (PAGE_COLUMNS * PAGE_ROWS)
+        if slot == 0:
+            if page is not None:
+                yield page_objects(page)
+            page = Image.new("RGB", PAGE_SIZE, "white")
+        label = Image.open(io.BytesIO(png))
+        page.paste(label, ((slot % PAGE_COLUMNS) * LABEL_SIZE[0], (slot // PAGE_COLUMNS) * LABEL_SIZE[1]))
+    yield page_objects(page if page is not None else Image.new("RGB", PAGE_SIZE, "white"))
+
+    refs = " ".join(f"{number} 0 R" for number in kids)
+    tail = emit(2, f"<< /Type /Pages /Kids [{refs}] /Count {len(kids)} >>".encode())
+    tail += emit(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+    size = 3 + 3 * len(kids)
+    xref = [f"xref\n0 {size}\n0000000000 65535 f \n"]
+    xref += [f"{offsets[number]:010d} 00000 n \n" for number in range(1, size)]
+    xref.append(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{written}\n%%EOF\n")
+    yield tail + "".join(xref).encode()
+
+def export_labels(medicine, fmt="zip"):
+    """Return a generator of bytes for the label export in the given format"""
+    if fmt == "zip":
+        return stream_zip(iter_labels(medicine))
+    if fmt == "pdf":
+        return stream_pdf(iter_labels(medicine))
+    raise ValueError(f"Unsupported label format: {fmt}")
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python qr_labels.py \"Medicine ID\" [zip|pdf] [output_path]")
+        print("Example: python qr_labels.py \"Amoxy_500_B2025-09-16_20241216\" pdf labels.pdf")
+        print("\nTo see available medicines, run: python list_medicines.py")
+        return
+
+    from storage import open_store
+
+    medicine_id = sys.argv[1]
+    fmt = sys.argv[2] if len(sys.argv) > 2 else "zip"
+    output_path = sys.argv[3] if len(sys.argv) > 3 else f"labels_{medicine_id}.{fmt}"
+
+    store = open_store()
+    try:
+        medicine = store.load()["medicines"].get(medicine_id)
+        if medicine is None:
+            print(f"❌ ERROR: Medicine {medicine_id} not found")
+            return
+
+        with open(output_path, "wb") as f:
+            for chunk in export_labels(medicine, fmt):
+                f.write(chunk)
+
+        print(f"✅ Exported {len(medicine['unit_nfts'])} labels to {output_path}")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    # Pool workers unpickle render_label from the qr_labels module, not from this script
+    import qr_labels
+    qr_labels.main()
@@ -0,0 +1,177 @@
+from algosdk import transaction as tx  # type: ignore
+from common import ALGOD, ASSET_MIN_BALANCE, CONF, MAX_GROUP_SIZE, SETTINGS_SECTIONS, acct, send_groups, sp
+from metrics import ASSETS_SHIPPED
+from minters import MINTERS
+from signer import SIGNER
+from tracing import traced
+
+def parse_items(unit_nft_ids=(), batches=()):
+    """Normalise a shipment into [(asset_id, amount)], merging repeated assets.
+
+    unit_nft_ids ship one of each NFT; batches are {"asset_id", "amount"}
+    dicts for batch ASA quantities. Raises ValueError on bad input.
+    """
+    amounts = {}
+    for unit_nft_id in unit_nft_ids:
+        asset_id = int(unit_nft_id)
+        if asset_id in amounts:
+            raise ValueError(f"Unit NFT {asset_id} listed twice")
+        amounts[asset_id] = 1
+    for batch in batches:
+        asset_id, amount = int(batch["asset_id"]), int(batch["amount"])
+        if amount <= 0:
+            raise ValueError(f"Amount for asset {asset_id} must be positive")
+        amounts[asset_id] = amounts.get(asset_id, 0) + amount
+    if not amounts:
+        raise ValueError("Shipment is empty")
+    return list(amounts.items())
+
+def plan_shipment(items, sender_infos, receiver_info, is_unit=None):
+    """Check holdings once and split items into (transfers, opt_ins, errors, delivered).
+
+    sender_infos is {address: account_info} for the accounts that may hold
+    the items; each transfer is (asset_id, amount, sender address). A unit
+    NFT (is_unit(asset_id), total supply 1) the senders no longer have but
+    the receiver holds was delivered by an earlier run and goes to
+    delivered. Batch amounts are fungible, so balances say nothing about
+    them; re-runs rely on the shipment journal instead.
+    """
+    holdings = {}
+    for address, info in sender_infos.items():
+        for a in info.get("assets", []):
+            if a["amount"] > holdings.get(a["asset-id"], (None, {"amount": 0}))[1]["amount"]:
+                holdings[a["asset-id"]] = (address, a)
+    receiver_assets = {a["asset-id"]: a["amount"] for a in receiver_info.get("assets", [])}
+    transfers, opt_ins, errors, delivered = [], set(), {}, []
+    for asset_id, amount in items:
+        sender, held = holdings.get(asset_id, (None, None))
+        short = held is None or held["amount"] < amount
+        if (short and amount == 1 and receiver_assets.get(asset_id, 0) >= 1
+                and is_unit is not None and is_unit(asset_id)):
+            delivered.append(asset_id)
+        elif short:
+            errors[asset_id] = f"Sender holds {held['amount'] if held else 0} of asset {asset_id}, need {amount}"
+        elif held.get("is-frozen"):
+            errors[asset_id] = f"Asset {asset_id} is frozen"
+        else:
+            transfers.append((asset_id, amount, sender))
+            if asset_id not in receiver_assets:
+                opt_ins.add(asset_id)
+    return transfers, opt_ins, errors, delivered
+
+def is_unit_nft(asset_id):
+    """True for single-unit assets (unit NFTs), as opposed to fungible batch ASAs"""
+    return ALGOD.asset_info(asset_id)["params"].get("total") == 1
+
+def journaled_round(txid, last_valid, custody):
+    """Round a journaled transfer confirmed in, 0 if it can no longer confirm, None if undecided"""
+    if custody is not None:
+        events = custody.by_txid(txid)
+        if events:
+            return events[0]["round"]
+    try:
+        info = ALGOD.pending_transaction_info(txid)
+        if info.get("confirmed-round"):
+            return info["confirmed-round"]
+        if info.get("pool-error"):
+            return 0
+    except Exception:
+        pass  # algod forgets transactions some rounds after they confirm
+    # The custody follower records every transfer of our assets in the rounds it has finished
+    checkpoint = custody.checkpoint() if custody is not None else None
+    if checkpoint is not None and checkpoint >= last_valid:
+        return 0
+    return None
+
+@traced("shipments.ship")
+def ship(receiver_key, items, progress=None, custody=None, journal=None, shipment_id=None):
+    """Transfer [(asset_id, amount)] from the minter accounts holding them to a configured account.
+
+    Opt-ins the receiver is missing are signed with its key and grouped with
+    their transfer, 16 transactions per atomic group, with several groups in
+    flight. Confirmed transfers are appended to the custody log if one is
+    given. With a journal (an ArtifactStore) and shipment_id, each transfer's
+    txid is saved before it is sent, and a re-run skips items whose earlier
+    transfer confirmed. Returns ({asset_id: confirmed_round}, {asset_id: error});
+    unit NFTs a re-run finds already delivered are shipped with a round of None.
+    """
+    if receiver_key not in CONF or receiver_key in SETTINGS_SECTIONS:
+        raise ValueError(f"Unknown receiver account: {receiver_key}")
+    receiver_addr, _ = acct(receiver_key)
+    if receiver_addr in MINTERS.by_address:
+        raise ValueError("Receiver is a minter account")
+
+    journal_key = f"shipment:{shipment_id}" if journal is not None and shipment_id else None
+    sent = journal.get_meta(journal_key, {}) if journal_key else {}   # asset_id -> [txid, last_valid]
+    done, failed = {}, {}
+    for asset_id, (txid, last_valid) in sent.items():
+        rnd = journaled_round(txid, last_valid, custody)
+        if rnd:
+            done[int(asset_id)] = rnd
+        elif rnd is None:
+            failed[int(asset_id)] = f"Earlier transfer {txid} is not settled yet, retry after round {last_valid}"
+    items = [(asset_id, amount) for asset_id, amount in items if asset_id not in done and asset_id not in failed]
+
+    # One account_info per account covers every holding check in the shipment
+    receiver_info = ALGOD.account_info(receiver_addr)
+    sender_infos = {address: ALGOD.account_info(address) for address in MINTERS.addresses()}
+    transfers, opt_ins, errors, delivered = plan_shipment(items, sender_infos, receiver_info, is_unit_nft)
+    failed.update(errors)
+    done.update(dict.fromkeys(delivered))
+    if not transfers:
+        return done, failed
+
+    params = sp()
+    needed = receiver_info.get("min-balance", 0) + len(opt_ins) * (ASSET_MIN_BALANCE + params.min_fee)
+    if opt_ins and receiver_info["amount"] < needed:
+        raise ValueError(f"Receiver needs {needed / 1e6:.3f} ALGO to opt in to {len(opt_ins)} assets, "
+                         f"has {receiver_info['amount'] / 1e6:.3f}")
+
+    # Opt-in and transfer for one asset always share a group
+    units = []
+    for asset_id, amount, sender_addr in transfers:
+        unit = []
+        if asset_id in opt_ins:
+            unit.append((None, tx.AssetTransferTxn(receiver_addr, params, receiver_addr, 0, asset_id), receiver_addr))
+        unit.append((asset_id, tx.AssetTransferTxn(sender_addr, params, receiver_addr, amount, asset_id), sender_addr))
+        units.append(unit)
+
+    groups, current = [], []
+    for unit in units:
+        if len(current) + len(unit) > MAX_GROUP_SIZE:
+            groups.append(current)
+            current = []
+        current.extend(unit)
+    if current:
+        groups.append(current)
+
+    for group in groups:
+        txns = [txn for _, txn, _ in group]
+        if len(txns) > 1:
+            tx.assign_group_id(txns)
+    signed = SIGNER.sign_groups([[(txn, address) for _, txn, address in group] for group in groups])
+    keys = [[key for key, _, _ in group] for group in groups]
+    if journal_key:
+        for group_keys, (_, txids) in zip(keys, signed):
+            sent.update({str(asset_id): [txid, params.last] for asset_id, txid in zip(group_keys, txids)
+                         if asset_id is not None})
+        journal.set_meta(journal_key, sent)
+    confirmed, errors = send_groups(list(zip(keys, signed)), progress, label="transfers",
+                                   last_valid=params.last)
+    failed.update(errors)
+    shipped = dict(done)
+    shipped.update({asset_id: info["confirmed-round"] for asset_id, info in confirmed.items()})
+    if custody is not None:
+        senders = {asset_id: (sender, amount) for asset_id, amount, sender in transfers}
+        try:
+            custody.record([{"asset_id": asset_id, "kind": "transfer", "sender": senders[asset_id][0],
+                             "receiver": receiver_addr, "amount": senders[asset_id][1],
+                             "round": info["confirmed-round"], "txid": info["txid"]}
+                            for asset_id, info in confirmed.items()])
+        except Exception as e:
+            print(f"Custody log error: {e}")
+    ASSETS_SHIPPED.inc(len(confirmed), "shipped")
+    ASSETS_SHIPPED.inc(len(failed), "failed")
+    print(f"Shipment to {receiver_key}: {len(confirmed)} assets transferred "
+          f"({len(opt_ins)} opt-ins), {len(done)} already delivered, {len(failed)} failed")
+    return shipped, failed
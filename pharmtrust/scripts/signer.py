@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Sign transaction groups with keys decoded once, in a process pool for large batches
+Usage: python signer.py [bench] [txn_count]
+"""
+
+import base64
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from algosdk import encoding, transaction as tx  # type: ignore
+from common import CONF, SETTINGS_SECTIONS, acct, sp
+from metrics import SIGNED_TXNS, SIGNING_SECONDS
+from spawn_pool import spawn_context
+from tracing import span
+
+TXNS_PER_TASK = 256          # groups are handed to workers in chunks of about this many txns
+
+# Per worker process: address -> private key, installed once by the pool initializer
+_worker_keys = {}
+
+def _init_worker(keys):
+    _worker_keys.update(keys)
+
+def _sign_chunk(groups):
+    return [_sign_group(group, _worker_keys) for group in groups]
+
+def _sign_group(group, keys):
+    """Sign [(txn, address)], returns (base64 blob for send_raw_transaction, [txid])"""
+    raw, txids = [], []
+    for txn, address in group:
+        stx = txn.sign(keys[address])
+        raw.append(base64.b64decode(encoding.msgpack_encode(stx)))
+        txids.append(stx.get_txid())
+    return base64.b64encode(b"".join(raw)).decode(), txids
+
+class Signer:
+    """Holds decoded signing keys and signs transaction groups into wire-ready blobs.
+
+    Batches of at least min_pool_txns transactions are signed across a pool
+    of worker processes, each given the keys once when it starts; smaller
+    ones are signed inline. Blobs go straight to send_raw_transaction.
+    """
+
+    def __init__(self, keys, processes=None, min_pool_txns=512):
+        self.keys = dict(keys)                 # address -> private key
+        self.processes = processes or os.cpu_count() or 1
+        self.min_pool_txns = min_pool_txns
+        self.lock = threading.Lock()
+        self.pool = None
+        self.signed = 0
+        self.seconds = 0.0
+        self.last_rate = None                  # txns/second of the most recent batch
+
+    def sign_group(self, group):
+        """Sign one group of (txn, address), returns (blob, [txid])"""
+        return self.sign_groups([group])[0]
+
+    def sign_groups(self, groups):
+        """Sign [[(txn, address)]] in order, returns [(blob, [txid])]"""
+        count = sum(len(group) for group in groups)
+        missing = {address for group in groups for _, address in group if address not in self.keys}
+        if missing:
+            raise ValueError(f"No signing key for {', '.join(sorted(missing))}")
+
+        start = time.perf_counter()
+        with span("sign", txns=count):
+            if count < self.min_pool_txns or self.processes < 2:
+                signed = [_sign_group(group, self.keys) for group in groups]
+            else:
+                signed = self._sign_in_pool(groups)
+        elapsed = time.perf_counter() - start
+
+        SIGNED_TXNS.inc(count)
+        SIGNING_SECONDS.observe(elapsed)
+        with self.lock:
+            self.signed += count
+            self.seconds += elapsed
+            self.last_rate = count / elapsed if elapsed else None
+        return signed
+
+    def _sign_in_pool(self, groups):
+        chunks, chunk, size = [], [], 0
+        for group in groups:
+            chunk.append(group)
+            size += len(group)
+            if size >= TXNS_PER_TASK:
+                chunks.append(chunk)
+                chunk, size = [], 0
+        if chunk:
+            chunks.append(chunk)
+        signed = []
+        for result in self._executor().map(_sign_chunk, chunks):
+            signed.extend(result)
+        return signed
+
+    def _executor(self):
+        with self.lock:
+            if self.pool is None:
+                # Spawned, not forked: the server's other threads may hold locks mid-fork
+                self.pool = ProcessPoolExecutor(self.processes, spawn_context(),
+                                                initializer=_init_worker, initargs=(self.keys,))
+            return self.pool
+
+    def close(self):
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
+
+    def stats(self):
+        with self.lock:
+            return {
+                "signed": self.signed,
+                "seconds": round(self.seconds, 3),
+                "txns_per_second": round(self.signed / self.seconds, 1) if self.seconds else None,
+                "last_txns_per_second": round(self.last_rate, 1) if self.last_rate else None,
+                "processes": self.processes,
+                "pool_started": self.pool is not None,
+            }
+
+def configured_keys(conf=CONF):
+    """address -> private key for every account with a usable mnemonic"""
+    keys = {}
+    for key, entry in conf.items():
+        if not isinstance(entry, dict) or key in SETTINGS_SECTIONS or not entry.get("mnemonic"):
+            continue
+        try:
+            address, sk = acct(key)
+        except Exception:
+            continue  # placeholder mnemonic; signing for it fails with a clear error instead
+        keys[address] = sk
+    return keys
+
+def make_signer(conf=CONF):
+    """Signer over all configured keys, sized by network.signer_processes / signer_min_batch"""
+    network = conf["network"]
+    return Signer(configured_keys(conf),
+                  processes=network.get("signer_processes"),
+                  min_pool_txns=network.get("signer_min_batch", 512))
+
+SIGNER = make_signer()
+
+def main():
+    action = sys.argv[1] if len(sys.argv) > 1 else "bench"
+    if action != "bench":
+        print("Usage: python signer.py [bench] [txn_count]")
+        return
+
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
+    address = next(iter(SIGNER.keys))
+    params = sp()
+    groups = [[(tx.PaymentTxn(address, params, address, 0, note=f"{g}:{i}".encode()), address)
+               for i in range(16)] for g in range(count // 16)]
+    for label, min_pool in (("inline", count + 1), (f"{SIGNER.processes} processes", 0)):
+        SIGNER.min_pool_txns = min_pool
+        SIGNER.sign_groups(groups[:1])  # warm up (starts the pool)
+        start = time.perf_counter()
+        SIGNER.sign_groups(groups)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>14}: {len(groups) * 16} txns in {elapsed:.2f}s ({len(groups) * 16 / elapsed:,.0f} txns/s)")
+    SIGNER.close()
+
+if __name__ == "__main__":
+    # Pool workers unpickle _sign_chunk from the signer module, not from this script
+    import signer
+    signer.main()
@@ -0,0 +1,13 @@
+import multiprocessing
+
+def spawn_context():
+    """multiprocessing context for process pools started from a threaded server.
+
+    Forked children inherit every lock other threads hold at that moment
+    (logging, SQLite, HTTP pools), so workers start as fresh interpreters
+    instead. Task functions must live in an importable module, not in the
+    script being run, and since every worker re-imports the main script as
+    __mp_main__, entry scripts keep their work under a __main__ guard (the
+    server starts through start_server.py for that reason).
+    """
+    return multiprocessing.get_context("spawn")
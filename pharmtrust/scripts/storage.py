@@ -0,0 +1,475 @@
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from common import CONF
+
+ROOT = Path(__file__).resolve().parents[2]
+ARTIFACTS_FILE = ROOT / "pharmtrust" / "artifacts.json"
+DEFAULT_DB_FILE = ROOT / "pharmtrust" / "artifacts.db"
+LEASE_HEARTBEAT_SECONDS = 10     # lease owners that miss heartbeats for a minute are treated as dead
+
+JSON_EXTRAS_KEY = "json_extras"    # meta key for artifacts.json keys other than "medicines"
+
+MEDICINE_FIELDS = ("medicine_name", "batch_no", "batch_asa_id", "total_units",
+                   "expiry_date", "created_date", "minter")
+
+class ArtifactStore(ABC):
+    """Storage backend interface used by MedicineManager"""
+
+    @abstractmethod
+    def load(self):
+        """Return all artifacts as {"medicines": {...}}"""
+
+    @abstractmethod
+    def put_medicine(self, medicine_id, medicine):
+        """Insert or replace a medicine record (without its unit map)"""
+
+    @abstractmethod
+    def put_units(self, medicine_id, units):
+        """Record unit NFTs for a medicine, units is {unit_serial: unit_nft_id}"""
+
+    @abstractmethod
+    def find_unit(self, unit_nft_id):
+        """Return (medicine_id, unit_serial) for a unit NFT or None"""
+    
+    def load_medicine(self, medicine_id):
+        """Return one medicine record with its unit map, or None"""
+        return self.load()["medicines"].get(medicine_id)
+    
+    @abstractmethod
+    def reserve(self, names, ttl=600):
+        """Take exclusive leases on names, raises ValueError if any is already held"""
+    
+    @abstractmethod
+    def release(self, names):
+        """Release leases taken with reserve()"""
+    
+    def release_dead_leases(self, expiry=60):
+        """Drop leases whose owner process stopped sending heartbeats; in-memory leases die with it"""
+        return 0
+    
+    def has_changed(self):
+        """Cheap check whether another process may have written since the last call"""
+        return False
+    
+    def changes_since(self, seq):
+        """Return (latest_seq, [medicine_id, ...]) changed after seq"""
+        return seq, []
+    
+    def latest_change(self):
+        """Sequence number of the most recent change, the starting point for changes_since()"""
+        return 0
+
+    @abstractmethod
+    def get_meta(self, key, default=None):
+        """Read a small JSON value kept alongside the artifacts"""
+
+    @abstractmethod
+    def set_meta(self, key, value):
+        """Store a small JSON value alongside the artifacts"""
+
+    def import_json(self, path=ARTIFACTS_FILE):
+        """Import medicines and units from an artifacts.json file.
+        
+        Other top-level keys (BATCH_ASA_ID and the like from write_artifact)
+        are kept in meta so export_json writes them back.
+        """
+        with open(path, 'r') as f:
+            artifacts = json.load(f)
+
+        count = 0
+        for medicine_id, medicine in artifacts.get("medicines", {}).items():
+            self.put_medicine(medicine_id, medicine)
+            self.put_units(medicine_id, medicine.get("unit_nfts", {}))
+            count += 1
+        extras = {key: value for key, value in artifacts.items() if key != "medicines"}
+        if extras:
+            self.set_meta(JSON_EXTRAS_KEY, {**self.get_meta(JSON_EXTRAS_KEY, {}), **extras})
+        return count
+
+    def export_json(self, path=ARTIFACTS_FILE):
+        """Export all artifacts to a JSON file (atomic replace), keeping its other top-level keys"""
+        data = dict(self.get_meta(JSON_EXTRAS_KEY, {}))
+        try:
+            with open(path, 'r') as f:
+                existing = json.load(f)
+        except FileNotFoundError:
+            existing = {}
+        # The file may have been written by write_artifact since the import
+        data.update({key: value for key, value in existing.items() if key != "medicines"})
+        data.update(self.load())
+        write_json_atomic(path, data)
+
+    def close(self):
+        pass
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file and rename it over the target"""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class JsonStore(ArtifactStore):
+    """Legacy backend: the whole artifacts.json is rewritten on every change"""
+
+    def __init__(self, path=ARTIFACTS_FILE):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.leases_lock = threading.Lock()
+        self.leases = {}
+        try:
+            with open(self.path, 'r') as f:
+                self.artifacts = json.load(f)
+        except FileNotFoundError:
+            self.artifacts = {"medicines": {}}
+        self.artifacts.setdefault("medicines", {})
+
+    def reserve(self, names, ttl=600):
+        # Leases live in process memory; the JSON backend only suits a single worker
+        with self.leases_lock:
+            now = time.time()
+            held = [name for name in names if self.leases.get(name, 0) > now]
+            if held:
+                raise ValueError(f"Already in progress: {', '.join(held[:10])}")
+            for name in names:
+                self.leases[name] = now + ttl
+    
+    def release(self, names):
+        with self.leases_lock:
+            for name in names:
+                self.leases.pop(name, None)
+
+    def load(self):
+        return json.loads(json.dumps(self.artifacts))
+
+    def put_medicine(self, medicine_id, medicine):
+        with self.lock:
+            existing = self.artifacts["medicines"].get(medicine_id, {})
+            record = {k: v for k, v in medicine.items() if k != "unit_nfts"}
+            record["unit_nfts"] = dict(existing.get("unit_nfts", {}))
+            self.artifacts["medicines"][medicine_id] = record
+            write_json_atomic(self.path, self.artifacts)
+
+    def put_units(self, medicine_id, units):
+        if not units:
+            return
+        with self.lock:
+            self.artifacts["medicines"][medicine_id]["unit_nfts"].update(units)
+            write_json_atomic(self.path, self.artifacts)
+
+    def get_meta(self, key, default=None):
+        return self.artifacts.get("meta", {}).get(key, default)
+
+    def set_meta(self, key, value):
+        with self.lock:
+            self.artifacts.setdefault("meta", {})[key] = value
+            write_json_atomic(self.path, self.artifacts)
+
+    def find_unit(self, unit_nft_id):
+        for medicine_id, medicine in self.artifacts["medicines"].items():
+            for unit_serial, nft_id in medicine.get("unit_nfts", {}).items():
+                if str(nft_id) == str(unit_nft_id):
+                    return medicine_id, unit_serial
+        return None
+
+class SQLiteStore(ArtifactStore):
+    """Embedded SQLite backend with indexed medicine and unit tables"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS medicines (
+            medicine_id   TEXT PRIMARY KEY,
+            medicine_name TEXT NOT NULL,
+            batch_no      TEXT NOT NULL,
+            batch_asa_id  INTEGER,
+            total_units   INTEGER,
+            expiry_date   TEXT,
+            created_date  TEXT,
+            minter        TEXT
+        );
+        CREATE TABLE IF NOT EXISTS units (
+            unit_nft_id  INTEGER PRIMARY KEY,
+            medicine_id  TEXT NOT NULL REFERENCES medicines(medicine_id),
+            unit_serial  TEXT NOT NULL,
+            UNIQUE (medicine_id, unit_serial)
+        );
+        CREATE INDEX IF NOT EXISTS idx_units_medicine ON units(medicine_id);
+        CREATE TABLE IF NOT EXISTS meta (
+            key   TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS leases (
+            name       TEXT PRIMARY KEY,
+            expires_at REAL NOT NULL,
+            owner      TEXT
+        );
+        CREATE TABLE IF NOT EXISTS lease_owners (
+            owner     TEXT PRIMARY KEY,
+            heartbeat REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS changes (
+            seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+            medicine_id TEXT NOT NULL,
+            kind        TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS change_listeners (
+            owner TEXT PRIMARY KEY,
+            seq   INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, path=DEFAULT_DB_FILE):
+        self.path = Path(path)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False,
+                                    isolation_level=None, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(medicines)")}
+        if "minter" not in columns:
+            # Databases from before the minter pool; their medicines belong to the creator
+            self.conn.execute("ALTER TABLE medicines ADD COLUMN minter TEXT")
+        self.data_version = None
+        # Unique per process start, so a restarted worker with a reused pid doesn't inherit leases
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.heartbeat_thread = None
+
+    def transaction(self):
+        """Context manager for a single write transaction"""
+        return _Transaction(self)
+
+    def is_empty(self):
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM medicines LIMIT 1").fetchone()
+        return row is None
+
+    def load(self):
+        with self.lock:
+            medicines = {}
+            for row in self.conn.execute("SELECT * FROM medicines ORDER BY rowid"):
+                record = {field: row[field] for field in MEDICINE_FIELDS}
+                record["unit_nfts"] = {}
+                medicines[row["medicine_id"]] = record
+            for row in self.conn.execute(
+                    "SELECT medicine_id, unit_serial, unit_nft_id FROM units ORDER BY rowid"):
+                medicine = medicines.get(row["medicine_id"])
+                if medicine is not None:
+                    medicine["unit_nfts"][row["unit_serial"]] = row["unit_nft_id"]
+        return {"medicines": medicines}
+
+    def put_medicine(self, medicine_id, medicine):
+        values = [medicine_id] + [medicine.get(field) for field in MEDICINE_FIELDS]
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO medicines (medicine_id, medicine_name, batch_no, batch_asa_id, "
+                "total_units, expiry_date, created_date, minter) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(medicine_id) DO UPDATE SET medicine_name=excluded.medicine_name, "
+                "batch_no=excluded.batch_no, batch_asa_id=excluded.batch_asa_id, "
+                "total_units=excluded.total_units, expiry_date=excluded.expiry_date, "
+                "created_date=excluded.created_date, minter=excluded.minter",
+                values)
+            conn.execute("INSERT INTO changes (medicine_id, kind) VALUES (?, 'medicine')", (medicine_id,))
+
+    def put_units(self, medicine_id, units):
+        if not units:
+            return
+        rows = [(int(nft_id), medicine_id, unit_serial) for unit_serial, nft_id in units.items()]
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO units (unit_nft_id, medicine_id, unit_serial) "
+                "VALUES (?, ?, ?)", rows)
+            conn.execute("INSERT INTO changes (medicine_id, kind) VALUES (?, 'units')", (medicine_id,))
+
+    def find_unit(self, unit_nft_id):
+        try:
+            unit_nft_id = int(unit_nft_id)
+        except (TypeError, ValueError):
+            return None
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT medicine_id, unit_serial FROM units WHERE unit_nft_id = ?",
+                (unit_nft_id,)).fetchone()
+        return (row["medicine_id"], row["unit_serial"]) if row else None
+
+    def load_medicine(self, medicine_id):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM medicines WHERE medicine_id = ?",
+                                    (medicine_id,)).fetchone()
+            if row is None:
+                return None
+            record = {field: row[field] for field in MEDICINE_FIELDS}
+            record["unit_nfts"] = {
+                unit["unit_serial"]: unit["unit_nft_id"]
+                for unit in self.conn.execute(
+                    "SELECT unit_serial, unit_nft_id FROM units WHERE medicine_id = ? ORDER BY rowid",
+                    (medicine_id,))
+            }
+        return record
+    
+    def reserve(self, names, ttl=600):
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM leases WHERE expires_at <= ?", (now,))
+            held = []
+            for i in range(0, len(names), 500):
+                chunk = list(names[i:i + 500])
+                placeholders = ",".join("?" * len(chunk))
+                held += [row["name"] for row in conn.execute(
+                    f"SELECT name FROM leases WHERE name IN ({placeholders})", chunk)]
+            if held:
+                raise ValueError(f"Already in progress: {', '.join(held[:10])}")
+            conn.executemany("INSERT INTO leases (name, expires_at, owner) VALUES (?, ?, ?)",
+                             [(name, now + ttl, self.owner) for name in names])
+            conn.execute("INSERT OR REPLACE INTO lease_owners (owner, heartbeat) VALUES (?, ?)", (self.owner, now))
+        self._start_heartbeat()
+    
+    def release(self, names):
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM leases WHERE name = ?", [(name,) for name in names])
+    
+    def heartbeat(self):
+        """Mark this process alive so its leases survive release_dead_leases()"""
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO lease_owners (owner, heartbeat) VALUES (?, ?)",
+                         (self.owner, time.time()))
+    
+    def _start_heartbeat(self):
+        if self.heartbeat_thread is not None:
+            return
+        with self.lock:
+            if self.heartbeat_thread is not None:
+                return
+            
+            def run():
+                while True:
+                    threading.Event().wait(LEASE_HEARTBEAT_SECONDS)
+                    try:
+                        self.heartbeat()
+                    except Exception as e:
+                        print(f"Lease heartbeat error: {e}")
+            
+            self.heartbeat_thread = threading.Thread(target=run, name="lease-heartbeat", daemon=True)
+            self.heartbeat_thread.start()
+    
+    def release_dead_leases(self, expiry=60):
+        # Owners that never sent a heartbeat are from before lease_owners existed, or crashed early
+        cutoff = time.time() - expiry
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM lease_owners WHERE heartbeat < ?", (cutoff,))
+            # A dead listener no longer holds back pruning of the change log
+            conn.execute("DELETE FROM change_listeners WHERE owner NOT IN (SELECT owner FROM lease_owners)")
+            cur = conn.execute(
+                "DELETE FROM leases WHERE owner IS NULL OR (owner != ? AND owner NOT IN "
+                "(SELECT owner FROM lease_owners))", (self.owner,))
+            return cur.rowcount
+    
+    def has_changed(self):
+        # data_version only moves when another connection commits
+        with self.lock:
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        changed = version != self.data_version
+        self.data_version = version
+        return changed
+    
+    def changes_since(self, seq):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT seq, medicine_id FROM changes WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+        if not rows:
+            # Nothing to record: writing here would wake every other listener in turn
+            return seq, []
+        latest = rows[-1]["seq"]
+        self._listen(latest)
+        return latest, list(dict.fromkeys(row["medicine_id"] for row in rows))
+    
+    def latest_change(self):
+        with self.lock:
+            row = self.conn.execute("SELECT MAX(seq) AS seq FROM changes").fetchone()
+        seq = row["seq"] or 0
+        self._listen(seq)
+        return seq
+    
+    def _listen(self, seq):
+        """Record that this connection has seen changes up to seq and prune what every listener has seen.
+        
+        Listeners are kept alive by the lease heartbeat; release_dead_leases()
+        drops them with their owner. The newest row is always kept so
+        latest_change() survives the pruning.
+        """
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO change_listeners (owner, seq) VALUES (?, ?)", (self.owner, seq))
+            conn.execute("INSERT OR REPLACE INTO lease_owners (owner, heartbeat) VALUES (?, ?)",
+                         (self.owner, time.time()))
+            conn.execute(
+                "DELETE FROM changes WHERE seq < (SELECT MIN(seq) FROM change_listeners) "
+                "AND seq < (SELECT MAX(seq) FROM changes)")
+        self._start_heartbeat()
+    
+    def get_meta(self, key, default=None):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["value"]) if row else default
+
+    def set_meta(self, key, value):
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                         (key, json.dumps(value)))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK around a block of writes"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __enter__(self):
+        self.store.lock.acquire()
+        try:
+            self.store.conn.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self.store.lock.release()
+            raise
+        return self.store.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.store.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        finally:
+            self.store.lock.release()
+        return False
+
+def open_store(config=None):
+    """Open the storage backend selected in config/accounts.json ("storage" section).
+    
+    PHARMTRUST_STORAGE_PATH overrides the path, e.g. for benchmarks.
+    """
+    config = dict(config if config is not None else CONF.get("storage", {}))
+    if os.environ.get("PHARMTRUST_STORAGE_PATH"):
+        config["path"] = os.environ["PHARMTRUST_STORAGE_PATH"]
+    backend = config.get("backend", "sqlite")
+
+    if backend == "json":
+        return JsonStore(config.get("path", ARTIFACTS_FILE))
+    if backend != "sqlite":
+        raise ValueError(f"Unknown storage backend: {backend}")
+
+    store = SQLiteStore(config.get("path", DEFAULT_DB_FILE))
+    # One-time migration from the legacy artifacts.json
+    if store.is_empty() and not store.get_meta("migrated_from_json") and ARTIFACTS_FILE.exists():
+        count = store.import_json(ARTIFACTS_FILE)
+        store.set_meta("migrated_from_json", str(ARTIFACTS_FILE))
+        print(f"Migrated {count} medicines from {ARTIFACTS_FILE.name} to {store.path.name}")
+    return store
@@ -0,0 +1,187 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future
+from metrics import SUBMISSIONS
+
+# Lower runs first: requests a person is waiting on, then shipments, then bulk mints
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 5
+PRIORITY_BULK = 10
+
+THROTTLE_STATUS = (429,)
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+class _Submission:
+    __slots__ = ("blob", "txid", "last_valid", "priority", "future", "attempts")
+
+    def __init__(self, blob, txid, last_valid, priority):
+        self.blob = blob
+        self.txid = txid
+        self.last_valid = last_valid
+        self.priority = priority
+        self.future = Future()
+        self.attempts = 0
+
+class Submitter:
+    """Paces signed transaction submissions to algod.
+
+    A token bucket caps the request rate, and an AIMD limit caps how many
+    submissions are in flight: it grows while latency stays under
+    target_latency and is cut on slow answers, 5xx and especially 429, which
+    also halves the rate and pauses everything briefly. Queued work runs in
+    priority order. Retryable failures are retried with backoff for as long
+    as the transaction is still inside its validity window.
+    """
+
+    def __init__(self, client, current_round=None, rate=40.0, burst=20, max_concurrency=16,
+                 min_concurrency=1, target_latency=0.5, max_attempts=8, backoff=0.25, max_backoff=10.0):
+        self.client = client
+        self.current_round = current_round or (lambda: 0)
+        self.max_rate = rate
+        self.min_rate = max(1.0, rate / 20)
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refilled_at = time.monotonic()
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(min(max_concurrency, max(min_concurrency, 4)))
+        self.target_latency = target_latency
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cond = threading.Condition()
+        self.queue = []            # heap of (priority, seq, submission)
+        self.delayed = []          # heap of (ready_at, seq, submission) waiting to retry
+        self.seq = itertools.count()
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.throttles = 0         # consecutive 429s, for the pause length
+        self.threads = []
+
+    def submit(self, blob, txid, last_valid=None, priority=PRIORITY_NORMAL):
+        """Queue a signed blob for send_raw_transaction, returns a Future resolving to txid"""
+        submission = _Submission(blob, txid, last_valid, priority)
+        self._start()
+        with self.cond:
+            heapq.heappush(self.queue, (priority, next(self.seq), submission))
+            self.cond.notify()
+        return submission.future
+
+    def send(self, blob, txid, last_valid=None, priority=PRIORITY_NORMAL):
+        """submit() and wait for algod to accept the transaction"""
+        return self.submit(blob, txid, last_valid, priority).result()
+
+    def _start(self):
+        if self.threads:
+            return
+        with self.cond:
+            if self.threads:
+                return
+            for i in range(self.max_concurrency):
+                thread = threading.Thread(target=self._worker, name=f"submitter-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def _worker(self):
+        while True:
+            submission = self._next()
+            start = time.monotonic()
+            error = None
+            try:
+                self.client.send_raw_transaction(submission.blob)
+            except Exception as e:
+                error = e
+            self._finish(submission, error, time.monotonic() - start)
+
+    def _next(self):
+        """Block until a submission may go out under the concurrency limit and rate"""
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                while self.delayed and self.delayed[0][0] <= now:
+                    _, seq, submission = heapq.heappop(self.delayed)
+                    heapq.heappush(self.queue, (submission.priority, seq, submission))
+
+                wait = self.delayed[0][0] - now if self.delayed else None
+                if self.queue and now >= self.paused_until and self.in_flight < int(self.limit):
+                    self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+                    self.refilled_at = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        self.in_flight += 1
+                        return heapq.heappop(self.queue)[2]
+                    wait = min(wait or 1.0, (1 - self.tokens) / self.rate)
+                elif self.queue and now < self.paused_until:
+                    wait = min(wait or 1.0, self.paused_until - now)
+                self.cond.wait(wait)
+
+    def _finish(self, submission, error, latency):
+        status = getattr(error, "code", None)
+        accepted = error is None or "already in ledger" in str(error)
+        # HTTP errors carry a status code; connection errors and timeouts are OSErrors
+        retryable = not accepted and (status in RETRY_STATUS or isinstance(error, OSError))
+        with self.cond:
+            self.in_flight -= 1
+            if accepted:
+                self._on_success(latency)
+            elif status in THROTTLE_STATUS:
+                self._on_throttle()
+            elif retryable:
+                self.limit = max(self.min_concurrency, self.limit * 0.75)
+            self.cond.notify_all()
+
+        submission.attempts += 1
+        if accepted:
+            SUBMISSIONS.inc(1, "accepted")
+            submission.future.set_result(submission.txid)
+        elif retryable and submission.attempts < self.max_attempts and self._still_valid(submission):
+            SUBMISSIONS.inc(1, "throttled" if status in THROTTLE_STATUS else "retried")
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** submission.attempts))
+            with self.cond:
+                heapq.heappush(self.delayed, (time.monotonic() + delay, next(self.seq), submission))
+                self.cond.notify()
+        else:
+            SUBMISSIONS.inc(1, "failed")
+            submission.future.set_exception(error)
+
+    def _on_success(self, latency):
+        self.throttles = 0
+        if latency > 2 * self.target_latency:
+            self.limit = max(self.min_concurrency, self.limit * 0.9)
+        elif latency <= self.target_latency:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def _on_throttle(self):
+        self.throttles += 1
+        self.limit = max(self.min_concurrency, self.limit / 2)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = 0.0
+        pause = min(self.max_backoff, self.backoff * 2 ** self.throttles)
+        self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+    def _still_valid(self, submission):
+        if submission.last_valid is None:
+            return True
+        try:
+            return self.current_round() < submission.last_valid
+        except Exception:
+            return True
+
+    def stats(self):
+        with self.cond:
+            queued = {}
+            for priority, _, _ in self.queue:
+                queued[priority] = queued.get(priority, 0) + 1
+            return {
+                "queued": queued,
+                "retrying": len(self.delayed),
+                "in_flight": self.in_flight,
+                "concurrency_limit": round(self.limit, 2),
+                "rate": round(self.rate, 2),
+                "paused": time.monotonic() < self.paused_until,
+            }
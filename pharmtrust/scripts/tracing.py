@@ -0,0 +1,211 @@
+import contextvars
+import cProfile
+import functools
+import heapq
+import io
+import itertools
+import pstats
+import random
+import threading
+import time
+import uuid
+
+_trace = contextvars.ContextVar("trace", default=None)
+_span = contextvars.ContextVar("span", default=None)
+_span_ids = itertools.count(1)
+
+MAX_SPANS = 2000    # per trace; bulk mints past this only keep their totals
+
+class Trace:
+    """Spans recorded while handling one request or background job"""
+
+    def __init__(self, name, parent=None, **attrs):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.parent = parent          # trace_id this one was started from, e.g. a job's request
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.duration = None
+        self.lock = threading.Lock()
+        self.spans = []               # (span_id, parent_id, name, start offset, duration, attrs)
+        self.totals = {}              # name -> [count, total seconds]
+        self.dropped = 0
+
+    def record(self, span_id, parent_id, name, start, duration, attrs):
+        with self.lock:
+            total = self.totals.setdefault(name, [0, 0.0])
+            total[0] += 1
+            total[1] += duration
+            if len(self.spans) < MAX_SPANS:
+                self.spans.append((span_id, parent_id, name, start - self.start, duration, attrs))
+            else:
+                self.dropped += 1
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.start
+
+    def server_timing(self, limit=10):
+        """Server-Timing header value: total plus the most expensive span names"""
+        with self.lock:
+            totals = sorted(self.totals.items(), key=lambda item: -item[1][1])[:limit]
+        parts = [f"total;dur={(self.duration or 0) * 1000:.1f}"]
+        for name, (count, seconds) in totals:
+            parts.append(f'{name.replace(".", "-")};dur={seconds * 1000:.1f};desc="{name} x{count}"')
+        return ", ".join(parts)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "trace_id": self.trace_id,
+                "name": self.name,
+                "parent": self.parent,
+                "attrs": self.attrs,
+                "started_at": self.started_at,
+                "duration_ms": round((self.duration or 0) * 1000, 3),
+                "totals": {name: {"count": count, "ms": round(seconds * 1000, 3)}
+                           for name, (count, seconds) in self.totals.items()},
+                "spans": [{"id": span_id, "parent": parent_id, "name": name,
+                           "start_ms": round(start * 1000, 3), "ms": round(duration * 1000, 3),
+                           **({"attrs": attrs} if attrs else {})}
+                          for span_id, parent_id, name, start, duration, attrs in self.spans],
+                "dropped_spans": self.dropped,
+            }
+
+def start_trace(name, parent=None, **attrs):
+    """Make a new trace current for this context, returns (trace, token for end_trace)"""
+    trace = Trace(name, parent, **attrs)
+    return trace, (_trace.set(trace), _span.set(None))
+
+def end_trace(trace, token):
+    trace.finish()
+    _trace.reset(token[0])
+    _span.reset(token[1])
+    SLOW_TRACES.offer(trace)
+    return trace
+
+def current_trace():
+    return _trace.get()
+
+class span:
+    """Time a block as a span of the current trace; a no-op outside a trace"""
+
+    __slots__ = ("name", "attrs", "trace", "span_id", "parent_id", "token", "start")
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.trace = _trace.get()
+        if self.trace is not None:
+            self.span_id = next(_span_ids)
+            self.parent_id = _span.get()
+            self.token = _span.set(self.span_id)
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.trace is not None:
+            duration = time.perf_counter() - self.start
+            _span.reset(self.token)
+            if exc_type is not None:
+                self.attrs["error"] = exc_type.__name__
+            self.trace.record(self.span_id, self.parent_id, self.name, self.start, duration, self.attrs)
+        return False
+
+def traced(name):
+    """Decorator recording each call as a span"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+class SlowTraces:
+    """Keeps the N slowest finished traces (only while enabled)"""
+
+    def __init__(self, size=50):
+        self.size = size
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.heap = []
+        self.counter = itertools.count()
+
+    def offer(self, trace):
+        if not self.enabled:
+            return
+        entry = (trace.duration, next(self.counter), trace)
+        with self.lock:
+            if len(self.heap) < self.size:
+                heapq.heappush(self.heap, entry)
+            elif trace.duration > self.heap[0][0]:
+                heapq.heapreplace(self.heap, entry)
+
+    def slowest(self):
+        with self.lock:
+            entries = sorted(self.heap, reverse=True)
+        return [trace.to_dict() for _, _, trace in entries]
+
+    def clear(self):
+        with self.lock:
+            self.heap = []
+
+SLOW_TRACES = SlowTraces()
+
+class Profiler:
+    """Samples live requests into one cProfile capture for a fixed window.
+
+    Only one capture runs at a time, and a request is only profiled when no
+    other request is being profiled, as cProfile can't nest.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.capture = None           # (pstats.Stats or None, until, rate, sampled count)
+        self.busy = False
+
+    def begin(self, seconds, rate):
+        with self.lock:
+            if self.capture is not None:
+                raise ValueError("A profile capture is already running")
+            self.capture = {"stats": None, "until": time.monotonic() + seconds, "rate": rate, "requests": 0}
+
+    def end(self, sort="cumulative", limit=60):
+        with self.lock:
+            capture, self.capture = self.capture, None
+        if capture is None or capture["stats"] is None:
+            return "No requests were sampled\n", 0
+        out = io.StringIO()
+        capture["stats"].stream = out
+        capture["stats"].sort_stats(sort).print_stats(limit)
+        return out.getvalue(), capture["requests"]
+
+    def maybe_start(self):
+        """Start profiling the current request if a capture is sampling it, returns the profile"""
+        with self.lock:
+            capture = self.capture
+            if capture is None or self.busy or time.monotonic() > capture["until"] \
+                    or random.random() >= capture["rate"]:
+                return None
+            self.busy = True
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def stop(self, profile):
+        profile.disable()
+        with self.lock:
+            self.busy = False
+            capture = self.capture
+            if capture is None:
+                return
+            if capture["stats"] is None:
+                capture["stats"] = pstats.Stats(profile)
+            else:
+                capture["stats"].add(profile)
+            capture["requests"] += 1
+
+PROFILER = Profiler()
@@ -1,38 +1,43 @@
-from algosdk import transaction as tx  # type: ignore
-from common import ALGOD, acct, sp, wait
+#!/usr/bin/env python3
+"""
+Script to ship unit NFTs or batch ASA amounts from the minter accounts to another account
+Usage: python transfer_asset.py <receiver_key> <asset_id>[:amount] [<asset_id>[:amount] ...]
+       python transfer_asset.py <receiver_key> --file ids.txt
+"""
 
-ASSET_ID = 0             # <-- set to your BATCH_ASA_ID or UNIT_NFT_ID
-RECEIVER_KEY = "pharmacy"  # or "consumer"
-AMOUNT = 1               # 1 for NFT; n units for ASA
+import sys
+from shipments import parse_items, ship
 
-def opt_in(receiver_addr, receiver_sk, asset_id):
-    params = sp()
-    txn = tx.AssetTransferTxn(sender=receiver_addr, sp=params,
-                              receiver=receiver_addr, amt=0, index=asset_id)
-    stx = txn.sign(receiver_sk)
-    try:
-        txid = ALGOD.send_transaction(stx)
-        wait(txid)
-        print("Opt-in done for", receiver_addr)
-    except Exception as e:
-        if "has already opted in to asset" in str(e):
-            print("Already opted-in")
+def read_args(args):
+    if args[:1] == ["--file"] and len(args) == 2:
+        with open(args[1]) as f:
+            args = f.read().split()
+    unit_nft_ids, batches = [], []
+    for arg in args:
+        asset_id, _, amount = arg.partition(":")
+        if amount:
+            batches.append({"asset_id": asset_id, "amount": amount})
         else:
-            raise
+            unit_nft_ids.append(asset_id)
+    return parse_items(unit_nft_ids, batches)
 
 def main():
-    creator_addr, creator_sk = acct("creator")
-    recv_addr, recv_sk = acct(RECEIVER_KEY)
-
-    opt_in(recv_addr, recv_sk, ASSET_ID)
-
-    params = sp()
-    txn = tx.AssetTransferTxn(sender=creator_addr, sp=params,
-                              receiver=recv_addr, amt=AMOUNT, index=ASSET_ID)
-    stx = txn.sign(creator_sk)
-    txid = ALGOD.send_transaction(stx)
-    res = wait(txid)
-    print(f"Transferred {AMOUNT} of {ASSET_ID} to {recv_addr} in round {res['confirmed-round']}")
+    if len(sys.argv) < 3:
+        print("Usage: python transfer_asset.py <receiver_key> <asset_id>[:amount] ...")
+        print("Example: python transfer_asset.py pharmacy 745905086 745907440 745905071:100")
+        return
+    
+    receiver_key = sys.argv[1]
+    
+    try:
+        items = read_args(sys.argv[2:])
+        print(f"Shipping {len(items)} assets to {receiver_key}")
+        shipped, failed = ship(receiver_key, items)
+        for asset_id, error in failed.items():
+            print(f"❌ {asset_id}: {error}")
+        print(f"✅ Shipped {len(shipped)} of {len(items)} assets")
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
 
 if __name__ == "__main__":
     main()
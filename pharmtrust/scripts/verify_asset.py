@@ -1,6 +1,12 @@
-from common import ALGOD, acct
+#!/usr/bin/env python3
+"""
+Script to check an asset on-chain against the local registry
+Usage: python verify_asset.py <asset_id>
+"""
 
-ASSET_ID = 0  # set to your asset id
+import sys
+from common import ALGOD, acct
+from storage import open_store
 
 def bal(addr, asset_id):
     ai = ALGOD.account_info(addr)
@@ -10,10 +16,26 @@ def bal(addr, asset_id):
     return 0
 
 def main():
+    if len(sys.argv) != 2 or not sys.argv[1].isdigit():
+        print("Usage: python verify_asset.py <asset_id>")
+        print("Example: python verify_asset.py 745905086")
+        return
+    
+    asset_id = int(sys.argv[1])
     creator_addr, _ = acct("creator")
-    print("Creator:", creator_addr, "bal:", bal(creator_addr, ASSET_ID))
-    asset = ALGOD.asset_info(ASSET_ID)
+    print("Creator:", creator_addr, "bal:", bal(creator_addr, asset_id))
+    asset = ALGOD.asset_info(asset_id)
     print("Asset params:", asset["params"])
+    
+    store = open_store()
+    try:
+        unit = store.find_unit(asset_id)
+        if unit:
+            print(f"Local registry: unit {unit[1]} of {unit[0]}")
+        else:
+            print("Local registry: not found (run chain_sync.py to import assets minted elsewhere)")
+    finally:
+        store.close()
 
 if __name__ == "__main__":
     main()
@@ -1,26 +1,33 @@
 #!/usr/bin/env python3
 """
 Start the PharmaTrust Flask server
+
+Importing this module has no side effects: process pool workers re-import
+the main script, and must not start a second copy of the app. app.py run
+as a script hands over to main() here.
 """
 
 import webbrowser
 import time
 import threading
-from app import app
 
 def open_browser():
     """Open browser after a short delay"""
     time.sleep(2)
     webbrowser.open('http://localhost:5000')
 
-if __name__ == '__main__':
-    print("🚀 Starting PharmaTrust Server...")
-    print("📱 Opening browser in 2 seconds...")
+def main(browser=True):
+    # The app starts its job queue and block followers when imported
+    from app import app
     
-    # Start browser in a separate thread
-    browser_thread = threading.Thread(target=open_browser)
-    browser_thread.daemon = True
-    browser_thread.start()
+    print("🚀 Starting PharmaTrust Server...")
+    if browser:
+        print("📱 Opening browser in 2 seconds...")
+        
+        # Start browser in a separate thread
+        browser_thread = threading.Thread(target=open_browser)
+        browser_thread.daemon = True
+        browser_thread.start()
     
     print("🌐 Server will be available at:")
     print("   - http://localhost:5000")
@@ -35,3 +42,6 @@ if __name__ == '__main__':
     
     # Start Flask server
     app.run(debug=True, host='0.0.0.0', port=5000)
+
+if __name__ == '__main__':
+    main()
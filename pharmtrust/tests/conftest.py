@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+import pytest
+
+# Everything runs against the in-process fake ledger with throwaway databases.
+# The scripts build their algod client and open their stores at import, so this
+# has to happen before any of them is imported.
+TEST_DIR = Path(tempfile.mkdtemp(prefix="pharmtrust-tests-"))
+os.environ["PHARMTRUST_ALGOD_BACKEND"] = "fake"
+os.environ["PHARMTRUST_STORAGE_PATH"] = str(TEST_DIR / "artifacts.db")
+os.environ["PHARMTRUST_UPLOAD_FOLDER"] = str(TEST_DIR / "qr_codes")
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT), str(ROOT / "scripts")]
+
+# A funded receiver with a signing key, added before the signer reads the config
+import common  # type: ignore  # noqa: E402
+from algosdk import account, mnemonic  # type: ignore  # noqa: E402
+
+RECEIVER = "test_pharmacy"
+_receiver_key, _receiver_address = account.generate_account()
+common.CONF[RECEIVER] = {"address": _receiver_address, "mnemonic": mnemonic.from_private_key(_receiver_key)}
+common.ALGOD._client.balances[_receiver_address] = 10_000_000_000
+
+@pytest.fixture(scope="session")
+def app_module():
+    """The Flask app module, imported once with its job queue and followers running"""
+    import app  # type: ignore
+    return app
+
+@pytest.fixture(scope="session")
+def client(app_module):
+    return app_module.app.test_client()
+
+@pytest.fixture(scope="session")
+def wait_job(client):
+    """Poll a 202 response's job until it finishes, returns the job record"""
+    def wait(response, timeout=60):
+        assert response.status_code == 202, response.get_json()
+        url = response.headers["Location"]
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = client.get(url).get_json()["job"]
+            if job["status"] in ("succeeded", "failed"):
+                return job
+            time.sleep(0.05)
+        raise TimeoutError(f"{url} did not finish in {timeout}s")
+    return wait
+
+@pytest.fixture(scope="session")
+def medicine(client, wait_job):
+    """A medicine with a batch ASA and four unit NFTs minted through the API"""
+    job = wait_job(client.post("/api/medicines", json={
+        "medicine_name": "Testamol", "batch_no": "T-1", "total_units": 100, "expiry_date": "2028-01"}))
+    assert job["status"] == "succeeded", job["error"]
+    created = job["result"]
+    job = wait_job(client.post(f"/api/medicines/{created['medicine_id']}/units/bulk", json={"count": 4}))
+    assert job["status"] == "succeeded", job["error"]
+    return dict(created, units=job["result"]["unit_nfts"])
@@ -0,0 +1,60 @@
+import pytest
+from storage import SQLiteStore
+from medicine_manager import MedicineManager
+
+@pytest.fixture
+def manager(tmp_path):
+    store = SQLiteStore(tmp_path / "catalog.db")
+    for i in range(25):
+        store.put_medicine(f"Med{i:02d}_B{i}_20250101", {
+            "medicine_name": f"Med{i:02d}", "batch_no": f"B{i}", "batch_asa_id": 100 + i,
+            "total_units": 10, "expiry_date": f"2027-{i % 12 + 1:02d}", "created_date": "2025-01-01"})
+    return MedicineManager(store=store)
+
+def test_pages_cover_the_catalog_once_in_id_order(manager):
+    seen, cursor = [], None
+    while True:
+        page, cursor = manager.query_medicines(cursor=cursor, limit=10)
+        seen += list(page)
+        if not cursor:
+            break
+    assert seen == sorted(manager.artifacts["medicines"])
+
+def test_filters_and_projection(manager):
+    page, cursor = manager.query_medicines(expiry_from="2027-03", expiry_to="2027-04", fields=("batch_no",))
+    assert cursor is None
+    assert page == {f"Med{i:02d}_B{i}_20250101": {"batch_no": f"B{i}"} for i in (2, 3, 14, 15)}
+    assert list(manager.query_medicines(name="med1", limit=100)[0]) == [
+        f"Med{i:02d}_B{i}_20250101" for i in range(10, 20)]
+
+def test_bad_cursor_is_a_value_error(manager):
+    with pytest.raises(ValueError):
+        manager.query_medicines(cursor="!!")
+
+def test_medicines_endpoint_pages_and_revalidates(client, medicine):
+    response = client.get("/api/medicines", query_string={"limit": 1, "fields": "batch_no"})
+    body = response.get_json()
+    assert body["count"] == 1 and all(set(m) == {"batch_no"} for m in body["medicines"].values())
+    assert client.get("/api/medicines", query_string={"limit": 1, "fields": "batch_no"},
+                      headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+    assert client.get("/api/medicines", query_string={"cursor": "!!"}).status_code == 400
+
+def test_verify_finds_minted_units(client, medicine):
+    serial, unit = list(medicine["units"].items())[-1]
+    body = client.get(f"/api/verify/{unit}").get_json()
+    assert body["success"] and body["verification"]["unit_serial"] == serial
+    assert client.get("/api/verify/999999999").status_code == 404
+
+def test_unit_names_are_cut_to_eight_bytes(manager):
+    unit_name, asset_name, url = manager.unit_nft_fields("Äöü Med", "B1", "ÄÄÄÄ")
+    assert len(unit_name.encode()) <= 8
+    assert asset_name == "Äöü Med Unit #ÄÄÄÄ"
+
+def test_serials_too_long_for_the_asset_fields_are_refused(client, medicine):
+    units = f"/api/medicines/{medicine['medicine_id']}/units"
+    # "Testamol Unit #" leaves 17 bytes of the 32-byte asset name; é is two bytes
+    response = client.post(f"{units}/bulk", json={"serials": ["S1", "é" * 9]})
+    assert response.status_code == 400
+    assert "asset name 33 bytes" in response.get_json()["error"]
+    assert client.post(units, json={"unit_serial": "X" * 18}).status_code == 400
+    assert client.post(f"{units}/bulk", json={"count": 1, "prefix": "P" * 40}).status_code == 400
@@ -0,0 +1,45 @@
+import threading
+import time
+from balances import BalanceService
+
+class Tracker:
+    def add_block_listener(self, listener):
+        self.listener = listener
+
+class SlowClient:
+    """account_info that blocks until released, recording what it was asked"""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Semaphore(0)
+
+    def account_info(self, address, **kwargs):
+        self.calls.append(kwargs)
+        self.release.acquire(timeout=5)
+        return {"amount": 2_000_000, "min-balance": 100_000, "total-assets-opted-in": 3, "round": 9}
+
+def test_rounds_during_a_refresh_collapse_into_the_latest():
+    client, tracker = SlowClient(), Tracker()
+    service = BalanceService(client, tracker, accounts={"creator": "ADDR"})
+    service.start()
+    # The first snapshot is in progress; five rounds close meanwhile
+    for rnd in range(10, 15):
+        tracker.listener(rnd, None)
+    client.release.release()
+    assert service.wait(timeout=5)
+    client.release.release()
+    deadline = time.time() + 5
+    while service.get()[1] != 14 and time.time() < deadline:
+        time.sleep(0.01)
+
+    snapshot, rnd, _ = service.get()
+    assert rnd == 14
+    assert len(client.calls) == 2
+    assert all(call == {"exclude": "all"} for call in client.calls)
+    assert snapshot["creator"] == {"address": "ADDR", "balance": 2.0, "min_balance": 0.1,
+                                   "assets_opted_in": 3, "round": 9}
+
+def test_balance_endpoint_serves_the_snapshot(client):
+    body = client.get("/api/balance").get_json()
+    assert body["success"]
+    assert body["accounts"]["creator"]["balance"] == body["balance"] > 0
@@ -0,0 +1,52 @@
+import pytest
+from algosdk import account, transaction as tx  # type: ignore
+from common import ParamsCache
+from confirmations import ConfirmationTracker
+from fake_algod import FakeAlgod
+
+@pytest.fixture
+def ledger():
+    sender, address = account.generate_account()
+    algod = FakeAlgod(block_time=0.05, funded=[address])
+    return algod, sender, address
+
+def test_params_are_shared_within_a_round(ledger):
+    algod, _, _ = ledger
+    tracker = ConfirmationTracker(algod)
+    cache = ParamsCache(algod, tracker, ttl=60, validity=500)
+    first = cache.get()
+    second = cache.get()
+    assert cache.stats()["hits"] == 1
+    assert second.last == second.first + 500 and second.first == first.first
+
+def test_params_are_refetched_when_a_new_round_is_seen(ledger):
+    algod, _, _ = ledger
+    tracker = ConfirmationTracker(algod)
+    cache = ParamsCache(algod, tracker, ttl=60)
+    first = cache.get().first
+    tracker.start()
+    tracker.register("NONE", timeout=2).exception(timeout=5)   # wait a couple of rounds
+    assert cache.get().first > first
+    assert cache.stats()["misses"] == 2
+
+def test_tracker_resolves_confirmed_and_times_out_unknown_txids(ledger):
+    algod, sender, address = ledger
+    tracker = ConfirmationTracker(algod)
+    txn = tx.PaymentTxn(address, algod.suggested_params(), address, 0)
+    signed = txn.sign(sender)
+    confirmed = tracker.register(signed.get_txid())
+    missing = tracker.register("MISSING", timeout=2)
+    algod.send_transaction(signed)
+
+    assert confirmed.result(timeout=5)["confirmed-round"] > 0
+    assert isinstance(missing.exception(timeout=5), TimeoutError)
+    assert tracker.pending_count() == 0
+
+def test_blocks_are_fetched_once_for_every_reader(ledger):
+    algod, _, _ = ledger
+    tracker = ConfirmationTracker(algod)
+    calls = []
+    fetch = algod.block_info
+    algod.block_info = lambda **kwargs: calls.append(kwargs) or fetch(**kwargs)
+    assert tracker.block(1) is tracker.block(1)
+    assert len(calls) == 1
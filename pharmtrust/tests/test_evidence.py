@@ -0,0 +1,62 @@
+import hashlib
+import pytest
+from evidence import EvidenceStore, evidence_hash, merkle_tree, verify_proof
+
+def hashes(n):
+    return [hashlib.sha256(str(i).encode()).hexdigest() for i in range(n)]
+
+@pytest.mark.parametrize("n", [1, 2, 3, 5, 8, 13])
+def test_every_leaf_proves_against_the_root(n):
+    leaves = hashes(n)
+    root, proofs = merkle_tree(leaves)
+    assert all(verify_proof(leaf, proof, root) for leaf, proof in zip(leaves, proofs))
+
+def test_proof_fails_for_another_leaf_or_root():
+    leaves = hashes(5)
+    root, proofs = merkle_tree(leaves)
+    assert not verify_proof(leaves[1], proofs[0], root)
+    assert not verify_proof(leaves[0], proofs[0], merkle_tree(hashes(6))[0])
+
+def test_a_leaf_is_not_an_inner_node():
+    # Two leaves hashed together must not verify as a one-leaf tree
+    leaves = hashes(2)
+    root, _ = merkle_tree(leaves)
+    assert merkle_tree([root])[0] != root
+
+def test_claimed_leaves_are_not_claimed_twice(tmp_path):
+    store = EvidenceStore(tmp_path / "evidence.db")
+    for h in hashes(5):
+        store.add(h)
+    batch_id, claimed = store.claim(3)
+    assert len(claimed) == 3
+    assert set(store.claim(10)[1]) == set(hashes(5)) - set(claimed)
+    assert store.claim(10) == (None, [])
+
+    store.release(batch_id)
+    assert store.pending()[0] == 3
+    assert store.get(claimed[0])["status"] is None
+
+def test_only_batches_of_a_silent_owner_are_released(tmp_path):
+    store = EvidenceStore(tmp_path / "evidence.db")
+    for h in hashes(4):
+        store.add(h)
+    slow, _ = store.claim(2, "slow-worker")
+    dead, _ = store.claim(2, "dead-worker")
+    store.conn.execute("UPDATE evidence_batches SET heartbeat = heartbeat - 600")
+    store.heartbeat("slow-worker")
+
+    assert store.release(expiry=60) == 1
+    assert store.get(hashes(4)[0])["batch_id"] == slow
+    assert store.pending()[0] == 2
+
+def test_evidence_is_anchored_with_a_verifiable_proof(client, app_module):
+    hash_hex = evidence_hash({"unit": 1, "verdict": "authentic"})
+    response = client.post("/api/evidence", json={"ai_result": {"unit": 1, "verdict": "authentic"}})
+    assert response.status_code == 202
+    assert response.get_json()["hash"] == hash_hex
+
+    app_module.evidence_anchor.flush()
+    proof = client.get(f"/api/evidence/{hash_hex}/proof").get_json()
+    assert proof["status"] == "anchored"
+    assert proof["verified"] is True
+    assert proof["txid"]
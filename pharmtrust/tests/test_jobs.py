@@ -0,0 +1,75 @@
+import time
+import pytest
+from jobs import JobQueue, JobStore, QueueFull
+
+def wait_for(queue, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.01)
+    raise TimeoutError(job_id)
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(tmp_path / "jobs.db")
+
+def test_jobs_run_and_record_result_and_progress(store):
+    def handler(params, progress):
+        progress(1, 2)
+        if params.get("fail"):
+            raise ValueError("boom")
+        return {"echo": params["value"]}
+
+    queue = JobQueue({"echo": handler}, store=store, workers=2)
+    queue.start()
+    ok = wait_for(queue, queue.submit("echo", {"value": 3})["job_id"])
+    failed = wait_for(queue, queue.submit("echo", {"value": 3, "fail": True})["job_id"])
+
+    assert ok["status"] == "succeeded" and ok["result"] == {"echo": 3}
+    assert ok["progress"] == {"done": 1, "total": 2}
+    assert failed["status"] == "failed" and failed["error"] == "boom"
+
+def test_submit_rejects_unknown_kinds_and_a_full_queue(store):
+    queue = JobQueue({"echo": lambda params, progress: None}, store=store, max_queued=2)
+    with pytest.raises(ValueError):
+        queue.submit("other", {})
+    queue.submit("echo", {})
+    queue.submit("echo", {})
+    with pytest.raises(QueueFull):
+        queue.submit("echo", {})
+
+def test_a_claimed_job_runs_once(store):
+    queue = JobQueue({"echo": lambda params, progress: None}, store=store)
+    job_id = queue.submit("echo", {})["job_id"]
+    assert store.claim(job_id, "worker-a")
+    assert not store.claim(job_id, "worker-b")
+
+def test_jobs_of_a_dead_owner_are_requeued(store):
+    queue = JobQueue({"echo": lambda params, progress: None}, store=store)
+    job_id = queue.submit("echo", {})["job_id"]
+    store.claim(job_id, "crashed-worker")
+    store.update(job_id, heartbeat=time.time() - 600)
+    # A live owner's job stays where it is
+    live_id = queue.submit("echo", {})["job_id"]
+    store.claim(live_id, "live-worker")
+
+    assert store.recover(expiry=60) == 1
+    assert store.get(job_id)["status"] == "queued"
+    assert store.get(live_id)["status"] == "running"
+
+def test_mint_endpoints_answer_202_with_a_status_url(client, wait_job):
+    response = client.post("/api/medicines", json={"medicine_name": "Jobcillin", "batch_no": "J-1"})
+    assert response.status_code == 202
+    body = response.get_json()
+    assert response.headers["Location"] == body["status_url"] == f"/api/jobs/{body['job_id']}"
+
+    job = wait_job(response)
+    assert job["status"] == "succeeded", job["error"]
+    assert job["result"]["batch_asa_id"]
+    # The batch exists now, so a second request is refused up front
+    assert client.post("/api/medicines", json={"medicine_name": "Jobcillin", "batch_no": "J-1"}).status_code == 400
+
+def test_unknown_job_is_404(client):
+    assert client.get("/api/jobs/does-not-exist").status_code == 404
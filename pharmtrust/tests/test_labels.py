@@ -0,0 +1,27 @@
+import io
+import zipfile
+from PIL import Image, PdfParser  # type: ignore
+from qr_labels import PAGE_COLUMNS, PAGE_ROWS, export_labels, stream_pdf
+
+def labels(n):
+    png = io.BytesIO()
+    Image.new("RGB", (10, 10), "black").save(png, format="PNG")
+    return [(f"U{i}", 1000 + i, png.getvalue()) for i in range(n)]
+
+def test_pdf_has_one_page_per_sheet_and_a_valid_xref():
+    per_page = PAGE_COLUMNS * PAGE_ROWS
+    data = b"".join(stream_pdf(labels(2 * per_page + 1)))
+    pdf = PdfParser.PdfParser(buf=data)
+    assert len(pdf.pages) == 3
+    # Every cross-reference entry points at its object
+    for number, (offset, _) in pdf.xref_table.existing_entries.items():
+        assert data[offset:].startswith(f"{number} 0 obj".encode())
+
+def test_empty_export_is_one_blank_page():
+    assert len(PdfParser.PdfParser(buf=b"".join(stream_pdf([]))).pages) == 1
+
+def test_exports_render_every_unit(medicine):
+    record = {"medicine_name": "Testamol", "unit_nfts": medicine["units"]}
+    with zipfile.ZipFile(io.BytesIO(b"".join(export_labels(record, "zip")))) as archive:
+        assert sorted(archive.namelist()) == sorted(f"{s}_{n}.png" for s, n in medicine["units"].items())
+    assert b"".join(export_labels(record, "pdf")).startswith(b"%PDF-")
@@ -0,0 +1,38 @@
+import pytest
+from algosdk import account, mnemonic  # type: ignore
+import common
+from minters import MINT_COST, MinterPool
+
+@pytest.fixture
+def pool(monkeypatch):
+    # A second account ahead of the creator, so the first in the pool isn't the creator
+    sk, address = account.generate_account()
+    monkeypatch.setitem(common.CONF, "minter2", {"address": address, "mnemonic": mnemonic.from_private_key(sk)})
+    common.ALGOD._client.balances[address] = 10_000_000_000
+    return MinterPool(["minter2", "creator"])
+
+def test_records_without_a_minter_belong_to_the_creator(pool):
+    assert pool.get(None).key == "creator"
+    assert pool.default.key == "minter2"
+    with pytest.raises(ValueError, match="creator is not in the pool"):
+        MinterPool(["minter2"]).get(None)
+
+def test_only_created_assets_are_deducted(pool):
+    minter = pool.get(None)
+    pool.refresh(minter)
+    spendable = minter.spendable
+    with pool.reserve(minter, 10) as reservation:
+        assert minter.reserved == 10 * MINT_COST
+        reservation.created = 4
+    assert minter.reserved == 0 and minter.in_flight == 0
+    assert minter.spendable == spendable - 4 * MINT_COST
+
+def test_a_failed_mint_rereads_the_balance(pool):
+    minter = pool.get(None)
+    pool.refresh(minter)
+    spendable = minter.spendable
+    with pytest.raises(RuntimeError):
+        with pool.reserve(minter, 10):
+            raise RuntimeError("send failed")
+    # Nothing reached the ledger, so algod still reports the full amount
+    assert minter.spendable == spendable
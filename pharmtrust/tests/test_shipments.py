@@ -0,0 +1,64 @@
+import pytest
+from conftest import RECEIVER
+from shipments import parse_items, plan_shipment, ship
+
+SENDER = "SENDER"
+
+def info(**holdings):
+    return {"assets": [{"asset-id": int(asset_id[1:]), "amount": amount, "is-frozen": False}
+                       for asset_id, amount in holdings.items()]}
+
+def plan(items, sender, receiver, units=()):
+    return plan_shipment(items, {SENDER: sender}, receiver, lambda asset_id: asset_id in units)
+
+def test_parse_items_merges_batches_and_rejects_duplicate_units():
+    assert parse_items([5], [{"asset_id": 7, "amount": 2}, {"asset_id": 7, "amount": 3}]) == [(5, 1), (7, 5)]
+    with pytest.raises(ValueError):
+        parse_items([5, 5])
+    with pytest.raises(ValueError):
+        parse_items([], [{"asset_id": 7, "amount": 0}])
+
+def test_plan_opts_in_only_where_the_receiver_has_no_holding():
+    transfers, opt_ins, errors, delivered = plan([(1, 1), (2, 10)], info(a1=1, a2=50), info(a2=0))
+    assert transfers == [(1, 1, SENDER), (2, 10, SENDER)]
+    assert opt_ins == {1}
+    assert not errors and not delivered
+
+def test_a_unit_the_receiver_already_holds_was_delivered():
+    transfers, _, errors, delivered = plan([(1, 1)], info(a1=0), info(a1=1), units={1})
+    assert delivered == [1] and not transfers and not errors
+
+def test_batch_balances_never_count_as_delivered():
+    # The receiver's 50 may come from any earlier shipment
+    transfers, _, errors, delivered = plan([(2, 10)], info(a2=5), info(a2=50))
+    assert not delivered and not transfers
+    assert "need 10" in errors[2]
+
+def test_frozen_holdings_are_refused():
+    sender = info(a1=1)
+    sender["assets"][0]["is-frozen"] = True
+    assert plan([(1, 1)], sender, info())[2] == {1: "Asset 1 is frozen"}
+
+def test_a_rerun_does_not_ship_a_batch_twice(app_module, medicine):
+    manager = app_module.medicine_manager
+    batch = medicine["batch_asa_id"]
+    before = app_module.ALGOD.account_info(manager.minters.default.address)
+
+    def run():
+        return ship(RECEIVER, [(batch, 10)], custody=manager.custody, journal=manager.store,
+                    shipment_id="rerun-test")
+
+    shipped, failed = run()
+    assert not failed and shipped[batch]
+    assert run() == (shipped, {})
+
+    held = {a["asset-id"]: a["amount"] for a in app_module.ALGOD.account_info(
+        manager.minters.default.address)["assets"]}
+    assert held[batch] == {a["asset-id"]: a["amount"] for a in before["assets"]}[batch] - 10
+
+def test_shipment_endpoint_ships_units(client, wait_job, medicine):
+    unit = list(medicine["units"].values())[0]
+    job = wait_job(client.post("/api/shipments", json={"receiver": RECEIVER, "unit_nft_ids": [unit]}))
+    assert job["status"] == "succeeded", job["error"]
+    assert list(job["result"]["shipped"]) == [str(unit)]
+    assert client.post("/api/shipments", json={"receiver": "creator", "unit_nft_ids": [unit]}).status_code == 400
@@ -0,0 +1,99 @@
+import json
+import time
+import pytest
+from storage import JSON_EXTRAS_KEY, ArtifactStore, JsonStore, SQLiteStore
+
+MEDICINE = {"medicine_name": "Ibu", "batch_no": "B1", "batch_asa_id": 7, "total_units": 10,
+            "expiry_date": "2028-01", "created_date": "2025-01-01T00:00:00"}
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStore(tmp_path / "store.db")
+    yield store
+    store.close()
+
+def test_import_and_export_keep_units_and_extra_keys(store, tmp_path):
+    source = tmp_path / "artifacts.json"
+    source.write_text(json.dumps({"BATCH_ASA_ID": 7, "medicines": {
+        "Ibu_B1_20250101": dict(MEDICINE, unit_nfts={"U1": 101, "U2": 102})}}))
+    assert store.import_json(source) == 1
+    assert store.find_unit(102) == ("Ibu_B1_20250101", "U2")
+    assert store.get_meta(JSON_EXTRAS_KEY) == {"BATCH_ASA_ID": 7}
+
+    target = tmp_path / "export.json"
+    store.export_json(target)
+    exported = json.loads(target.read_text())
+    assert exported["BATCH_ASA_ID"] == 7
+    assert exported["medicines"]["Ibu_B1_20250101"]["unit_nfts"] == {"U1": 101, "U2": 102}
+
+def test_units_migrate_between_backends(store, tmp_path):
+    json_store = JsonStore(tmp_path / "legacy.json")
+    json_store.put_medicine("Ibu_B1_20250101", MEDICINE)
+    json_store.put_units("Ibu_B1_20250101", {"U1": 101})
+    store.import_json(tmp_path / "legacy.json")
+    assert store.load_medicine("Ibu_B1_20250101")["unit_nfts"] == {"U1": 101}
+
+@pytest.mark.parametrize("backend", ["sqlite", "json"])
+def test_reserve_is_exclusive_until_released(backend, tmp_path):
+    store = SQLiteStore(tmp_path / "store.db") if backend == "sqlite" else JsonStore(tmp_path / "a.json")
+    store.reserve(["medicine:a", "batch:a"])
+    with pytest.raises(ValueError, match="Already in progress"):
+        store.reserve(["batch:a"])
+    store.release(["medicine:a", "batch:a"])
+    store.reserve(["batch:a"])
+
+def test_leases_of_a_dead_owner_are_released(store):
+    other = SQLiteStore(store.path)
+    other.reserve(["medicine:a"])
+    with other.transaction() as conn:
+        conn.execute("UPDATE lease_owners SET heartbeat = ? WHERE owner = ?", (time.time() - 600, other.owner))
+    store.reserve(["medicine:b"])
+
+    assert store.release_dead_leases(expiry=60) == 1
+    store.reserve(["medicine:a"])
+    # Our own lease is not touched
+    with pytest.raises(ValueError):
+        other.reserve(["medicine:b"])
+
+def test_changes_are_reported_to_other_connections(store):
+    other = SQLiteStore(store.path)
+    seen = other.latest_change()
+    other.has_changed()
+    store.put_medicine("Ibu_B1_20250101", MEDICINE)
+    store.put_units("Ibu_B1_20250101", {"U1": 101})
+
+    assert other.has_changed()
+    seq, changed = other.changes_since(seen)
+    assert changed == ["Ibu_B1_20250101"]
+    assert other.changes_since(seq) == (seq, [])
+
+def test_the_change_log_is_pruned_to_the_oldest_listener(store):
+    other = SQLiteStore(store.path)
+    seen = other.latest_change()
+    store.latest_change()
+    for i in range(3):
+        store.put_medicine(f"Ibu_B{i}_20250101", MEDICINE)
+    store.changes_since(0)
+    # other has not read the three changes yet, so they stay
+    assert other.changes_since(seen)[1] == [f"Ibu_B{i}_20250101" for i in range(3)]
+
+    def logged():
+        return store.conn.execute("SELECT COUNT(*) FROM changes").fetchone()[0]
+    assert logged() == 1
+    assert store.latest_change() == other.latest_change() > 0
+
+    # A listener that died stops holding the log back
+    store.put_medicine("Ibu_B9_20250101", MEDICINE)
+    with other.transaction() as conn:
+        conn.execute("UPDATE lease_owners SET heartbeat = ? WHERE owner = ?", (time.time() - 600, other.owner))
+    store.release_dead_leases(expiry=60)
+    store.put_medicine("Ibu_B10_20250101", MEDICINE)
+    store.latest_change()
+    assert logged() == 1
+
+def test_stores_implement_the_whole_interface():
+    class Partial(ArtifactStore):
+        def load(self):
+            return {"medicines": {}}
+    with pytest.raises(TypeError):
+        Partial()
@@ -0,0 +1,73 @@
+import threading
+import pytest
+from submitter import PRIORITY_BULK, PRIORITY_INTERACTIVE, Submitter
+
+class HTTPError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+class ScriptedClient:
+    """send_raw_transaction that fails with the queued status codes, then accepts"""
+
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send_raw_transaction(self, blob):
+        with self.lock:
+            status = self.statuses.pop(0) if self.statuses else None
+            if status is None:
+                self.sent.append(blob)
+        if status is not None:
+            raise HTTPError(status)
+
+def submitter(client, **kwargs):
+    options = dict(rate=1000.0, burst=100, backoff=0.001, max_backoff=0.01)
+    options.update(kwargs)
+    return Submitter(client, **options)
+
+def test_throttling_is_retried_and_shrinks_the_limits():
+    client = ScriptedClient([429, 429])
+    sub = submitter(client)
+    limit, rate = sub.limit, sub.rate
+
+    assert sub.send(b"blob", "TX1") == "TX1"
+    assert client.sent == [b"blob"]
+    assert sub.rate < rate
+    assert sub.limit <= limit
+
+def test_client_errors_are_not_retried():
+    client = ScriptedClient([400])
+    with pytest.raises(HTTPError):
+        submitter(client).send(b"blob", "TX1")
+    assert client.sent == []
+
+def test_retries_stop_once_the_transaction_expired():
+    client = ScriptedClient([503] * 5)
+    sub = submitter(client, current_round=lambda: 100)
+    with pytest.raises(HTTPError):
+        sub.send(b"blob", "TX1", last_valid=100)
+    assert len(client.statuses) == 4
+
+def test_fast_successes_raise_the_concurrency_limit():
+    sub = submitter(ScriptedClient(), max_concurrency=8)
+    limit = sub.limit
+    for i in range(20):
+        sub.send(b"blob", f"TX{i}")
+    assert sub.limit > limit
+
+def test_higher_priority_goes_first():
+    client = ScriptedClient()
+    sub = submitter(client, max_concurrency=1, min_concurrency=1)
+    # Hold the only slot so both submissions queue up
+    sub.paused_until = float("inf")
+    bulk = sub.submit(b"bulk", "TX1", priority=PRIORITY_BULK)
+    interactive = sub.submit(b"interactive", "TX2", priority=PRIORITY_INTERACTIVE)
+    with sub.cond:
+        sub.paused_until = 0.0
+        sub.cond.notify_all()
+    bulk.result(timeout=5)
+    interactive.result(timeout=5)
+    assert client.sent == [b"interactive", b"bulk"]